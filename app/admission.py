@@ -0,0 +1,294 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from .metrics import ADMISSION_REJECTED
+from .resilience import endpoint_id_of
+
+# Lower number = served first when Portainer calls have to wait for a slot
+PRIORITIES = {"critical": 0, "interactive": 1, "bulk": 2}
+
+# Work not started by an inbound request (jobs, snapshots, informers) is bulk unless told otherwise
+current_priority = ContextVar("current_priority", default="bulk")
+
+# Inbound routes (for one method, or any) that fan out over many environments or run long
+_BULK_PATHS = (
+    (None, re.compile(r"^/api/v1/fleet/")),
+    (None, re.compile(r"^/api/v1/federation/")),
+    (None, re.compile(r"^/api/v1/containers/bulk$")),
+    ("PUT", re.compile(r"^/api/v1/teams/[^/]+/members$")),  # membership sync; adding one member stays interactive
+    (None, re.compile(r"^/api/v1/images/gc")),
+    (None, re.compile(r"^/api/v1/stacks/rollout$")),
+)
+# Cheap local reads that must answer even when the service is saturated
+_CRITICAL_PATHS = {"/api/v1/health", "/metrics"}
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing work beyond the configured limits; answered with ``429``."""
+
+    def __init__(self, reason, retry_after):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Too many requests ({reason}); retry in {math.ceil(retry_after)}s")
+
+
+@contextmanager
+def priority(name):
+    """Run the enclosed Portainer calls in priority class ``name``."""
+    token = current_priority.set(name)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def classify(method, path, headers):
+    """Priority class of an inbound request; callers may lower theirs with ``X-Priority: bulk``."""
+    if path in _CRITICAL_PATHS:
+        return "critical"
+    if method == "GET" and path.startswith("/api/v1/jobs"):
+        return "critical"
+    bulk = any(only in (None, method) and pattern.match(path) for only, pattern in _BULK_PATHS)
+    name = "bulk" if bulk else "interactive"
+    requested = headers.get("x-priority")
+    if requested in PRIORITIES and PRIORITIES[requested] > PRIORITIES[name]:
+        return requested
+    return name
+
+
+class PriorityLimiter:
+    """Concurrency limit whose waiters are served highest priority first.
+
+    Bulk work may hold at most ``bulk_limit`` slots, so interactive calls
+    always find headroom. At most ``max_waiting`` callers wait; beyond that,
+    or after ``timeout`` seconds, ``AdmissionRejected`` is raised.
+    """
+
+    def __init__(self, name, limit, bulk_limit=None, max_waiting=256, timeout=10.0):
+        self.name = name
+        self.limit = limit
+        self.bulk_limit = max(1, min(limit, bulk_limit if bulk_limit is not None else limit))
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.rejected = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _limit_for(self, rank):
+        return self.bulk_limit if rank >= PRIORITIES["bulk"] else self.limit
+
+    def _can_start(self, rank):
+        # Never overtake a waiter of the same or higher priority
+        if self._waiters and self._waiters[0][0] <= rank:
+            return False
+        return self.active < self._limit_for(rank)
+
+    async def acquire(self, name):
+        rank = PRIORITIES[name]
+        if self._can_start(rank):
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_waiting:
+            self.rejected += 1
+            raise AdmissionRejected(f"{self.name} queue full", self.timeout)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (rank, next(self._seq), future))
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(future)
+            self.rejected += 1
+            raise AdmissionRejected(f"{self.name} saturated", self.timeout) from None
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # Granted a slot just as we were cancelled: hand it on
+                self.release()
+            else:
+                self._discard(future)
+            raise
+
+    def _discard(self, future):
+        self._waiters = [waiter for waiter in self._waiters if waiter[2] is not future]
+        heapq.heapify(self._waiters)
+        self._wake()
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            rank, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.active >= self._limit_for(rank):
+                return
+            heapq.heappop(self._waiters)
+            self.active += 1
+            future.set_result(None)
+
+    def stats(self):
+        return {"active": self.active, "waiting": len(self._waiters), "limit": self.limit, "rejected": self.rejected}
+
+
+class UpstreamLimiter:
+    """Global and per-environment caps on concurrent Portainer calls."""
+
+    def __init__(self, max_concurrency=64, endpoint_max_concurrency=16, bulk_share=0.5, max_waiting=256, timeout=10.0):
+        self.endpoint_max_concurrency = endpoint_max_concurrency
+        self.bulk_share = bulk_share
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.global_limiter = self._limiter("global", max_concurrency)
+        self._endpoints = {}
+
+    def _limiter(self, name, limit):
+        return PriorityLimiter(name, limit, math.ceil(limit * self.bulk_share), self.max_waiting, self.timeout)
+
+    def for_path(self, path, params=None):
+        # Keyed like the circuit breakers, so stack calls (?endpointId=N) count against environment N
+        endpoint_id = endpoint_id_of(path, params)
+        if endpoint_id is None:
+            return None
+        limiter = self._endpoints.get(endpoint_id)
+        if limiter is None:
+            limiter = self._endpoints[endpoint_id] = self._limiter(f"endpoint {endpoint_id}", self.endpoint_max_concurrency)
+        return limiter
+
+    @asynccontextmanager
+    async def slot(self, path, params=None):
+        """Hold one global slot (and one of the call's environment) for the duration of a call."""
+        name = current_priority.get()
+        limiters = [limiter for limiter in (self.for_path(path, params), self.global_limiter) if limiter is not None]
+        acquired = []
+        try:
+            # Environment first, so a call waiting on a busy environment does not hold a global slot
+            for limiter in limiters:
+                try:
+                    await limiter.acquire(name)
+                except AdmissionRejected:
+                    ADMISSION_REJECTED.labels("global" if limiter is self.global_limiter else "endpoint", name).inc()
+                    raise
+                acquired.append(limiter)
+            yield
+        finally:
+            for limiter in reversed(acquired):
+                limiter.release()
+
+    def stats(self):
+        return {
+            "global": self.global_limiter.stats(),
+            "endpoints": {str(endpoint_id): limiter.stats() for endpoint_id, limiter in self._endpoints.items()},
+        }
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost=1.0):
+        """Spend ``cost`` tokens; returns 0 on success or the seconds until enough have refilled."""
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """One token bucket per API client, identified by a header or the peer address.
+
+    Buckets are kept in LRU order and the least recently seen clients are
+    dropped beyond ``max_clients``; a dropped client simply starts full again.
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self.rejected = 0
+
+    def take(self, client, cost=1.0):
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take(cost)
+        if wait:
+            self.rejected += 1
+        return wait
+
+    def stats(self):
+        return {"clients": len(self._buckets), "rate": self.rate, "burst": self.burst, "rejected": self.rejected}
+
+
+class AdmissionMiddleware:
+    """Rate-limit each client and tag the request's Portainer calls with its priority class.
+
+    Critical requests (health, metrics, job polling) are never rate-limited;
+    bulk requests cost ``bulk_cost`` tokens. An exhausted bucket is answered
+    with ``429`` and ``Retry-After`` before any work is done.
+    """
+
+    def __init__(self, app, rate_limiter=None, client_header="X-Client-Id", bulk_cost=5.0):
+        self.app = app
+        self.rate_limiter = rate_limiter
+        self.client_header = client_header.lower().encode()
+        self.bulk_cost = bulk_cost
+
+    def _client(self, scope, headers):
+        client = headers.get(self.client_header)
+        if client:
+            return client.decode("latin-1")
+        peer = scope.get("client")
+        return peer[0] if peer else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        name = classify(scope["method"], scope["path"], {"x-priority": headers.get(b"x-priority", b"").decode("latin-1")})
+        if self.rate_limiter is not None and name != "critical":
+            wait = self.rate_limiter.take(self._client(scope, headers), self.bulk_cost if name == "bulk" else 1.0)
+            if wait:
+                ADMISSION_REJECTED.labels("client", name).inc()
+                await self._reject(send, wait)
+                return
+
+        with priority(name):
+            await self.app(scope, receive, send)
+
+    async def _reject(self, send, retry_after):
+        body = json.dumps({"detail": "Too many requests (client rate limit)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,171 @@
+import asyncio
+import posixpath
+import re
+import time
+from urllib.parse import unquote
+
+import httpx
+
+# "${id}" is the body of an earlier operation; "${id[0].Id}" / "${id.Name}" reach into it
+REFERENCE = re.compile(r"\$\{([A-Za-z0-9_-]+)((?:\.[A-Za-z0-9_-]+|\[\d+\])*)\}")
+_ACCESSOR = re.compile(r"\.([A-Za-z0-9_-]+)|\[(\d+)\]")
+BATCH_PATH = "/api/v1/batch"
+# Set on every operation run_batch sends; the batch route refuses requests carrying it
+BATCH_HEADER = "X-Batch-Operation"
+
+
+class InvalidBatch(ValueError):
+    """The batch itself is malformed (duplicate ids, forward references, nested batch)."""
+
+
+class UnresolvedReference(LookupError):
+    pass
+
+
+def _references(value):
+    if isinstance(value, str):
+        return {match.group(1) for match in REFERENCE.finditer(value)}
+    if isinstance(value, dict):
+        return set().union(*(_references(v) for v in value.values())) if value else set()
+    if isinstance(value, list):
+        return set().union(*(_references(v) for v in value)) if value else set()
+    return set()
+
+
+def _lookup(body, op_id, accessors):
+    value = body
+    for key, index in _ACCESSOR.findall(accessors):
+        try:
+            if index:
+                value = value[int(index)]
+            elif isinstance(value, list) and key.isdigit():
+                value = value[int(key)]
+            else:
+                value = value[key]
+        except (KeyError, IndexError, TypeError):
+            raise UnresolvedReference(f"${{{op_id}{accessors}}} does not resolve") from None
+    return value
+
+
+def resolve(value, bodies):
+    """Substitute references in strings nested in ``value``.
+
+    A string that is exactly one reference takes the referenced value as-is
+    (so ids stay numbers); references inside longer strings are interpolated.
+    """
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        if match:
+            return _lookup(bodies[match.group(1)], match.group(1), match.group(2))
+        return REFERENCE.sub(lambda m: str(_lookup(bodies[m.group(1)], m.group(1), m.group(2))), value)
+    if isinstance(value, dict):
+        return {k: resolve(v, bodies) for k, v in value.items()}
+    if isinstance(value, list):
+        return [resolve(v, bodies) for v in value]
+    return value
+
+
+def allowed_path(path):
+    """Operations may target any API route except the batch endpoint itself.
+
+    The path is compared the way the router will see it: percent-decoded
+    (``/api/v1/%62atch`` is the batch route) and with dot segments resolved.
+    """
+    route = posixpath.normpath(unquote(path.split("?", 1)[0]))
+    return route.startswith("/api/v1/") and route != BATCH_PATH
+
+
+def plan_batch(operations, max_operations):
+    """Give every operation an id and its dependencies; references may only point backwards."""
+    if len(operations) > max_operations:
+        raise InvalidBatch(f"At most {max_operations} operations per batch")
+    seen = set()
+    planned = []
+    for index, operation in enumerate(operations):
+        op_id = operation.get("id") or str(index)
+        if op_id in seen:
+            raise InvalidBatch(f"Duplicate operation id '{op_id}'")
+        path = operation["path"]
+        if not allowed_path(path):
+            raise InvalidBatch(f"Operation '{op_id}': path must be an API route other than the batch endpoint")
+        depends_on = set(operation.get("depends_on") or [])
+        depends_on |= _references([path, operation.get("params"), operation.get("body")])
+        unknown = depends_on - seen
+        if unknown:
+            raise InvalidBatch(f"Operation '{op_id}' references {sorted(unknown)}, which are not earlier operations")
+        planned.append({**operation, "id": op_id, "depends_on": depends_on})
+        seen.add(op_id)
+    return planned
+
+
+def _body(response):
+    if "json" in response.headers.get("content-type", ""):
+        try:
+            return response.json()
+        except ValueError:
+            pass
+    return response.text
+
+
+async def run_batch(app, operations, concurrency=8, headers=None):
+    """Run planned operations against ``app`` in-process, each as soon as its dependencies succeed.
+
+    Operations go through the full ASGI stack (validation, middleware, limits)
+    without a network hop. One whose dependency failed is not sent and gets
+    status ``424``.
+    """
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = {op["id"]: asyncio.Event() for op in operations}
+    results = {}
+    headers = {**(headers or {}), "accept-encoding": "identity", BATCH_HEADER: "1"}
+
+    async def run(client, operation):
+        op_id = operation["id"]
+        result = {"id": op_id, "method": operation["method"], "path": operation["path"]}
+        try:
+            for dependency in operation["depends_on"]:
+                await done[dependency].wait()
+            failed = [d for d in sorted(operation["depends_on"]) if results[d]["status"] >= 400]
+            if failed:
+                result.update(status=424, error=f"Dependencies failed: {failed}", elapsed_ms=0.0)
+                return
+            bodies = {d: results[d].get("body") for d in operation["depends_on"]}
+            try:
+                path = resolve(operation["path"], bodies)
+                params = resolve(operation.get("params"), bodies)
+                body = resolve(operation.get("body"), bodies)
+            except UnresolvedReference as e:
+                result.update(status=424, error=str(e), elapsed_ms=0.0)
+                return
+            result["path"] = path
+            if not allowed_path(path):
+                result.update(status=400, error="Resolved path is not an allowed API route", elapsed_ms=0.0)
+                return
+            async with semaphore:
+                op_started = time.monotonic()
+                try:
+                    response = await client.request(operation["method"], path, params=params, json=body)
+                except Exception as e:
+                    result.update(status=500, error=str(e) or type(e).__name__)
+                else:
+                    result.update(status=response.status_code, body=_body(response))
+                result["elapsed_ms"] = round((time.monotonic() - op_started) * 1000, 1)
+        finally:
+            result.setdefault("status", 500)
+            results[op_id] = result
+            done[op_id].set()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://batch", headers=headers, timeout=None) as client:
+        await asyncio.gather(*(run(client, operation) for operation in operations))
+
+    ordered = [results[op["id"]] for op in operations]
+    succeeded = sum(1 for r in ordered if r["status"] < 400)
+    return {
+        "total": len(ordered),
+        "succeeded": succeeded,
+        "failed": len(ordered) - succeeded,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "results": ordered,
+    }
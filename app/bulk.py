@@ -0,0 +1,73 @@
+import time
+
+from .fleet import DOCKER_ENDPOINT_TYPES, gather_bounded
+
+CONTAINER_ACTIONS = {
+    "start": "start_container",
+    "stop": "stop_container",
+    "restart": "restart_container",
+}
+
+
+async def resolve_container_targets(service, endpoint_ids=None, labels=None, name=None, concurrency=16):
+    """Expand a label/name filter into ``(endpoint_id, container_id, name)`` targets.
+
+    Filtering is pushed down to Docker on each environment; environments that
+    cannot be listed are returned as errors.
+    """
+    if not endpoint_ids:
+        endpoints = await service.get_endpoints()
+        endpoint_ids = [e["Id"] for e in endpoints if e.get("Type") in DOCKER_ENDPOINT_TYPES]
+    filters = {}
+    if labels:
+        filters["label"] = labels
+    if name:
+        filters["name"] = [name]
+
+    results = await gather_bounded(endpoint_ids, lambda eid: service.find_containers(eid, filters), concurrency)
+    targets, errors = [], []
+    for endpoint_id, containers, error, _ in results:
+        if error is not None:
+            errors.append({"endpoint_id": endpoint_id, "status": "error", "error": error})
+            continue
+        for container in containers:
+            names = container.get("Names") or []
+            targets.append((endpoint_id, container["Id"], names[0].lstrip("/") if names else None))
+    return targets, errors
+
+
+async def run_container_action(service, action, targets, parallelism, batch_size=None):
+    """Apply ``action`` to every target, in waves of ``batch_size`` with ``parallelism`` calls in flight."""
+    method = getattr(service, CONTAINER_ACTIONS[action])
+    batch_size = batch_size or len(targets) or 1
+    started = time.monotonic()
+
+    results = []
+    for wave, offset in enumerate(range(0, len(targets), batch_size), start=1):
+        batch = targets[offset:offset + batch_size]
+        outcomes = await gather_bounded(
+            batch, lambda t: method(t[1], endpoint_id=t[0]), parallelism
+        )
+        for (endpoint_id, container_id, name), result, error, elapsed in outcomes:
+            item = {
+                "endpoint_id": endpoint_id,
+                "container_id": container_id,
+                "name": name,
+                "wave": wave,
+                "elapsed_ms": round(elapsed * 1000, 1),
+            }
+            if error is None:
+                item.update(status="ok", result=result)
+            else:
+                item.update(status="error", error=error)
+            results.append(item)
+
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return {
+        "action": action,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "results": results,
+    }
@@ -0,0 +1,175 @@
+import asyncio
+import functools
+import inspect
+import json
+import time
+from collections import OrderedDict
+
+
+def _estimate_size(value):
+    """Approximate memory footprint of a cached payload by its JSON length."""
+    content = getattr(value, "content", None)
+    if isinstance(content, bytes):
+        return len(content)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "stale_until")
+
+    def __init__(self, value, size, expires_at, stale_until):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class TTLCache:
+    """In-process read-through cache with per-entry TTL, LRU eviction and a byte budget.
+
+    Expired entries are still served for ``stale_ttl`` seconds while a single
+    background task refreshes them (stale-while-revalidate). Cached values are
+    shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, stale_ttl=30.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self._refreshing = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get_or_load(self, key, ttl, loader):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._schedule_refresh(key, ttl, loader)
+                return entry.value
+        self.misses += 1
+        return await self._load(key, ttl, loader)
+
+    async def _load(self, key, ttl, loader):
+        generation = self._generation
+        value = await loader()
+        # A mutation invalidated the cache while we were loading; the value
+        # may predate it, so hand it to the caller but do not keep it.
+        if generation == self._generation:
+            self._store(key, value, ttl)
+        return value
+
+    def _schedule_refresh(self, key, ttl, loader):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._load(key, ttl, loader)
+            except Exception:
+                pass  # keep serving the stale entry until it runs out
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.get_running_loop().create_task(refresh())
+
+    def _store(self, key, value, ttl):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        now = time.monotonic()
+        self._entries[key] = _Entry(value, size, now + ttl, now + ttl + self.stale_ttl)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def invalidate(self, resource, endpoint_id=None):
+        """Drop every entry of ``resource`` for ``endpoint_id`` (parsed and raw variants), or for all endpoints."""
+        self._generation += 1
+        stale = [
+            k for k in self._entries
+            if k[0] == resource and (endpoint_id is None or k[1] == endpoint_id)
+        ]
+        for key in stale:
+            self._discard(key)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def _endpoint_id_of(signature, args, kwargs):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return bound.arguments.get("endpoint_id")
+
+
+def cached(resource):
+    """Serve a ``PortainerService`` read from ``self.cache``, keyed by resource and endpoint_id."""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            if self.cache is None:
+                return await func(self, *args, **kwargs)
+            endpoint_id = _endpoint_id_of(signature, (self, *args), kwargs)
+            ttl = self.cache_ttls.get(resource, 0)
+            if ttl <= 0:
+                return await func(self, *args, **kwargs)
+            return await self.cache.get_or_load(
+                (resource, endpoint_id), ttl, lambda: func(self, *args, **kwargs)
+            )
+        return wrapper
+    return decorator
+
+
+def invalidates(*resources):
+    """Invalidate the given resources for the call's endpoint_id once a mutation has been sent."""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await func(self, *args, **kwargs)
+            finally:
+                if self.cache is not None:
+                    endpoint_id = _endpoint_id_of(signature, (self, *args), kwargs)
+                    for resource in resources:
+                        self.cache.invalidate(resource, endpoint_id)
+        return wrapper
+    return decorator
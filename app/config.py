@@ -1,10 +1,127 @@
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings
 
+class PortainerInstance(BaseModel):
+    url: str
+    api_key: str
+
 class Settings(BaseSettings):
     portainer_url: str
     portainer_api_key: str
 
+    # More Portainer servers served by this process, e.g. {"eu": {"url": "https://...", "api_key": "..."}}.
+    # Routes pick one with ?instance=eu; PORTAINER_URL/PORTAINER_API_KEY is the default instance.
+    portainer_instance: str = "default"
+    portainer_instances: dict[str, PortainerInstance] = {}
+
+    # Upstream HTTP client (one shared, pooled client per Portainer instance)
+    portainer_http2: bool = True
+    portainer_max_connections: int = 200
+    portainer_max_keepalive_connections: int = 50
+    portainer_keepalive_expiry: float = 30.0
+    portainer_connect_timeout: float = 5.0
+    portainer_timeout: float = 30.0
+
+    # Read timeout per operation class: GET, other mutations, stack/app deploys and image pulls
+    portainer_read_timeout: float = 15.0
+    portainer_write_timeout: float = 30.0
+    portainer_deploy_timeout: float = 300.0
+
+    # Retries for idempotent GETs on transport errors and 502/503/504 (full-jitter backoff)
+    retry_attempts: int = 2
+    retry_backoff_base: float = 0.2
+    retry_backoff_max: float = 2.0
+
+    # Per-environment circuit breaker: open after N consecutive failures, probe again after reset
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+    # Send a second copy of a GET still unanswered after this many seconds (0 disables)
+    hedge_after: float = 0.0
+
+    # Admission control: concurrent Portainer calls (global / per environment) and per-client rate limits.
+    # Bulk work (fleet scans, bulk actions, jobs, snapshots) may hold at most upstream_bulk_share of the slots.
+    admission_enabled: bool = True
+    upstream_max_concurrency: int = 64
+    upstream_endpoint_max_concurrency: int = 16
+    upstream_bulk_share: float = 0.5
+    upstream_max_waiting: int = 256
+    upstream_queue_timeout: float = 10.0
+    client_rate_limit: float = 50.0 # requests per second per client (0 disables)
+    client_burst: float = 100.0
+    client_id_header: str = "X-Client-Id"
+    bulk_request_cost: float = 5.0
+
+    # Prometheus metrics at /metrics (OpenTelemetry spans are added when opentelemetry is installed)
+    metrics_enabled: bool = True
+
+    # Send untransformed upstream JSON bodies to the client as raw bytes
+    passthrough_responses: bool = True
+
+    # Conditional GET (ETag / If-None-Match) and response compression
+    etag_enabled: bool = True
+    compression_minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    compression_offload_size: int = 65536 # Bodies this large are hashed/compressed in a worker thread
+
+    # Share one upstream call between concurrent identical GETs
+    coalesce_requests: bool = True
+
+    # Fleet-wide fan-out across every Portainer environment
+    fleet_concurrency: int = 16
+    fleet_endpoint_timeout: float = 10.0
+    bulk_parallelism: int = 10
+
+    # Image cleanup (/api/v1/images/gc): removals in flight and removal calls per second (0 = unlimited)
+    gc_parallelism: int = 4
+    gc_rate: float = 5.0
+
+    # /api/v1/batch: operations per request and how many run at once
+    batch_max_operations: int = 50
+    batch_concurrency: int = 8
+
+    # Background jobs for ?async=true mutations (finished jobs are kept for job_retention seconds)
+    job_workers: int = 4
+    job_max_queued: int = 1000
+    job_retention: float = 3600.0
+
+    # Minimum seconds between aggregated progress events when streaming image pulls
+    pull_progress_interval: float = 0.5
+
+    # Docker events-driven container inventories started at boot, e.g. [1, 3]
+    docker_inventory_endpoints: list[int] = []
+    docker_inventory_reconcile_interval: float = 300.0
+
+    # Page size used when streaming Kubernetes lists
+    k8s_page_size: int = 500
+
+    # Opt-in LIST+WATCH informers started at boot, e.g. {"3": ["pods", "deployments"]}
+    k8s_informers: dict[int, list[str]] = {}
+
+    # SQLite snapshot of endpoints and Docker resources for /api/v1/search (disabled when unset)
+    snapshot_path: str | None = None
+    snapshot_refresh_interval: float = 300.0
+
+    # Read-through cache for list calls (TTLs in seconds, 0 disables a resource)
+    cache_enabled: bool = True
+    cache_max_entries: int = 1024
+    cache_max_bytes: int = 64 * 1024 * 1024
+    cache_stale_ttl: float = 30.0
+    cache_ttls: dict[str, float] = {
+        "endpoints": 30.0,
+        "stacks": 10.0,
+        "stack_files": 30.0,
+        "containers": 2.0,
+        "images": 15.0,
+        "volumes": 15.0,
+        "networks": 15.0,
+        "users": 30.0,
+        "teams": 30.0,
+        "memberships": 30.0,
+    }
+
     class Config:
         env_file = ".env"
 
-settings = Settings()  # Make sure .env file exists and contains PORTAINER_URL and PORTAINER_API_KEY
\ No newline at end of file
+settings = Settings()  # Make sure .env file exists and contains PORTAINER_URL and PORTAINER_API_KEY
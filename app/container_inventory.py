@@ -0,0 +1,237 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Container events that can change what /containers/json reports
+REFRESH_ACTIONS = {
+    "create", "start", "restart", "die", "stop", "kill", "pause", "unpause",
+    "rename", "update", "oom",
+}
+
+# States Docker lists without all=true (paused and restarting containers still count as running)
+LISTED_STATES = {"running", "paused", "restarting"}
+
+
+class ContainerInventory:
+    """Incrementally maintained container table for one Docker environment.
+
+    Follows the environment's Docker ``/events`` stream through Portainer,
+    re-reading only the containers named in each burst of events, and runs a
+    periodic full reconcile to repair anything missed. Every change bumps a
+    revision number so clients can ask for the delta since a revision.
+    """
+
+    def __init__(self, service, endpoint_id, reconcile_interval=300.0, changelog_size=10000, batch_delay=0.1):
+        self.service = service
+        self.endpoint_id = endpoint_id
+        self.reconcile_interval = reconcile_interval
+        self.batch_delay = batch_delay
+        self.containers = {}
+        self.revisions = {}
+        self.revision = 0
+        # (revision, container_id) of removals, for delta queries
+        self.removed = deque(maxlen=changelog_size)
+        self.synced = False
+        self.reconciled_at = None
+        self.last_event_at = None
+        self.events = 0
+        self.reconciles = 0
+        self.last_error = None
+        self._dirty = set()
+        self._dirty_event = asyncio.Event()
+        # IDs named by events while each running reconcile waits for its list
+        self._reconciling = []
+        self._tasks = []
+
+    # Table
+    def _put(self, container):
+        container_id = container["Id"]
+        if self.containers.get(container_id) == container:
+            return
+        self.revision += 1
+        self.containers[container_id] = container
+        self.revisions[container_id] = self.revision
+
+    def _remove(self, container_id):
+        if self.containers.pop(container_id, None) is None:
+            return
+        self.revision += 1
+        self.revisions.pop(container_id, None)
+        self.removed.append((self.revision, container_id))
+
+    def list(self, all=False):
+        containers = list(self.containers.values())
+        if not all:
+            containers = [c for c in containers if c.get("State") in LISTED_STATES]
+        return containers
+
+    def delta(self, since):
+        """Containers changed and IDs removed after revision ``since``.
+
+        Falls back to a full snapshot (``full: true``) when ``since`` is older
+        than the retained removal log.
+        """
+        oldest = self.removed[0][0] if len(self.removed) == self.removed.maxlen else 0
+        if since < oldest or since > self.revision:
+            return {"revision": self.revision, "full": True, "containers": list(self.containers.values()), "removed": []}
+        return {
+            "revision": self.revision,
+            "full": False,
+            "containers": [c for cid, c in self.containers.items() if self.revisions[cid] > since],
+            "removed": [cid for rev, cid in self.removed if rev > since],
+        }
+
+    def stats(self):
+        return {
+            "endpoint_id": self.endpoint_id,
+            "synced": self.synced,
+            "containers": len(self.containers),
+            "revision": self.revision,
+            "events": self.events,
+            "reconciles": self.reconciles,
+            "reconciled_seconds_ago": round(time.monotonic() - self.reconciled_at, 3) if self.reconciled_at else None,
+            "last_error": self.last_error,
+        }
+
+    # Sync
+    async def reconcile(self):
+        mark = self.revision
+        touched = set()
+        self._reconciling.append(touched)
+        try:
+            containers = await self.service.find_containers(self.endpoint_id)
+        finally:
+            self._reconciling.remove(touched)
+        # Containers that events changed, or refreshed, while the list was in flight are newer than it
+        skip = touched | self._dirty | {cid for cid, revision in self.revisions.items() if revision > mark}
+        seen = set()
+        for container in containers:
+            seen.add(container["Id"])
+            if container["Id"] not in skip:
+                self._put(container)
+        for container_id in [cid for cid in self.containers if cid not in seen and cid not in skip]:
+            self._remove(container_id)
+        self.reconciles += 1
+        self.reconciled_at = time.monotonic()
+        self.synced = True
+
+    async def _refresh_dirty(self):
+        while True:
+            await self._dirty_event.wait()
+            # Let a burst of events accumulate, then re-read them in one call
+            await asyncio.sleep(self.batch_delay)
+            self._dirty_event.clear()
+            ids, self._dirty = self._dirty, set()
+            try:
+                containers = await self.service.find_containers(self.endpoint_id, {"id": sorted(ids)})
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                self._dirty |= ids
+                self._dirty_event.set()
+                await asyncio.sleep(1.0)
+                continue
+            found = {c["Id"]: c for c in containers}
+            for container_id in ids:
+                if container_id in self._dirty:
+                    continue  # changed again while we were reading; the next batch decides
+                if container_id in found:
+                    self._put(found[container_id])
+                else:
+                    self._remove(container_id)
+
+    def _handle(self, event):
+        action = (event.get("Action") or event.get("status") or "").split(":")[0]
+        container_id = (event.get("Actor") or {}).get("ID") or event.get("id")
+        self.last_event_at = event.get("time") or self.last_event_at
+        self.events += 1
+        if not container_id:
+            return
+        for touched in self._reconciling:
+            touched.add(container_id)
+        if action == "destroy":
+            self._remove(container_id)
+        elif action not in REFRESH_ACTIONS and action != "health_status":
+            return
+        # Destroyed IDs are re-checked too, so an in-flight read cannot resurrect them
+        self._dirty.add(container_id)
+        self._dirty_event.set()
+
+    async def _follow_events(self):
+        backoff = 1.0
+        while True:
+            try:
+                since = self.last_event_at
+                await self.reconcile()
+                backoff = 1.0
+                async for event in self.service.stream_docker_events(
+                    self.endpoint_id, since=since, filters={"type": ["container"]}
+                ):
+                    self._handle(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                logger.warning("Container inventory %s failed: %s", self.endpoint_id, self.last_error)
+                await asyncio.sleep(backoff * (0.5 + random.random()))
+                backoff = min(backoff * 2, 30.0)
+
+    async def _periodic_reconcile(self):
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+
+    def start(self):
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [
+                loop.create_task(self._follow_events()),
+                loop.create_task(self._refresh_dirty()),
+                loop.create_task(self._periodic_reconcile()),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+class ContainerInventoryRegistry:
+    """Opt-in container inventories keyed by ``endpoint_id``."""
+
+    def __init__(self, service, reconcile_interval=300.0):
+        self.service = service
+        self.reconcile_interval = reconcile_interval
+        self._inventories = {}
+
+    def get(self, endpoint_id):
+        return self._inventories.get(endpoint_id)
+
+    def start(self, endpoint_id):
+        inventory = self._inventories.get(endpoint_id)
+        if inventory is None:
+            inventory = ContainerInventory(self.service, endpoint_id, self.reconcile_interval)
+            self._inventories[endpoint_id] = inventory
+        inventory.start()
+        return inventory
+
+    async def stop(self, endpoint_id):
+        inventory = self._inventories.pop(endpoint_id, None)
+        if inventory is not None:
+            await inventory.stop()
+        return inventory is not None
+
+    async def aclose(self):
+        for inventory in self._inventories.values():
+            await inventory.stop()
+        self._inventories.clear()
+
+    def stats(self):
+        return [inventory.stats() for inventory in self._inventories.values()]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+# Portainer environment types that expose the Docker API
+DOCKER_ENDPOINT_TYPES = {1, 2, 4}
+
+FLEET_RESOURCES = {
+    "containers": ("get_containers", True),
+    "images": ("get_images", True),
+    "volumes": ("get_volumes", True),
+    "networks": ("get_networks", True),
+    "stacks": ("get_stacks", False),
+}
+
+
+async def gather_bounded(items, fn, concurrency, timeout=None):
+    """Run ``fn(item)`` for every item with at most ``concurrency`` calls in flight.
+
+    Returns ``(item, result, error, elapsed)`` tuples in input order; a failing or
+    timed-out item never aborts the others.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                if timeout:
+                    result = await asyncio.wait_for(fn(item), timeout)
+                else:
+                    result = await fn(item)
+                return item, result, None, time.monotonic() - started
+            except asyncio.TimeoutError:
+                return item, None, f"timed out after {timeout}s", time.monotonic() - started
+            except Exception as e:
+                return item, None, str(e) or type(e).__name__, time.monotonic() - started
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+async def fleet_query(service, resource, concurrency, timeout, endpoint_ids=None):
+    """Query ``resource`` on every environment concurrently and merge the results."""
+    method_name, docker_only = FLEET_RESOURCES[resource]
+    method = getattr(service, method_name)
+
+    endpoints = await service.get_endpoints()
+    if endpoint_ids:
+        endpoints = [e for e in endpoints if e.get("Id") in endpoint_ids]
+    skipped = []
+    if docker_only:
+        skipped = [e["Id"] for e in endpoints if e.get("Type") not in DOCKER_ENDPOINT_TYPES]
+        endpoints = [e for e in endpoints if e.get("Type") in DOCKER_ENDPOINT_TYPES]
+
+    started = time.monotonic()
+    results = await gather_bounded(endpoints, lambda e: method(endpoint_id=e["Id"]), concurrency, timeout)
+
+    items, summary, errors = [], [], []
+    for endpoint, result, error, elapsed in results:
+        endpoint_id, endpoint_name = endpoint["Id"], endpoint.get("Name")
+        entry = {"endpoint_id": endpoint_id, "endpoint_name": endpoint_name, "elapsed_ms": round(elapsed * 1000, 1)}
+        if error is not None:
+            errors.append({**entry, "error": error})
+            continue
+        summary.append({**entry, "count": len(result)})
+        items.extend({"endpoint_id": endpoint_id, "endpoint_name": endpoint_name, **item} for item in result)
+
+    return {
+        "resource": resource,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "endpoints": summary,
+        "errors": errors,
+        "skipped_endpoint_ids": skipped,
+        "items": items,
+    }
+
+
+async def federated_query(services, resource, concurrency, timeout):
+    """Query ``resource`` on every Portainer instance in parallel and merge the results.
+
+    ``services`` maps instance names to services. ``endpoints`` lists each
+    instance's environments; other resources run a fleet query per instance.
+    Items, summaries and errors carry their ``instance``; an unreachable
+    instance is reported in ``errors`` without failing the others.
+    """
+    async def query(name):
+        if resource == "endpoints":
+            return await services[name].get_endpoints()
+        return await fleet_query(services[name], resource, concurrency, timeout)
+
+    started = time.monotonic()
+    items, summary, errors, skipped = [], [], [], []
+    for name, result, error, elapsed in await gather_bounded(list(services), query, len(services)):
+        entry = {"instance": name, "elapsed_ms": round(elapsed * 1000, 1)}
+        if error is not None:
+            errors.append({**entry, "error": error})
+            continue
+        if resource == "endpoints":
+            summary.append({**entry, "count": len(result)})
+            items.extend({"instance": name, **item} for item in result)
+            continue
+        summary.append({**entry, "count": len(result["items"]), "endpoints": result["endpoints"]})
+        errors.extend({"instance": name, **endpoint_error} for endpoint_error in result["errors"])
+        skipped.extend({"instance": name, "endpoint_id": endpoint_id} for endpoint_id in result["skipped_endpoint_ids"])
+        items.extend({"instance": name, **item} for item in result["items"])
+
+    return {
+        "resource": resource,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "instances": summary,
+        "errors": errors,
+        "skipped_endpoints": skipped,
+        "items": items,
+    }
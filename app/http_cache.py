@@ -0,0 +1,157 @@
+import asyncio
+import gzip
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is in requirements.txt, but gzip alone still works without it
+    brotli = None
+
+# Incrementally produced bodies are never buffered
+STREAMING_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def _opaque_tag(tag):
+    """Normalize an entity tag for If-None-Match comparison (weak comparison, any encoding)."""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for suffix in _ENCODING_SUFFIXES:
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)]
+    return tag
+
+
+def _encoded_tag(etag, encoding):
+    """A strong ETag identifies one representation, so the encoded body gets its own tag."""
+    weak = etag.startswith("W/")
+    value = (etag[2:] if weak else etag).strip('"')
+    return '%s"%s-%s"' % ("W/" if weak else "", value, encoding)
+
+
+def version_etag(*parts):
+    """ETag derived from a known version (resourceVersion, revision) plus whatever shapes the body."""
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return '"%s"' % digest
+
+
+def _not_modified(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = _opaque_tag(etag)
+    return any(_opaque_tag(tag) == current for tag in if_none_match.split(","))
+
+
+def _accepted_encodings(accept_encoding):
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+class ConditionalResponseMiddleware:
+    """Strong ETags, ``If-None-Match`` -> 304, and negotiated gzip/brotli for GET responses.
+
+    Routes that already know a version for their payload (an informer
+    resourceVersion, an inventory revision, an upstream ETag) set the ETag
+    header themselves and the body is not hashed. Streaming responses, errors
+    and already-encoded bodies are passed through untouched. Bodies of at least
+    ``offload_size`` bytes are hashed and compressed in a worker thread so the
+    event loop keeps serving other requests meanwhile.
+    """
+
+    def __init__(self, app, minimum_size=1024, gzip_level=6, brotli_quality=4, etag=True, offload_size=65536):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.etag = etag
+        self.offload_size = offload_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        start = None
+        chunks = []
+        bypass = False
+
+        async def send_wrapper(message):
+            nonlocal start, bypass
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                media_type = headers.get("content-type", "").split(";")[0].strip()
+                if message["status"] != 200 or "content-encoding" in headers or media_type in STREAMING_MEDIA_TYPES:
+                    bypass = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if bypass or message["type"] != "http.response.body":
+                await send(message)
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                await self._finish(start, b"".join(chunks), if_none_match, accepted, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _run(self, body, fn, *args, **kwargs):
+        # hashlib, zlib and brotli release the GIL, so large bodies really run off the loop
+        if len(body) >= self.offload_size:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+    async def _finish(self, start, body, if_none_match, accepted, send):
+        headers = MutableHeaders(raw=list(start["headers"]))
+        etag = headers.get("etag")
+        if etag is None and self.etag:
+            digest = await self._run(body, lambda: hashlib.blake2b(body, digest_size=16).hexdigest())
+            etag = '"%s"' % digest
+
+        if etag is not None and _not_modified(if_none_match, etag):
+            not_modified = MutableHeaders()
+            not_modified["ETag"] = etag
+            for name in ("cache-control", "vary", "x-cache", "x-cache-age", "x-inventory-revision", "x-resource-version"):
+                if name in headers:
+                    not_modified[name] = headers[name]
+            not_modified.add_vary_header("Accept-Encoding")
+            await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        encoding = None
+        if len(body) >= self.minimum_size:
+            if brotli is not None and "br" in accepted:
+                encoding, body = "br", await self._run(body, brotli.compress, body, quality=self.brotli_quality)
+            elif "gzip" in accepted:
+                encoding, body = "gzip", await self._run(body, gzip.compress, body, compresslevel=self.gzip_level)
+        headers.add_vary_header("Accept-Encoding")
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            if etag is not None:
+                etag = _encoded_tag(etag, encoding)
+        if etag is not None:
+            headers["ETag"] = etag
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
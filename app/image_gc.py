@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+from .admission import TokenBucket
+from .fleet import DOCKER_ENDPOINT_TYPES, gather_bounded
+from .image_pull import split_image_ref
+
+GC_CATEGORIES = ("dangling", "superseded", "unreferenced")
+
+_NO_TAG = "<none>:<none>"
+
+
+def _tags(image):
+    return [tag for tag in image.get("RepoTags") or [] if tag != _NO_TAG]
+
+
+def classify_images(images, containers, keep_latest=1):
+    """Split one host's images into GC candidates; images used by any container are never candidates.
+
+    ``dangling`` images have no tag. ``superseded`` images only carry tags of
+    repositories that have at least ``keep_latest`` newer images on the host.
+    The remaining unused tagged images are ``unreferenced``. Returns
+    ``{image_id: category}``.
+    """
+    referenced = {c.get("ImageID") for c in containers} | {c.get("Image") for c in containers}
+    # Repository -> {image_id: image}; an image tagged app:1.2 and app:latest counts once
+    by_repo = {}
+    for image in images:
+        for tag in _tags(image):
+            by_repo.setdefault(split_image_ref(tag)[0], {})[image["Id"]] = image
+
+    # Per repository, the images to keep: the newest ``keep_latest`` by creation time
+    kept = set()
+    for repo_images in by_repo.values():
+        newest = sorted(repo_images.values(), key=lambda i: i.get("Created") or 0, reverse=True)
+        kept.update(image["Id"] for image in newest[:keep_latest])
+
+    categories = {}
+    for image in images:
+        tags = _tags(image)
+        if image["Id"] in referenced or referenced.intersection(tags):
+            continue
+        if not tags:
+            categories[image["Id"]] = "dangling"
+        elif image["Id"] not in kept:
+            categories[image["Id"]] = "superseded"
+        else:
+            categories[image["Id"]] = "unreferenced"
+    return categories
+
+
+async def plan_image_gc(service, endpoint_ids=None, categories=GC_CATEGORIES, keep_latest=1, concurrency=16, timeout=None):
+    """Build an image -> container reference index on every Docker environment and list what can go.
+
+    Containers are listed with ``all=1``: an image used only by a stopped
+    container is still referenced. ``reclaimable_bytes`` sums image sizes, so
+    layers shared between images make it an upper bound.
+    """
+    started = time.monotonic()
+    endpoints = await service.get_endpoints()
+    if endpoint_ids:
+        endpoints = [e for e in endpoints if e.get("Id") in endpoint_ids]
+    endpoints = [e for e in endpoints if e.get("Type") in DOCKER_ENDPOINT_TYPES]
+
+    async def load(endpoint):
+        images, containers = await asyncio.gather(
+            service.get_images(endpoint["Id"]), service.find_containers(endpoint["Id"])
+        )
+        return images, containers
+
+    hosts, errors = [], []
+    for endpoint, result, error, elapsed in await gather_bounded(endpoints, load, concurrency, timeout):
+        entry = {"endpoint_id": endpoint["Id"], "endpoint_name": endpoint.get("Name")}
+        if error is not None:
+            errors.append({**entry, "error": error})
+            continue
+        images, containers = result
+        candidates = classify_images(images, containers, keep_latest)
+        planned = [
+            {
+                "id": image["Id"],
+                "tags": _tags(image),
+                "category": candidates[image["Id"]],
+                "size": image.get("Size") or 0,
+                "created": image.get("Created"),
+            }
+            for image in images if candidates.get(image["Id"]) in categories
+        ]
+        planned.sort(key=lambda item: (GC_CATEGORIES.index(item["category"]), item["created"] or 0))
+        hosts.append({
+            **entry,
+            "images": len(images),
+            "containers": len(containers),
+            "candidates": {category: sum(1 for i in planned if i["category"] == category) for category in categories},
+            "reclaimable_bytes": sum(item["size"] for item in planned),
+            "remove": planned,
+            "elapsed_ms": round(elapsed * 1000, 1),
+        })
+
+    return {
+        "categories": list(categories),
+        "keep_latest": keep_latest,
+        "total_images": sum(len(host["remove"]) for host in hosts),
+        "reclaimable_bytes": sum(host["reclaimable_bytes"] for host in hosts),
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "endpoints": hosts,
+        "errors": errors,
+    }
+
+
+async def run_image_gc(service, approved, parallelism=10, rate=0.0, dry_run=False, concurrency=16):
+    """Remove an approved list of ``{endpoint_id, image_id}``.
+
+    The plan is rebuilt first and only images that are still candidates are
+    removed, so an image that a container started using since the plan was
+    approved is skipped. Removals run ``parallelism`` at a time and, with
+    ``rate`` > 0, start at most ``rate`` per second across the fleet.
+    Tagged images are untagged tag by tag (the last untag deletes them),
+    so multi-tag images are never force-removed.
+    """
+    started = time.monotonic()
+    endpoint_ids = sorted({item["endpoint_id"] for item in approved})
+    current = await plan_image_gc(service, endpoint_ids, GC_CATEGORIES, concurrency=concurrency)
+    eligible = {
+        (host["endpoint_id"], image["id"]): image
+        for host in current["endpoints"] for image in host["remove"]
+    }
+    unreachable = {error["endpoint_id"]: error["error"] for error in current["errors"]}
+
+    work, results = [], []
+    for item in approved:
+        key = (item["endpoint_id"], item["image_id"])
+        image = eligible.get(key)
+        if image is None:
+            reason = unreachable.get(item["endpoint_id"], "no longer a candidate (in use, already removed or unknown)")
+            results.append({**item, "status": "skipped", "reason": reason})
+        elif dry_run:
+            results.append({**item, "status": "planned", "category": image["category"], "size": image["size"]})
+        else:
+            work.append((item, image))
+
+    bucket = TokenBucket(rate, max(1.0, rate)) if rate > 0 else None
+
+    async def remove(entry):
+        item, image = entry
+        for reference in image["tags"] or [image["id"]]:
+            if bucket is not None:
+                while wait := bucket.take():
+                    await asyncio.sleep(wait)
+            await service.remove_image(reference, item["endpoint_id"])
+
+    for (item, image), _, error, elapsed in await gather_bounded(work, remove, parallelism):
+        result = {**item, "category": image["category"], "size": image["size"], "elapsed_ms": round(elapsed * 1000, 1)}
+        if error is None:
+            result["status"] = "removed"
+        else:
+            result.update(status="error", error=error)
+        results.append(result)
+
+    # Report in the order the images were approved
+    position = {(item["endpoint_id"], item["image_id"]): index for index, item in enumerate(approved)}
+    results.sort(key=lambda r: position[(r["endpoint_id"], r["image_id"])])
+    return {
+        "dry_run": dry_run,
+        "removed": sum(1 for r in results if r["status"] == "removed"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "reclaimed_bytes": sum(r["size"] for r in results if r["status"] in ("removed", "planned")),
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "results": results,
+    }
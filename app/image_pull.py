@@ -0,0 +1,136 @@
+import asyncio
+import time
+from contextlib import aclosing
+
+# Docker pull status -> coarse layer state
+_LAYER_STATES = {
+    "Pulling fs layer": "waiting",
+    "Waiting": "waiting",
+    "Downloading": "downloading",
+    "Verifying Checksum": "downloading",
+    "Download complete": "downloaded",
+    "Extracting": "extracting",
+    "Pull complete": "complete",
+    "Already exists": "complete",
+}
+
+
+def split_image_ref(ref, default_tag="latest"):
+    """Split ``repo[:tag]`` into ``(repo, tag)``; a ``:`` inside a registry host:port is not a tag."""
+    if "@" in ref:
+        return ref, None
+    repo, sep, tag = ref.rpartition(":")
+    if sep and "/" not in tag:
+        return repo, tag
+    return ref, default_tag
+
+
+class PullProgress:
+    """Fold Docker's per-layer pull messages into one aggregated progress view."""
+
+    def __init__(self, image):
+        self.image = image
+        self.layers = {}
+        self.status = None
+        self.digest = None
+        self.error = None
+
+    def update(self, message):
+        if "error" in message:
+            self.error = message.get("error")
+            return
+        status = message.get("status", "")
+        layer_id = message.get("id")
+        if layer_id and status in _LAYER_STATES:
+            layer = self.layers.setdefault(layer_id, {"state": "waiting", "current": 0, "total": 0})
+            layer["state"] = _LAYER_STATES[status]
+            detail = message.get("progressDetail") or {}
+            if layer["state"] == "downloading" and detail.get("total"):
+                layer["current"] = detail.get("current", 0)
+                layer["total"] = detail["total"]
+            elif layer["state"] in ("downloaded", "extracting", "complete"):
+                layer["current"] = layer["total"]
+        elif status.startswith("Digest: "):
+            self.digest = status[len("Digest: "):]
+        elif status.startswith("Status: "):
+            self.status = status[len("Status: "):]
+
+    def snapshot(self):
+        states = {}
+        for layer in self.layers.values():
+            states[layer["state"]] = states.get(layer["state"], 0) + 1
+        current = sum(layer["current"] for layer in self.layers.values())
+        total = sum(layer["total"] for layer in self.layers.values())
+        return {
+            "event": "progress",
+            "image": self.image,
+            "layers": {"total": len(self.layers), **states},
+            "downloaded_bytes": current,
+            "total_bytes": total,
+            "percent": round(100 * current / total, 1) if total else None,
+        }
+
+    def result(self):
+        if self.error is not None:
+            return {"event": "error", "image": self.image, "error": self.error}
+        return {"event": "done", "image": self.image, "status": self.status, "digest": self.digest}
+
+
+async def pull_progress_events(service, image_ref, tag, endpoint_id, interval):
+    """Yield throttled progress events for one pull, ending with a ``done`` or ``error`` event."""
+    from_image, tag = split_image_ref(image_ref, tag)
+    label = f"{from_image}:{tag}" if tag else from_image
+    progress = PullProgress(label)
+    last_sent = 0.0
+    try:
+        # Closed on the way out, so an early break releases the upstream stream and its slot right away
+        async with aclosing(service.stream_pull_image(from_image, tag, endpoint_id)) as messages:
+            async for message in messages:
+                progress.update(message)
+                if progress.error is not None:
+                    break
+                now = time.monotonic()
+                if now - last_sent >= interval:
+                    last_sent = now
+                    yield progress.snapshot()
+    except Exception as e:
+        progress.error = str(e) or type(e).__name__
+    if progress.error is None:
+        yield progress.snapshot()
+    yield progress.result()
+
+
+async def multiplex_pulls(service, image_refs, tag, endpoint_id, interval, queue_size=64):
+    """Run several pulls concurrently and interleave their events into one stream.
+
+    The queue is bounded, so a slow client throttles the upstream reads instead
+    of letting events pile up in memory.
+    """
+    if len(image_refs) == 1:
+        async for event in pull_progress_events(service, image_refs[0], tag, endpoint_id, interval):
+            yield event
+        return
+
+    queue = asyncio.Queue(maxsize=queue_size)
+    finished = object()
+
+    async def pump(ref):
+        async for event in pull_progress_events(service, ref, tag, endpoint_id, interval):
+            await queue.put(event)
+        # Only reached while the consumer is still reading: a client that went
+        # away cancels the pumps, and a full queue would never drain for this put
+        await queue.put(finished)
+
+    tasks = [asyncio.create_task(pump(ref)) for ref in image_refs]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is finished:
+                remaining -= 1
+            else:
+                yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
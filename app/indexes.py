@@ -0,0 +1,61 @@
+# Portainer StackType values
+SWARM_STACK, COMPOSE_STACK, KUBERNETES_STACK = 1, 2, 3
+
+
+class StackIndex:
+    """Stacks of one environment indexed by id, type and name."""
+
+    def __init__(self, stacks):
+        self.stacks = stacks
+        self.by_id = {}
+        self.by_type = {}
+        self.by_name = {}
+        for stack in stacks:
+            self.by_id[stack.get("Id")] = stack
+            self.by_type.setdefault(stack.get("Type"), []).append(stack)
+            self.by_name[stack.get("Name")] = stack
+
+    def of_type(self, stack_type):
+        return self.by_type.get(stack_type, [])
+
+    def named(self, name):
+        return self.by_name.get(name)
+
+
+class MembershipIndex:
+    """Team memberships indexed by ``(team_id, user_id)`` and by team."""
+
+    def __init__(self, memberships):
+        self.by_pair = {}
+        self.by_team = {}
+        for membership in memberships:
+            team_id, user_id = membership.get("TeamID"), membership.get("UserID")
+            self.by_pair[(team_id, user_id)] = membership
+            self.by_team.setdefault(team_id, {})[user_id] = membership
+
+    def get(self, team_id, user_id):
+        return self.by_pair.get((team_id, user_id))
+
+    def members(self, team_id):
+        """``{user_id: membership}`` for one team."""
+        return self.by_team.get(team_id, {})
+
+
+class IndexCache:
+    """Keep one index per key, rebuilt only when its source list changes.
+
+    The sources are the read-only lists handed out by ``TTLCache``: the same
+    object is returned until the entry is refreshed or invalidated, so
+    identity tells whether the index is still current.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+
+    def get(self, key, source, build):
+        cached = self._indexes.get(key)
+        if cached is not None and cached[0] is source:
+            return cached[1]
+        index = build(source)
+        self._indexes[key] = (source, index)
+        return index
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+KIND_NAMES = {
+    "nodes": ("NodeList", "v1"),
+    "namespaces": ("NamespaceList", "v1"),
+    "pods": ("PodList", "v1"),
+    "deployments": ("DeploymentList", "apps/v1"),
+    "services": ("ServiceList", "v1"),
+}
+
+
+class ResourceExpired(Exception):
+    """The watch resourceVersion is too old (410 Gone); a full relist is required."""
+
+
+def parse_label_selector(selector):
+    """Parse an equality-based label selector into ``(key, op, value)`` terms.
+
+    Supports ``k=v``, ``k==v``, ``k!=v``, ``k`` and ``!k``. Returns None for
+    set-based selectors (``in``/``notin``), which are left to the API server.
+    """
+    if not selector:
+        return []
+    terms = []
+    for raw in selector.split(","):
+        term = raw.strip()
+        if not term:
+            continue
+        if "(" in term or " in " in term or " notin " in term:
+            return None
+        if "!=" in term:
+            key, value = term.split("!=", 1)
+            terms.append((key.strip(), "!=", value.strip()))
+        elif "==" in term:
+            key, value = term.split("==", 1)
+            terms.append((key.strip(), "=", value.strip()))
+        elif "=" in term:
+            key, value = term.split("=", 1)
+            terms.append((key.strip(), "=", value.strip()))
+        elif term.startswith("!"):
+            terms.append((term[1:].strip(), "!", None))
+        else:
+            terms.append((term, "exists", None))
+    return terms
+
+
+def _matches(labels, terms):
+    for key, op, value in terms:
+        if op == "=" and labels.get(key) != value:
+            return False
+        if op == "!=" and labels.get(key) == value:
+            return False
+        if op == "exists" and key not in labels:
+            return False
+        if op == "!" and key in labels:
+            return False
+    return True
+
+
+class KubernetesInformer:
+    """Keep one Kubernetes resource of one environment in memory via LIST + WATCH.
+
+    Objects are indexed by namespace, by ``(label, value)`` and by owner UID.
+    The watch resumes from the last seen resourceVersion and falls back to a
+    full relist when the server answers 410 Gone.
+    """
+
+    def __init__(self, service, endpoint_id, resource, page_size=500, watch_timeout=300):
+        self.service = service
+        self.endpoint_id = endpoint_id
+        self.resource = resource
+        self.path = service.kubernetes_list_path(resource)
+        self.page_size = page_size
+        self.watch_timeout = watch_timeout
+        self.resource_version = None
+        self.synced = False
+        self.synced_at = None
+        self.last_heard_at = None
+        self.relists = 0
+        self.events = 0
+        self.last_error = None
+        self._task = None
+        self._reset()
+
+    def _reset(self):
+        self.objects = {}
+        self.by_namespace = defaultdict(set)
+        self.by_label = defaultdict(set)
+        self.by_owner = defaultdict(set)
+
+    # Store
+    @staticmethod
+    def _key(obj):
+        metadata = obj.get("metadata") or {}
+        return metadata.get("namespace"), metadata.get("name")
+
+    def _index(self, key, obj):
+        metadata = obj.get("metadata") or {}
+        self.by_namespace[key[0]].add(key)
+        for label in (metadata.get("labels") or {}).items():
+            self.by_label[label].add(key)
+        for owner in metadata.get("ownerReferences") or []:
+            self.by_owner[owner.get("uid")].add(key)
+
+    def _unindex(self, key, obj):
+        metadata = obj.get("metadata") or {}
+        self.by_namespace[key[0]].discard(key)
+        for label in (metadata.get("labels") or {}).items():
+            self.by_label[label].discard(key)
+        for owner in metadata.get("ownerReferences") or []:
+            self.by_owner[owner.get("uid")].discard(key)
+
+    def _upsert(self, obj):
+        key = self._key(obj)
+        previous = self.objects.get(key)
+        if previous is not None:
+            self._unindex(key, previous)
+        self.objects[key] = obj
+        self._index(key, obj)
+
+    def _delete(self, obj):
+        key = self._key(obj)
+        previous = self.objects.pop(key, None)
+        if previous is not None:
+            self._unindex(key, previous)
+
+    # Queries
+    def list(self, namespace=None, label_terms=None, owner_uid=None):
+        candidates = None
+        if namespace:
+            candidates = set(self.by_namespace.get(namespace, ()))
+        for key, op, value in label_terms or []:
+            if op == "=":
+                matching = self.by_label.get((key, value), set())
+                candidates = set(matching) if candidates is None else candidates & matching
+        if owner_uid:
+            matching = self.by_owner.get(owner_uid, set())
+            candidates = set(matching) if candidates is None else candidates & matching
+        keys = self.objects.keys() if candidates is None else candidates
+        items = [self.objects[k] for k in keys if k in self.objects]
+        if label_terms:
+            items = [o for o in items if _matches((o.get("metadata") or {}).get("labels") or {}, label_terms)]
+        items.sort(key=self._key_sort)
+        return items
+
+    @staticmethod
+    def _key_sort(obj):
+        metadata = obj.get("metadata") or {}
+        return metadata.get("namespace") or "", metadata.get("name") or ""
+
+    def list_response(self, namespace=None, label_terms=None):
+        kind, api_version = KIND_NAMES.get(self.resource, ("List", "v1"))
+        return {
+            "kind": kind,
+            "apiVersion": api_version,
+            "metadata": {"resourceVersion": self.resource_version},
+            "items": self.list(namespace, label_terms),
+        }
+
+    def age(self):
+        """Seconds since the API server last confirmed this view (event, bookmark or relist)."""
+        if self.last_heard_at is None:
+            return None
+        return time.monotonic() - self.last_heard_at
+
+    def stats(self):
+        age = self.age()
+        return {
+            "endpoint_id": self.endpoint_id,
+            "resource": self.resource,
+            "synced": self.synced,
+            "objects": len(self.objects),
+            "resource_version": self.resource_version,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "events": self.events,
+            "relists": self.relists,
+            "last_error": self.last_error,
+        }
+
+    # Sync loop
+    async def _relist(self):
+        # Routes fall back to the API server until the new snapshot is complete
+        self.synced = False
+        self._reset()
+        continue_token = None
+        resource_version = None
+        while True:
+            page = await self.service._get_k8s_resource(
+                self.endpoint_id, self.path, limit=self.page_size, continue_token=continue_token
+            )
+            metadata = page.get("metadata") or {}
+            resource_version = resource_version or metadata.get("resourceVersion")
+            for obj in page.get("items") or []:
+                self._upsert(obj)
+            continue_token = metadata.get("continue")
+            if not continue_token:
+                break
+        self.resource_version = resource_version
+        self.relists += 1
+        self.synced = True
+        self.synced_at = time.time()
+        self.last_heard_at = time.monotonic()
+
+    async def _watch(self):
+        async for event in self.service.watch_k8s_resource(
+            self.endpoint_id, self.path, self.resource_version, self.watch_timeout
+        ):
+            event_type = event.get("type")
+            obj = event.get("object") or {}
+            self.last_heard_at = time.monotonic()
+            if event_type == "ERROR":
+                if obj.get("code") == 410:
+                    raise ResourceExpired(obj.get("message"))
+                raise Exception(obj.get("message") or "watch error")
+            if event_type in ("ADDED", "MODIFIED"):
+                self._upsert(obj)
+            elif event_type == "DELETED":
+                self._delete(obj)
+            self.events += 1
+            self.resource_version = (obj.get("metadata") or {}).get("resourceVersion") or self.resource_version
+
+    async def run(self):
+        backoff = 1.0
+        need_relist = True
+        while True:
+            events = self.events
+            try:
+                if need_relist:
+                    await self._relist()
+                    need_relist = False
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except ResourceExpired:
+                need_relist = True
+            except httpx.HTTPStatusError as e:
+                need_relist = True
+                if e.response.status_code != 410:
+                    await self._fail(e, backoff)
+                    backoff = min(backoff * 2, 30.0)
+                    continue
+            except Exception as e:
+                need_relist = True
+                await self._fail(e, backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            if self.events > events:
+                backoff = 1.0  # the watch made progress; resume from resourceVersion right away
+            else:
+                # Bookmarks keep healthy watches busy, so an empty one (closed stream, bare 410) must not spin
+                await asyncio.sleep(backoff * (0.5 + random.random()))
+                backoff = min(backoff * 2, 30.0)
+
+    async def _fail(self, error, backoff):
+        self.last_error = str(error) or type(error).__name__
+        logger.warning("Informer %s/%s failed: %s", self.endpoint_id, self.resource, self.last_error)
+        await asyncio.sleep(backoff * (0.5 + random.random()))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class InformerRegistry:
+    """Opt-in informers keyed by ``(endpoint_id, resource)``."""
+
+    def __init__(self, service, page_size=500):
+        self.service = service
+        self.page_size = page_size
+        self._informers = {}
+
+    def get(self, endpoint_id, resource):
+        return self._informers.get((endpoint_id, resource))
+
+    def start(self, endpoint_id, resource):
+        informer = self._informers.get((endpoint_id, resource))
+        if informer is None:
+            informer = KubernetesInformer(self.service, endpoint_id, resource, self.page_size)
+            self._informers[(endpoint_id, resource)] = informer
+        informer.start()
+        return informer
+
+    async def stop(self, endpoint_id, resource):
+        informer = self._informers.pop((endpoint_id, resource), None)
+        if informer is not None:
+            await informer.stop()
+        return informer is not None
+
+    async def aclose(self):
+        for informer in self._informers.values():
+            await informer.stop()
+        self._informers.clear()
+
+    def stats(self):
+        return [informer.stats() for informer in self._informers.values()]
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("succeeded", "failed")
+
+
+class JobQueueFull(Exception):
+    """The job backlog is at capacity; the client should retry later."""
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different operation or payload."""
+
+
+def fingerprint(kind, params):
+    """Stable hash of a job's inputs; kept instead of the inputs, which may hold credentials."""
+    payload = json.dumps([kind, params], sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+class Job:
+    """One queued operation, its outcome and the ordered events clients can follow."""
+
+    def __init__(self, kind, fn, target=None, idempotency_key=None, fingerprint=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target = target or {}
+        self.idempotency_key = idempotency_key
+        self.fingerprint = fingerprint
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self._fn = fn
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATES
+
+    async def publish(self, event, **data):
+        """Append an event and wake every follower; used by job functions to report progress."""
+        self.events.append({"seq": len(self.events) + 1, "event": event, "job_id": self.id, "time": time.time(), **data})
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def wait(self, timeout):
+        """Wait up to ``timeout`` seconds for the job to finish (long-poll)."""
+        async def finished():
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done)
+
+        try:
+            await asyncio.wait_for(finished(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def follow(self, after=0):
+        """Yield events after sequence number ``after`` as they happen, until the job finishes."""
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) > after or self.done)
+            for event in self.events[after:]:
+                yield event
+            after = len(self.events)
+            if self.done:
+                return
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "target": self.target,
+            "idempotency_key": self.idempotency_key,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "events": len(self.events),
+        }
+
+
+class JobQueue:
+    """Bounded in-process worker pool for long-running mutations.
+
+    Jobs are kept for ``retention`` seconds after they finish. A job submitted
+    with an idempotency key that is still retained returns the existing job
+    instead of running the operation again.
+    """
+
+    def __init__(self, workers=4, max_queued=1000, retention=3600.0):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self._jobs = OrderedDict()
+        self._keys = {}
+        self._queue = None
+        self._tasks = []
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def list(self, status=None, kind=None):
+        return [
+            job for job in reversed(self._jobs.values())
+            if (status is None or job.status == status) and (kind is None or job.kind == kind)
+        ]
+
+    def submit(self, kind, fn, params=None, target=None, idempotency_key=None):
+        """Queue ``fn(job)`` and return ``(job, created)``; ``created`` is False for an idempotent replay."""
+        self._prune()
+        job_fingerprint = fingerprint(kind, params)
+        if idempotency_key is not None:
+            existing = self._jobs.get(self._keys.get(idempotency_key))
+            if existing is not None:
+                if existing.fingerprint != job_fingerprint:
+                    raise IdempotencyConflict(f"Idempotency key '{idempotency_key}' was already used for a different request")
+                return existing, False
+        self._start()
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Job queue is full ({self.max_queued} jobs waiting)")
+        job = Job(kind, fn, target, idempotency_key, job_fingerprint)
+        job.events.append({"seq": 1, "event": "queued", "job_id": job.id, "time": job.created_at})
+        self._jobs[job.id] = job
+        if idempotency_key is not None:
+            self._keys[idempotency_key] = job.id
+        self._queue.put_nowait(job)
+        return job, True
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [jid for jid, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            job = self._jobs.pop(job_id)
+            if job.idempotency_key is not None and self._keys.get(job.idempotency_key) == job_id:
+                del self._keys[job.idempotency_key]
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+        await job.publish("started")
+        try:
+            job.result = await job._fn(job)
+        except asyncio.CancelledError:
+            job.status, job.error = "failed", "cancelled"
+            raise
+        except Exception as e:
+            job.status, job.error = "failed", str(e) or type(e).__name__
+            logger.warning("Job %s (%s) failed: %s", job.id, job.kind, job.error)
+        else:
+            job.status = "succeeded"
+        finally:
+            job.finished_at = time.time()
+            job._fn = None
+            await job.publish(job.status, result=job.result, error=job.error)
+
+    async def aclose(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        counts = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0, **counts}
@@ -1,6 +1,31 @@
-from fastapi import FastAPI, HTTPException, Body, File, UploadFile, Form
-from pydantic import BaseModel
-from .portainer_service import portainer_service
+import asyncio
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Literal
+from fastapi import FastAPI, HTTPException, Body, Depends, File, UploadFile, Form, Header, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from .admission import AdmissionMiddleware, AdmissionRejected, ClientRateLimiter, priority
+from .batch import BATCH_HEADER, InvalidBatch, plan_batch, run_batch
+from .bulk import resolve_container_targets, run_container_action
+from .config import settings
+from .container_inventory import ContainerInventoryRegistry
+from .fleet import DOCKER_ENDPOINT_TYPES, FLEET_RESOURCES, federated_query, fleet_query, gather_bounded
+from .http_cache import ConditionalResponseMiddleware, version_etag
+from .image_gc import GC_CATEGORIES, plan_image_gc, run_image_gc
+from .image_pull import multiplex_pulls, split_image_ref
+from .informer import InformerRegistry, parse_label_selector
+from .jobs import IdempotencyConflict, JobQueue, JobQueueFull
+from .memberships import sync_team_members
+from .metrics import MetricsMiddleware, render as render_metrics
+from .portainer_service import KUBERNETES_LISTS, PortainerService, portainer_service, portainer_services
+from .query import docker_filters, list_options, project, shape_list
+from .resilience import CircuitOpenError
+from .rollout import StackRollout
+from .snapshot import SNAPSHOT_KINDS, SnapshotRefresher, SnapshotStore
+from .responses import FastJSONResponse, passthrough
+from .streaming import encode_ndjson, encode_sse
 
 # Pydantic models for request bodies
 class UserCreate(BaseModel):
@@ -15,6 +40,12 @@ class TeamMembershipCreate(BaseModel):
     user_id: int
     role: int = 2
 
+class TeamMembersSync(BaseModel):
+    members: list[TeamMembershipCreate]
+    remove_missing: bool = True # Remove members not in the list
+    parallelism: int | None = Field(None, ge=1)
+    dry_run: bool = False
+
 class KubernetesAppCreate(BaseModel):
     name: str
     manifest: str # The YAML content
@@ -33,60 +64,271 @@ class StackFromRepositoryCreate(BaseModel):
     repository_password: str | None = None
 
 
+def _snapshot_path(instance):
+    # The default instance keeps SNAPSHOT_PATH; the others get "<name>.<instance><ext>" next to it
+    if instance == portainer_service.name:
+        return settings.snapshot_path
+    root, ext = os.path.splitext(settings.snapshot_path)
+    return f"{root}.{instance}{ext}"
+
+# Informers, inventories and snapshots belong to one Portainer instance; all keyed by instance name
+informers = {name: InformerRegistry(service, page_size=settings.k8s_page_size) for name, service in portainer_services.items()}
+inventories = {
+    name: ContainerInventoryRegistry(service, settings.docker_inventory_reconcile_interval)
+    for name, service in portainer_services.items()
+}
+snapshots = {}
+if settings.snapshot_path:
+    snapshots = {
+        name: SnapshotRefresher(
+            service,
+            SnapshotStore(_snapshot_path(name)),
+            interval=settings.snapshot_refresh_interval,
+            concurrency=settings.fleet_concurrency,
+        )
+        for name, service in portainer_services.items()
+    }
+jobs = JobQueue(workers=settings.job_workers, max_queued=settings.job_max_queued, retention=settings.job_retention)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # K8S_INFORMERS and DOCKER_INVENTORY_ENDPOINTS name environments of the default instance
+    for endpoint_id, resources in settings.k8s_informers.items():
+        for resource in resources:
+            informers[portainer_service.name].start(endpoint_id, resource)
+    for endpoint_id in settings.docker_inventory_endpoints:
+        inventories[portainer_service.name].start(endpoint_id)
+    for refresher in snapshots.values():
+        refresher.start()
+    yield
+    for refresher in snapshots.values():
+        await refresher.stop()
+        refresher.store.close()
+    await jobs.aclose()
+    for name, service in portainer_services.items():
+        await informers[name].aclose()
+        await inventories[name].aclose()
+        await service.aclose()
+
+class StackRolloutCreate(BaseModel):
+    name: str
+    stack_file_content: str
+    endpoint_ids: list[int] | None = None # All Docker environments when empty
+    waves: list[int] = Field([1, 5], min_length=1) # Wave sizes; the last one repeats (canary of 1, then 5 at a time)
+    parallelism: int | None = Field(None, ge=1) # Deploys in flight within a wave (default: the whole wave)
+    on_failure: Literal["rollback", "stop", "continue"] = "rollback"
+    max_failures: int = Field(0, ge=0) # Failed environments tolerated before on_failure applies
+    health_timeout: float = Field(120.0, gt=0)
+    health_interval: float = Field(3.0, gt=0)
+    force: bool = False # Redeploy environments whose stack file is unchanged
+
+class ContainerTarget(BaseModel):
+    endpoint_id: int
+    container_id: str
+
+class BulkContainerAction(BaseModel):
+    action: Literal["start", "stop", "restart"]
+    # Either explicit targets...
+    targets: list[ContainerTarget] = []
+    # ...or a filter resolved on each environment (all Docker environments if endpoint_ids is empty)
+    endpoint_ids: list[int] | None = None
+    labels: list[str] | None = None # "key" or "key=value"
+    name: str | None = None
+    parallelism: int | None = Field(None, ge=1)
+    batch_size: int | None = Field(None, ge=1)
+
+class ImageGCTarget(BaseModel):
+    endpoint_id: int
+    image_id: str
+
+class ImageGCRun(BaseModel):
+    images: list[ImageGCTarget] # Usually the "remove" entries of an approved plan
+    parallelism: int | None = Field(None, ge=1)
+    rate: float | None = Field(None, ge=0) # Removal calls per second across the fleet (0 = unlimited)
+    dry_run: bool = False
+
+class BatchOperation(BaseModel):
+    id: str | None = None # Name used to reference the result; defaults to the position
+    method: Literal["GET", "POST", "PUT", "DELETE"] = "GET"
+    path: str # e.g. "/api/v1/containers?endpoint_id=${endpoints[0].Id}"
+    params: dict[str, Any] | None = None
+    body: Any = None
+    depends_on: list[str] = [] # Extra ordering beyond the ${id...} references
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation]
+    concurrency: int | None = Field(None, ge=1)
+
+
 app = FastAPI(
     title="MCP Portainer API",
     description="API para gerenciar o Portainer CE.",
     version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+app.add_middleware(
+    ConditionalResponseMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality,
+    etag=settings.etag_enabled,
+    offload_size=settings.compression_offload_size,
 )
+client_rate_limiter = None
+if settings.admission_enabled:
+    if settings.client_rate_limit > 0:
+        client_rate_limiter = ClientRateLimiter(settings.client_rate_limit, settings.client_burst)
+    app.add_middleware(
+        AdmissionMiddleware,
+        rate_limiter=client_rate_limiter,
+        client_header=settings.client_id_header,
+        bulk_cost=settings.bulk_request_cost,
+    )
+if settings.metrics_enabled:
+    # Added last so it is outermost and times compression too
+    app.add_middleware(MetricsMiddleware)
+
+def upstream_error(e):
+    """Map a failed upstream call to an HTTP error; an open circuit is a retryable 503, shed load a 429."""
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    if isinstance(e, AdmissionRejected):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+    return HTTPException(status_code=500, detail=str(e))
+
+async def portainer_instance(
+    instance: str | None = Query(None, description="Portainer instance from PORTAINER_INSTANCES (default instance when omitted)"),
+) -> PortainerService:
+    """Route dependency selecting the Portainer server a request goes to."""
+    if instance is None:
+        return portainer_service
+    service = portainer_services.get(instance)
+    if service is None:
+        raise HTTPException(status_code=404, detail=f"Unknown Portainer instance '{instance}'. Use one of: {', '.join(portainer_services)}")
+    return service
+
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 @app.get("/api/v1/health", tags=["Health"])
-def health_check():
-    return {"status": "ok"}
+async def health_check():
+    health = {"status": "ok"}
+    if portainer_service.cache is not None:
+        health["cache"] = portainer_service.cache.stats()
+    if portainer_service.inflight is not None:
+        health["coalescing"] = portainer_service.inflight.stats()
+    health["circuit_breakers"] = portainer_service.breakers.stats()
+    if portainer_service.admission is not None:
+        health["admission"] = {"upstream": portainer_service.admission.stats()}
+        if client_rate_limiter is not None:
+            health["admission"]["clients"] = client_rate_limiter.stats()
+    health["jobs"] = jobs.stats()
+    if snapshots:
+        health["snapshot"] = snapshots[portainer_service.name].stats()
+    if len(portainer_services) > 1:
+        # The fields above describe the default instance; the others are summarized here
+        health["instances"] = {
+            name: {
+                "url": service.portainer_url,
+                "circuit_breakers": service.breakers.stats(),
+                **({"admission": service.admission.stats()} if service.admission is not None else {}),
+                **({"snapshot": snapshots[name].stats()} if snapshots else {}),
+            }
+            for name, service in portainer_services.items() if service is not portainer_service
+        }
+    return health
+
+def submit_job(kind, fn, params, target, idempotency_key, service=portainer_service):
+    """Queue ``fn(job)`` in the background; returns ``(job, created)``, where replays return the original job."""
+    if service is not portainer_service:
+        # The same key sent to another instance is a different operation
+        params, target = {**params, "instance": service.name}, {**target, "instance": service.name}
+
+    async def run(job):
+        # Background work yields Portainer capacity to interactive requests
+        with priority("bulk"):
+            return await fn(job)
+
+    try:
+        job, created = jobs.submit(kind, run, params, target, idempotency_key)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job, created
+
+def job_headers(job, created):
+    headers = {"Location": f"/api/v1/jobs/{job.id}"}
+    if not created:
+        headers["Idempotent-Replayed"] = "true"
+    return headers
+
+def enqueue(kind, fn, params, target, idempotency_key, service=portainer_service):
+    """Run ``fn(job)`` in the background and answer ``202`` with the job; replays return the original job."""
+    job, created = submit_job(kind, fn, params, target, idempotency_key, service)
+    return FastJSONResponse(job.summary(), status_code=202, headers=job_headers(job, created))
 
 @app.get("/api/v1/stacks", tags=["Stacks"])
-def get_stacks(endpoint_id: int = 3):
+async def get_stacks(endpoint_id: int = 3, name: str = None, type: int = Query(None, description="1 = Swarm, 2 = Compose, 3 = Kubernetes"), service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_stacks(endpoint_id)
+        if name is not None or type is not None:
+            index = await service.stack_index(endpoint_id)
+            stacks = index.of_type(type) if type is not None else index.stacks
+            return [stack for stack in stacks if name is None or stack.get("Name") == name]
+        if settings.passthrough_responses:
+            return passthrough(await service.get_stacks_raw(endpoint_id))
+        return await service.get_stacks(endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/stacks/{stack_id}", tags=["Stacks"])
-def get_stack(stack_id: int):
+async def get_stack(stack_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_stack(stack_id)
+        return await service.get_stack(stack_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/stacks/{stack_id}/file", tags=["Stacks"])
-def get_stack_file(stack_id: int):
+async def get_stack_file(stack_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_stack_file(stack_id)
+        return await service.get_stack_file(stack_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/stacks/string", tags=["Stacks"])
-def create_stack_from_string(name: str, stack_file_content: str = Body(..., embed=True), endpoint_id: int = 1):
+async def create_stack_from_string(name: str, stack_file_content: str = Body(..., embed=True), endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.create_stack_from_string(name, stack_file_content, endpoint_id)
+        return await service.create_stack_from_string(name, stack_file_content, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/stacks/file", tags=["Stacks"])
 async def create_stack_from_file(
     name: str = Form(...),
     endpoint_id: int = Form(1),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    service: PortainerService = Depends(portainer_instance),
 ):
     try:
         file_content = await file.read()
-        return portainer_service.create_stack_from_file(name, file_content, endpoint_id)
+        return await service.create_stack_from_file(name, file_content, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/stacks/repository", tags=["Stacks"])
-def create_stack_from_repository(stack: StackFromRepositoryCreate):
-    try:
-        return portainer_service.create_stack_from_repository(
+async def create_stack_from_repository(
+    stack: StackFromRepositoryCreate,
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    def create(job=None):
+        return service.create_stack_from_repository(
             name=stack.name,
             repository_url=stack.repository_url,
             repository_reference_name=stack.repository_reference_name,
@@ -96,244 +338,743 @@ def create_stack_from_repository(stack: StackFromRepositoryCreate):
             repository_username=stack.repository_username,
             repository_password=stack.repository_password,
         )
+
+    if run_async:
+        target = {"name": stack.name, "endpoint_id": stack.endpoint_id}
+        return enqueue("create_stack_from_repository", create, stack.model_dump(), target, idempotency_key, service)
+    try:
+        return await create()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+@app.post("/api/v1/stacks/rollout", tags=["Stacks"])
+async def rollout_stack(
+    request: StackRolloutCreate,
+    stream: Literal["ndjson", "sse"] | None = None,
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    # Runs as a job (progress in /api/v1/jobs/{id}/events), optionally also streamed in this response
+    endpoint_ids = request.endpoint_ids
+    if not endpoint_ids:
+        try:
+            endpoints = await service.get_endpoints()
+        except Exception as e:
+            raise upstream_error(e)
+        endpoint_ids = [e["Id"] for e in endpoints if e.get("Type") in DOCKER_ENDPOINT_TYPES]
+    rollout = StackRollout(
+        service,
+        request.name,
+        request.stack_file_content,
+        endpoint_ids,
+        waves=request.waves,
+        parallelism=request.parallelism,
+        on_failure=request.on_failure,
+        max_failures=request.max_failures,
+        health_timeout=request.health_timeout,
+        health_interval=request.health_interval,
+        force=request.force,
+    )
+    params = {**request.model_dump(), "endpoint_ids": endpoint_ids}
+    target = {"name": request.name, "endpoint_ids": endpoint_ids}
+    if stream is None:
+        return enqueue("stack_rollout", lambda job: rollout.run(job.publish), params, target, idempotency_key, service)
+    # Streamed rollouts are jobs too, so a client that disconnects only stops following it
+    job, created = submit_job("stack_rollout", lambda job: rollout.run(job.publish), params, target, idempotency_key, service)
+    headers = job_headers(job, created)
+    if stream == "sse":
+        return StreamingResponse(encode_sse(job.follow()), media_type="text/event-stream", headers=headers)
+    return StreamingResponse(encode_ndjson(job.follow()), media_type="application/x-ndjson", headers=headers)
 
 @app.put("/api/v1/stacks/{stack_id}", tags=["Stacks"])
-def update_stack(stack_id: int, stack_file_content: str = Body(..., embed=True), endpoint_id: int = 1):
+async def update_stack(
+    stack_id: int,
+    stack_file_content: str = Body(..., embed=True),
+    endpoint_id: int = 1,
+    force: bool = Query(False, description="Redeploy even if the file matches the deployed one"),
+    dry_run: bool = Query(False, description="Only report whether a redeploy would happen, with a diff"),
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    if run_async:
+        return enqueue(
+            "update_stack",
+            lambda job: service.update_stack(stack_id, stack_file_content, endpoint_id, force, dry_run),
+            {"stack_id": stack_id, "stack_file_content": stack_file_content, "endpoint_id": endpoint_id, "force": force, "dry_run": dry_run},
+            {"stack_id": stack_id, "endpoint_id": endpoint_id},
+            idempotency_key,
+            service,
+        )
     try:
-        return portainer_service.update_stack(stack_id, stack_file_content, endpoint_id)
+        return await service.update_stack(stack_id, stack_file_content, endpoint_id, force, dry_run)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.delete("/api/v1/stacks/{stack_id}", tags=["Stacks"])
-def delete_stack(stack_id: int, endpoint_id: int = 1):
+async def delete_stack(stack_id: int, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.delete_stack(stack_id, endpoint_id)
+        return await service.delete_stack(stack_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 
 @app.get("/api/v1/endpoints", tags=["Portainer"])
-def get_endpoints():
+async def get_endpoints(service: PortainerService = Depends(portainer_instance)):
+    try:
+        if settings.passthrough_responses:
+            return passthrough(await service.get_endpoints_raw())
+        return await service.get_endpoints()
+    except Exception as e:
+        raise upstream_error(e)
+
+# Fleet
+@app.get("/api/v1/fleet/{resource}", tags=["Fleet"])
+async def get_fleet_resource(
+    resource: str,
+    endpoint_ids: list[int] | None = Query(None),
+    concurrency: int = Query(None, ge=1),
+    timeout: float = Query(None, gt=0),
+    service: PortainerService = Depends(portainer_instance),
+):
+    if resource not in FLEET_RESOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown fleet resource '{resource}'. Use one of: {', '.join(FLEET_RESOURCES)}")
     try:
-        return portainer_service.get_endpoints()
+        return await fleet_query(
+            service,
+            resource,
+            concurrency=concurrency or settings.fleet_concurrency,
+            timeout=timeout or settings.fleet_endpoint_timeout,
+            endpoint_ids=endpoint_ids,
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+# Federation (every configured Portainer instance)
+@app.get("/api/v1/federation/{resource}", tags=["Fleet"])
+async def get_federated_resource(
+    resource: str,
+    instances: list[str] | None = Query(None, description="Instances to query (all when omitted)"),
+    concurrency: int = Query(None, ge=1),
+    timeout: float = Query(None, gt=0),
+):
+    if resource != "endpoints" and resource not in FLEET_RESOURCES:
+        raise HTTPException(status_code=404, detail=f"Unknown federated resource '{resource}'. Use one of: endpoints, {', '.join(FLEET_RESOURCES)}")
+    unknown = set(instances or []) - set(portainer_services)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown Portainer instance: {', '.join(sorted(unknown))}")
+    services = {name: service for name, service in portainer_services.items() if not instances or name in instances}
+    return await federated_query(
+        services,
+        resource,
+        concurrency=concurrency or settings.fleet_concurrency,
+        timeout=timeout or settings.fleet_endpoint_timeout,
+    )
+
+def _wants_shaping(options):
+    return bool(options["fields"] or options["limit"] or options["cursor"] is not None)
+
+def _shaped(items, sort_field, options, headers=None):
+    """Return the upstream list untouched unless projection or pagination was asked for."""
+    if not _wants_shaping(options) and not headers:
+        return items
+    items, page_headers = shape_list(items, sort_field, options)
+    return FastJSONResponse(items, headers={**(headers or {}), **page_headers})
 
 @app.get("/api/v1/containers", tags=["Containers"])
-def get_containers(endpoint_id: int = 1):
+async def get_containers(
+    endpoint_id: int = 1,
+    all: bool = False,
+    since: int | None = Query(None, ge=0),
+    status: list[str] | None = Query(None),
+    label: list[str] | None = Query(None),
+    ancestor: list[str] | None = Query(None),
+    name: list[str] | None = Query(None),
+    options: dict = Depends(list_options),
+    service: PortainerService = Depends(portainer_instance),
+):
+    filters = docker_filters(status=status, label=label, ancestor=ancestor, name=name)
+    if since is not None and filters:
+        raise HTTPException(status_code=400, detail="since cannot be combined with status, label, ancestor or name filters")
+    # Served from the events-driven inventory when one is running for this environment
+    inventory = inventories[service.name].get(endpoint_id)
+    if since is not None and (inventory is None or not inventory.synced):
+        raise HTTPException(status_code=409, detail=f"No synced container inventory for endpoint {endpoint_id}; start one with POST /api/v1/containers/inventory/{endpoint_id}")
     try:
-        return portainer_service.get_containers(endpoint_id)
+        if inventory is not None and inventory.synced and not filters:
+            headers = {
+                "X-Cache": "inventory",
+                "X-Inventory-Revision": str(inventory.revision),
+                "ETag": version_etag(endpoint_id, inventory.revision, all, since, options["fields"], options["limit"], options["cursor"]),
+            }
+            if since is not None:
+                delta = inventory.delta(since)
+                delta["containers"] = project(delta["containers"], options["fields"])
+                return FastJSONResponse(delta, headers=headers)
+            return _shaped(inventory.list(all), "Id", options, headers)
+        if filters or all:
+            # Docker only matches non-running states when asked for all containers
+            containers = await service.find_containers(endpoint_id, filters, all=all or bool(status))
+        elif settings.passthrough_responses and not _wants_shaping(options):
+            return passthrough(await service.get_containers_raw(endpoint_id))
+        else:
+            containers = await service.get_containers(endpoint_id)
+        return _shaped(containers, "Id", options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+@app.get("/api/v1/containers/inventory", tags=["Containers"])
+async def get_container_inventories(service: PortainerService = Depends(portainer_instance)):
+    return inventories[service.name].stats()
+
+@app.post("/api/v1/containers/inventory/{endpoint_id}", tags=["Containers"])
+async def start_container_inventory(endpoint_id: int, service: PortainerService = Depends(portainer_instance)):
+    return inventories[service.name].start(endpoint_id).stats()
+
+@app.delete("/api/v1/containers/inventory/{endpoint_id}", tags=["Containers"])
+async def stop_container_inventory(endpoint_id: int, service: PortainerService = Depends(portainer_instance)):
+    if not await inventories[service.name].stop(endpoint_id):
+        raise HTTPException(status_code=404, detail="Inventory not running")
+    return {"status": "stopped"}
+
+@app.post("/api/v1/containers/bulk", tags=["Containers"])
+async def bulk_container_action(request: BulkContainerAction, service: PortainerService = Depends(portainer_instance)):
+    if not request.targets and not (request.labels or request.name):
+        raise HTTPException(status_code=400, detail="Provide targets, or a labels/name filter")
+    try:
+        targets = [(t.endpoint_id, t.container_id, None) for t in request.targets]
+        errors = []
+        if request.labels or request.name:
+            resolved, errors = await resolve_container_targets(
+                service, request.endpoint_ids, request.labels, request.name, settings.fleet_concurrency
+            )
+            targets.extend(resolved)
+        result = await run_container_action(
+            service,
+            request.action,
+            targets,
+            parallelism=request.parallelism or settings.bulk_parallelism,
+            batch_size=request.batch_size,
+        )
+        result["errors"] = errors
+        return result
+    except Exception as e:
+        raise upstream_error(e)
 
 @app.post("/api/v1/containers/{container_id}/start", tags=["Containers"])
-def start_container(container_id: str, endpoint_id: int = 1):
+async def start_container(container_id: str, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.start_container(container_id, endpoint_id)
+        return await service.start_container(container_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/containers/{container_id}/stop", tags=["Containers"])
-def stop_container(container_id: str, endpoint_id: int = 1):
+async def stop_container(container_id: str, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.stop_container(container_id, endpoint_id)
+        return await service.stop_container(container_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/containers/{container_id}/restart", tags=["Containers"])
-def restart_container(container_id: str, endpoint_id: int = 1):
+async def restart_container(container_id: str, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.restart_container(container_id, endpoint_id)
+        return await service.restart_container(container_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Images
 @app.get("/api/v1/images", tags=["Images"])
-def get_images(endpoint_id: int = 1):
+async def get_images(
+    endpoint_id: int = 1,
+    label: list[str] | None = Query(None),
+    dangling: bool | None = None,
+    reference: list[str] | None = Query(None),
+    options: dict = Depends(list_options),
+    service: PortainerService = Depends(portainer_instance),
+):
+    filters = docker_filters(label=label, dangling=dangling, reference=reference)
     try:
-        return portainer_service.get_images(endpoint_id)
+        if filters:
+            return _shaped(await service.find_images(endpoint_id, filters), "Id", options)
+        if settings.passthrough_responses and not _wants_shaping(options):
+            return passthrough(await service.get_images_raw(endpoint_id))
+        return _shaped(await service.get_images(endpoint_id), "Id", options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/images/pull", tags=["Images"])
-def pull_image(from_image: str, tag: str = "latest", endpoint_id: int = 1):
+async def pull_image(
+    from_image: list[str] = Query(...),
+    tag: str = "latest",
+    endpoint_id: int = 1,
+    stream: Literal["ndjson", "sse"] | None = None,
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    # Several images may be pulled at once; each from_image may carry its own ":tag"
+    if run_async:
+        async def pull(job):
+            # Progress goes to the job's event stream; the result is one done/error event per image
+            job.result = []
+            async for event in multiplex_pulls(service, from_image, tag, endpoint_id, settings.pull_progress_interval):
+                if event["event"] == "progress":
+                    await job.publish("progress", progress=event)
+                else:
+                    job.result.append(event)
+            failed = [event["image"] for event in job.result if event["event"] == "error"]
+            if failed:
+                raise Exception(f"Pull failed for {', '.join(failed)}")
+            return job.result
+
+        return enqueue(
+            "pull_image",
+            pull,
+            {"from_image": from_image, "tag": tag, "endpoint_id": endpoint_id},
+            {"from_image": from_image, "endpoint_id": endpoint_id},
+            idempotency_key,
+            service,
+        )
+    if stream is not None:
+        events = multiplex_pulls(service, from_image, tag, endpoint_id, settings.pull_progress_interval)
+        if stream == "sse":
+            return StreamingResponse(encode_sse(events), media_type="text/event-stream")
+        return StreamingResponse(encode_ndjson(events), media_type="application/x-ndjson")
+    try:
+        if len(from_image) == 1:
+            return await service.pull_image(*split_image_ref(from_image[0], tag), endpoint_id)
+        results = await gather_bounded(
+            from_image,
+            lambda ref: service.pull_image(*split_image_ref(ref, tag), endpoint_id),
+            len(from_image),
+        )
+        return [
+            result if error is None else {"status": "error", "image": ref, "error": error}
+            for ref, result, error, _ in results
+        ]
+    except Exception as e:
+        raise upstream_error(e)
+
+@app.get("/api/v1/images/gc/plan", tags=["Images"])
+async def plan_image_cleanup(
+    endpoint_ids: list[int] | None = Query(None),
+    category: list[Literal["dangling", "superseded", "unreferenced"]] | None = Query(None),
+    keep_latest: int = Query(1, ge=1, description="Newest images kept per repository before older ones count as superseded"),
+    service: PortainerService = Depends(portainer_instance),
+):
     try:
-        return portainer_service.pull_image(from_image, tag, endpoint_id)
+        return await plan_image_gc(
+            service,
+            endpoint_ids,
+            category or GC_CATEGORIES,
+            keep_latest,
+            settings.fleet_concurrency,
+            settings.fleet_endpoint_timeout,
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+@app.post("/api/v1/images/gc", tags=["Images"])
+async def run_image_cleanup(
+    request: ImageGCRun,
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    def cleanup(job=None):
+        return run_image_gc(
+            service,
+            [image.model_dump() for image in request.images],
+            parallelism=request.parallelism or settings.gc_parallelism,
+            rate=request.rate if request.rate is not None else settings.gc_rate,
+            dry_run=request.dry_run,
+            concurrency=settings.fleet_concurrency,
+        )
+
+    if run_async:
+        target = {"endpoint_ids": sorted({image.endpoint_id for image in request.images})}
+        return enqueue("image_gc", cleanup, request.model_dump(), target, idempotency_key, service)
+    try:
+        return await cleanup()
+    except Exception as e:
+        raise upstream_error(e)
 
 @app.delete("/api/v1/images/{image_id:path}", tags=["Images"])
-def remove_image(image_id: str, endpoint_id: int = 1):
+async def remove_image(image_id: str, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.remove_image(image_id, endpoint_id)
+        return await service.remove_image(image_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Volumes
 @app.get("/api/v1/volumes", tags=["Volumes"])
-def get_volumes(endpoint_id: int = 1):
+async def get_volumes(
+    endpoint_id: int = 1,
+    label: list[str] | None = Query(None),
+    dangling: bool | None = None,
+    name: list[str] | None = Query(None),
+    driver: list[str] | None = Query(None),
+    options: dict = Depends(list_options),
+    service: PortainerService = Depends(portainer_instance),
+):
+    filters = docker_filters(label=label, dangling=dangling, name=name, driver=driver)
     try:
-        return portainer_service.get_volumes(endpoint_id)
+        if filters:
+            return _shaped(await service.find_volumes(endpoint_id, filters), "Name", options)
+        return _shaped(await service.get_volumes(endpoint_id), "Name", options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/volumes", tags=["Volumes"])
-def create_volume(name: str, driver: str = "local", endpoint_id: int = 1):
+async def create_volume(name: str, driver: str = "local", endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.create_volume(name, driver, endpoint_id)
+        return await service.create_volume(name, driver, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.delete("/api/v1/volumes/{volume_id}", tags=["Volumes"])
-def remove_volume(volume_id: str, endpoint_id: int = 1):
+async def remove_volume(volume_id: str, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.remove_volume(volume_id, endpoint_id)
+        return await service.remove_volume(volume_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Networks
 @app.get("/api/v1/networks", tags=["Networks"])
-def get_networks(endpoint_id: int = 1):
+async def get_networks(
+    endpoint_id: int = 1,
+    label: list[str] | None = Query(None),
+    dangling: bool | None = None,
+    name: list[str] | None = Query(None),
+    driver: list[str] | None = Query(None),
+    options: dict = Depends(list_options),
+    service: PortainerService = Depends(portainer_instance),
+):
+    filters = docker_filters(label=label, dangling=dangling, name=name, driver=driver)
     try:
-        return portainer_service.get_networks(endpoint_id)
+        if filters:
+            return _shaped(await service.find_networks(endpoint_id, filters), "Id", options)
+        if settings.passthrough_responses and not _wants_shaping(options):
+            return passthrough(await service.get_networks_raw(endpoint_id))
+        return _shaped(await service.get_networks(endpoint_id), "Id", options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/networks", tags=["Networks"])
-def create_network(name: str, driver: str = "bridge", endpoint_id: int = 1):
+async def create_network(name: str, driver: str = "bridge", endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.create_network(name, driver, endpoint_id)
+        return await service.create_network(name, driver, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.delete("/api/v1/networks/{network_id}", tags=["Networks"])
-def remove_network(network_id: str, endpoint_id: int = 1):
+async def remove_network(network_id: str, endpoint_id: int = 1, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.remove_network(network_id, endpoint_id)
+        return await service.remove_network(network_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 # Users & Teams
 @app.get("/api/v1/users", tags=["Users & Teams"])
-def get_users():
+async def get_users(service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_users()
+        return await service.get_users()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/users", tags=["Users & Teams"])
-def create_user(user: UserCreate):
+async def create_user(user: UserCreate, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.create_user(user.username, user.password, user.role)
+        return await service.create_user(user.username, user.password, user.role)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.delete("/api/v1/users/{user_id}", tags=["Users & Teams"])
-def delete_user(user_id: int):
+async def delete_user(user_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.delete_user(user_id)
+        return await service.delete_user(user_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/teams", tags=["Users & Teams"])
-def get_teams():
+async def get_teams(service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_teams()
+        return await service.get_teams()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/teams", tags=["Users & Teams"])
-def create_team(team: TeamCreate):
+async def create_team(team: TeamCreate, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.create_team(team.name)
+        return await service.create_team(team.name)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.delete("/api/v1/teams/{team_id}", tags=["Users & Teams"])
-def delete_team(team_id: int):
+async def delete_team(team_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.delete_team(team_id)
+        return await service.delete_team(team_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/teams/{team_id}/members", tags=["Users & Teams"])
-def add_user_to_team(team_id: int, membership: TeamMembershipCreate):
+async def add_user_to_team(team_id: int, membership: TeamMembershipCreate, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.add_user_to_team(team_id, membership.user_id, membership.role)
+        return await service.add_user_to_team(team_id, membership.user_id, membership.role)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+@app.put("/api/v1/teams/{team_id}/members", tags=["Users & Teams"])
+async def sync_team_memberships(team_id: int, request: TeamMembersSync, service: PortainerService = Depends(portainer_instance)):
+    desired = {member.user_id: member.role for member in request.members}
+    try:
+        return await sync_team_members(
+            service,
+            team_id,
+            desired,
+            remove_missing=request.remove_missing,
+            parallelism=request.parallelism or settings.bulk_parallelism,
+            dry_run=request.dry_run,
+        )
+    except Exception as e:
+        raise upstream_error(e)
 
 @app.delete("/api/v1/teams/{team_id}/members/{user_id}", tags=["Users & Teams"])
-def remove_user_from_team(team_id: int, user_id: int):
+async def remove_user_from_team(team_id: int, user_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.remove_user_from_team(team_id, user_id)
+        return await service.remove_user_from_team(team_id, user_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
+
+# Batch
+@app.post("/api/v1/batch", tags=["Batch"])
+async def batch(request: BatchRequest, http_request: Request):
+    if BATCH_HEADER in http_request.headers:
+        raise HTTPException(status_code=400, detail="Batches cannot be nested")
+    try:
+        operations = plan_batch([op.model_dump() for op in request.operations], settings.batch_max_operations)
+    except InvalidBatch as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Operations count against the caller's own rate limit and keep its priority
+    client = http_request.headers.get(settings.client_id_header) or (http_request.client.host if http_request.client else "unknown")
+    headers = {settings.client_id_header: client}
+    if "x-priority" in http_request.headers:
+        headers["X-Priority"] = http_request.headers["x-priority"]
+    return await run_batch(app, operations, request.concurrency or settings.batch_concurrency, headers)
+
+# Search
+@app.get("/api/v1/search", tags=["Search"])
+async def search(
+    image: str = Query(None, description="Substring of a container's image or an image tag"),
+    label: str = Query(None, description="key or key=value"),
+    name: str = Query(None, description="Substring of the resource name"),
+    kind: list[str] = Query(None, description=f"One or more of: {', '.join(SNAPSHOT_KINDS)}"),
+    endpoint_id: list[int] = Query(None),
+    limit: int = Query(100, ge=1, le=10000),
+    full: bool = Query(False, description="Include each resource's full JSON"),
+    service: PortainerService = Depends(portainer_instance),
+):
+    if not snapshots:
+        raise HTTPException(status_code=404, detail="Snapshot store is disabled; set SNAPSHOT_PATH to enable search")
+    unknown = set(kind or []) - set(SNAPSHOT_KINDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown kind: {', '.join(sorted(unknown))}")
+    store = snapshots[service.name].store
+    items = await asyncio.to_thread(store.search, kind, endpoint_id, image, label, name, limit, full)
+    staleness = await asyncio.to_thread(store.staleness, kind, endpoint_id)
+    return {"count": len(items), "staleness": staleness, "items": items}
+
+# Jobs
+@app.get("/api/v1/jobs", tags=["Jobs"])
+async def list_jobs(status: Literal["queued", "running", "succeeded", "failed"] | None = None, kind: str | None = None):
+    return [job.summary() for job in jobs.list(status, kind)]
+
+@app.get("/api/v1/jobs/{job_id}", tags=["Jobs"])
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=60, description="Seconds to wait for the job to finish (long-poll)")):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if wait and not job.done:
+        await job.wait(wait)
+    return job.summary()
+
+@app.get("/api/v1/jobs/{job_id}/events", tags=["Jobs"])
+async def stream_job_events(job_id: str, last_event_id: int = Header(0)):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(encode_sse(job.follow(last_event_id)), media_type="text/event-stream")
 
 # Kubernetes
+def kubernetes_list_options(
+    label_selector: str = None,
+    field_selector: str = None,
+    limit: int = Query(None, ge=1),
+    continue_token: str = Query(None, alias="continue"),
+    stream: bool = False, # NDJSON, one item per line, fetched page by page
+):
+    return {
+        "label_selector": label_selector,
+        "field_selector": field_selector,
+        "limit": limit,
+        "continue_token": continue_token,
+        "stream": stream,
+    }
+
+def _from_informer(service, endpoint_id, resource, namespace, options):
+    """Answer from a synced informer when the query can be evaluated in memory."""
+    informer = informers[service.name].get(endpoint_id, resource)
+    if informer is None or not informer.synced:
+        return None
+    if options["field_selector"] or options["limit"] or options["continue_token"] or options["stream"]:
+        return None
+    label_terms = parse_label_selector(options["label_selector"])
+    if label_terms is None:
+        return None
+    return FastJSONResponse(
+        informer.list_response(namespace, label_terms),
+        headers={
+            "X-Cache": "informer",
+            "X-Cache-Age": f"{informer.age():.3f}",
+            "X-Resource-Version": str(informer.resource_version),
+            # The resourceVersion already identifies the content, so the body is not hashed
+            "ETag": version_etag(endpoint_id, resource, informer.resource_version, namespace, options["label_selector"]),
+        },
+    )
+
+async def _kubernetes_list(service, endpoint_id, resource, namespace, options):
+    cached_response = _from_informer(service, endpoint_id, resource, namespace, options)
+    if cached_response is not None:
+        return cached_response
+    path = service.kubernetes_list_path(resource, namespace)
+    page_size = options["limit"]
+    if not options["stream"] and settings.passthrough_responses:
+        return passthrough(await service._get_k8s_resource(
+            endpoint_id, path, options["label_selector"], options["field_selector"], page_size, options["continue_token"], raw=True
+        ))
+    if options["stream"]:
+        page_size = page_size or settings.k8s_page_size
+    # The first page is fetched up front so upstream errors still become a 500
+    page = await service._get_k8s_resource(
+        endpoint_id, path, options["label_selector"], options["field_selector"], page_size, options["continue_token"]
+    )
+    if not options["stream"]:
+        return page
+    items = service.iter_k8s_resource(
+        endpoint_id, path, options["label_selector"], options["field_selector"], page_size, first_page=page
+    )
+    return StreamingResponse(encode_ndjson(items), media_type="application/x-ndjson")
+
+@app.get("/api/v1/kubernetes/informers", tags=["Kubernetes"])
+async def get_kubernetes_informers(service: PortainerService = Depends(portainer_instance)):
+    return informers[service.name].stats()
+
+@app.post("/api/v1/kubernetes/{endpoint_id}/informers/{resource}", tags=["Kubernetes"])
+async def start_kubernetes_informer(endpoint_id: int, resource: str, service: PortainerService = Depends(portainer_instance)):
+    if resource not in KUBERNETES_LISTS:
+        raise HTTPException(status_code=404, detail=f"Unknown Kubernetes resource '{resource}'. Use one of: {', '.join(KUBERNETES_LISTS)}")
+    return informers[service.name].start(endpoint_id, resource).stats()
+
+@app.delete("/api/v1/kubernetes/{endpoint_id}/informers/{resource}", tags=["Kubernetes"])
+async def stop_kubernetes_informer(endpoint_id: int, resource: str, service: PortainerService = Depends(portainer_instance)):
+    if not await informers[service.name].stop(endpoint_id, resource):
+        raise HTTPException(status_code=404, detail="Informer not running")
+    return {"status": "stopped"}
+
 @app.get("/api/v1/kubernetes/{endpoint_id}/nodes", tags=["Kubernetes"])
-def get_kubernetes_nodes(endpoint_id: int):
+async def get_kubernetes_nodes(endpoint_id: int, options: dict = Depends(kubernetes_list_options), service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_kubernetes_nodes(endpoint_id)
+        return await _kubernetes_list(service, endpoint_id, "nodes", None, options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/kubernetes/{endpoint_id}/namespaces", tags=["Kubernetes"])
-def get_kubernetes_namespaces(endpoint_id: int):
+async def get_kubernetes_namespaces(endpoint_id: int, options: dict = Depends(kubernetes_list_options), service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_kubernetes_namespaces(endpoint_id)
+        return await _kubernetes_list(service, endpoint_id, "namespaces", None, options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/kubernetes/{endpoint_id}/pods", tags=["Kubernetes"])
-def get_kubernetes_pods(endpoint_id: int, namespace: str = None):
+async def get_kubernetes_pods(endpoint_id: int, namespace: str = None, options: dict = Depends(kubernetes_list_options), service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_kubernetes_pods(endpoint_id, namespace)
+        return await _kubernetes_list(service, endpoint_id, "pods", namespace, options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/kubernetes/{endpoint_id}/deployments", tags=["Kubernetes"])
-def get_kubernetes_deployments(endpoint_id: int, namespace: str = None):
+async def get_kubernetes_deployments(endpoint_id: int, namespace: str = None, options: dict = Depends(kubernetes_list_options), service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_kubernetes_deployments(endpoint_id, namespace)
+        return await _kubernetes_list(service, endpoint_id, "deployments", namespace, options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/kubernetes/{endpoint_id}/services", tags=["Kubernetes"])
-def get_kubernetes_services(endpoint_id: int, namespace: str = None):
+async def get_kubernetes_services(endpoint_id: int, namespace: str = None, options: dict = Depends(kubernetes_list_options), service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_kubernetes_services(endpoint_id, namespace)
+        return await _kubernetes_list(service, endpoint_id, "services", namespace, options)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.get("/api/v1/kubernetes/{endpoint_id}/apps", tags=["Kubernetes"])
-def get_kubernetes_applications(endpoint_id: int):
+async def get_kubernetes_applications(endpoint_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
-        return portainer_service.get_kubernetes_applications(endpoint_id)
+        return await service.get_kubernetes_applications(endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.post("/api/v1/kubernetes/{endpoint_id}/apps", tags=["Kubernetes"])
-def create_kubernetes_application(endpoint_id: int, app_data: KubernetesAppCreate):
+async def create_kubernetes_application(
+    endpoint_id: int,
+    app_data: KubernetesAppCreate,
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    if run_async:
+        return enqueue(
+            "create_kubernetes_application",
+            lambda job: service.create_kubernetes_application(app_data.name, app_data.manifest, endpoint_id),
+            {"endpoint_id": endpoint_id, **app_data.model_dump()},
+            {"name": app_data.name, "endpoint_id": endpoint_id},
+            idempotency_key,
+            service,
+        )
     try:
-        return portainer_service.create_kubernetes_application(app_data.name, app_data.manifest, endpoint_id)
+        return await service.create_kubernetes_application(app_data.name, app_data.manifest, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.put("/api/v1/kubernetes/{endpoint_id}/apps/{app_id}", tags=["Kubernetes"])
-def update_kubernetes_application(endpoint_id: int, app_id: int, app_data: KubernetesAppUpdate):
+async def update_kubernetes_application(
+    endpoint_id: int,
+    app_id: int,
+    app_data: KubernetesAppUpdate,
+    force: bool = Query(False, description="Redeploy even if the file matches the deployed one"),
+    dry_run: bool = Query(False, description="Only report whether a redeploy would happen, with a diff"),
+    run_async: bool = Query(False, alias="async"),
+    idempotency_key: str | None = Header(None),
+    service: PortainerService = Depends(portainer_instance),
+):
+    if run_async:
+        return enqueue(
+            "update_stack",
+            lambda job: service.update_stack(app_id, app_data.manifest, endpoint_id, force, dry_run),
+            {"stack_id": app_id, "stack_file_content": app_data.manifest, "endpoint_id": endpoint_id, "force": force, "dry_run": dry_run},
+            {"stack_id": app_id, "endpoint_id": endpoint_id},
+            idempotency_key,
+            service,
+        )
     try:
         # The service method for update is the generic update_stack
-        return portainer_service.update_stack(app_id, app_data.manifest, endpoint_id)
+        return await service.update_stack(app_id, app_data.manifest, endpoint_id, force, dry_run)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 
 @app.delete("/api/v1/kubernetes/{endpoint_id}/apps/{app_id}", tags=["Kubernetes"])
-def delete_kubernetes_application(endpoint_id: int, app_id: int):
+async def delete_kubernetes_application(endpoint_id: int, app_id: int, service: PortainerService = Depends(portainer_instance)):
     try:
         # The service method for delete is the generic delete_stack
-        return portainer_service.delete_stack(app_id, endpoint_id)
+        return await service.delete_stack(app_id, endpoint_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
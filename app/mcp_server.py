@@ -0,0 +1,250 @@
+"""Native MCP server: ``PortainerService`` operations registered directly as tools.
+
+MCP clients talk to this process instead of going through the REST API and
+its OpenAPI schema. List tools return compact summaries (name, state, image
+instead of the full Docker JSON); pass ``detail=true`` for the raw objects.
+
+Usage:
+    python -m app.mcp_server                                   # stdio
+    python -m app.mcp_server --transport streamable-http --port 8001
+    python -m app.mcp_server --transport sse --port 8001
+    python -m app.mcp_server --instance eu                     # another PORTAINER_INSTANCES entry
+"""
+import argparse
+import inspect
+from contextlib import asynccontextmanager
+
+import orjson
+
+from .admission import priority
+from .portainer_service import portainer_service, portainer_services
+
+try:
+    from mcp.server.mcpserver import MCPServer
+    from mcp.server.mcpserver.exceptions import ToolError
+    from mcp_types import ToolAnnotations
+except ImportError:  # the MCP SDK (mcp>=2) is optional; the REST API does not need it
+    MCPServer = None
+
+# Parameters that are numeric IDs in Portainer; everything else without a typed default is a string
+_INT_PARAMS = {"endpoint_id", "stack_id", "user_id", "team_id", "membership_id", "role"}
+
+
+def _short_id(value):
+    value = value or ""
+    return value.split(":", 1)[-1][:12]
+
+
+def _container(c):
+    names = c.get("Names") or []
+    return {
+        "id": _short_id(c.get("Id")),
+        "name": names[0].lstrip("/") if names else None,
+        "image": c.get("Image"),
+        "state": c.get("State"),
+        "status": c.get("Status"),
+    }
+
+
+def _image(i):
+    return {"id": _short_id(i.get("Id")), "tags": i.get("RepoTags") or [], "size_mb": round((i.get("Size") or 0) / 1e6, 1)}
+
+
+def _volume(v):
+    return {"name": v.get("Name"), "driver": v.get("Driver")}
+
+
+def _network(n):
+    return {"id": _short_id(n.get("Id")), "name": n.get("Name"), "driver": n.get("Driver"), "scope": n.get("Scope")}
+
+
+def _stack(s):
+    return {"id": s.get("Id"), "name": s.get("Name"), "type": s.get("Type"), "status": s.get("Status"), "endpoint_id": s.get("EndpointId")}
+
+
+def _endpoint(e):
+    return {"id": e.get("Id"), "name": e.get("Name"), "type": e.get("Type"), "status": e.get("Status"), "url": e.get("URL")}
+
+
+def _user(u):
+    return {"id": u.get("Id"), "username": u.get("Username"), "role": u.get("Role")}
+
+
+def _team(t):
+    return {"id": t.get("Id"), "name": t.get("Name")}
+
+
+def _membership(m):
+    return {"id": m.get("Id"), "user_id": m.get("UserID"), "team_id": m.get("TeamID"), "role": m.get("Role")}
+
+
+def _k8s_item(item):
+    metadata = item.get("metadata") or {}
+    spec, status = item.get("spec") or {}, item.get("status") or {}
+    summary = {"name": metadata.get("name"), "namespace": metadata.get("namespace")}
+    kind = item.get("kind") or ""
+    if "containers" in spec:  # pod
+        summary.update(phase=status.get("phase"), node=spec.get("nodeName"),
+                       restarts=sum(c.get("restartCount", 0) for c in status.get("containerStatuses") or []))
+    elif "replicas" in spec:  # deployment
+        summary.update(replicas=spec.get("replicas"), ready=status.get("readyReplicas", 0))
+    elif "ports" in spec:  # service
+        summary.update(type=spec.get("type"), cluster_ip=spec.get("clusterIP"))
+    elif kind == "Node" or "nodeInfo" in status:
+        conditions = {c.get("type"): c.get("status") for c in status.get("conditions") or []}
+        summary.update(ready=conditions.get("Ready") == "True", version=(status.get("nodeInfo") or {}).get("kubeletVersion"))
+    elif "phase" in status:  # namespace
+        summary["phase"] = status.get("phase")
+    return summary
+
+
+def _k8s_list(body):
+    return [_k8s_item(item) for item in body.get("items") or []]
+
+
+def _each(summarize):
+    return lambda items: [summarize(item) for item in items]
+
+
+# Service method -> (summary of its result, kind). Summarized tools take ``detail`` for the raw result.
+TOOLS = {
+    "get_endpoints": (_each(_endpoint), "read"),
+    "get_stacks": (_each(_stack), "read"),
+    "get_stack": (_stack, "read"),
+    "get_stack_file": (None, "read"),
+    "get_containers": (_each(_container), "read"),
+    "get_images": (_each(_image), "read"),
+    "get_volumes": (_each(_volume), "read"),
+    "get_networks": (_each(_network), "read"),
+    "get_users": (_each(_user), "read"),
+    "get_teams": (_each(_team), "read"),
+    "get_team_memberships": (_each(_membership), "read"),
+    "get_kubernetes_nodes": (_k8s_list, "read"),
+    "get_kubernetes_namespaces": (_k8s_list, "read"),
+    "get_kubernetes_pods": (_k8s_list, "read"),
+    "get_kubernetes_deployments": (_k8s_list, "read"),
+    "get_kubernetes_services": (_k8s_list, "read"),
+    "get_kubernetes_applications": (_each(_stack), "read"),
+    "start_container": (None, "write"),
+    "stop_container": (None, "write"),
+    "restart_container": (None, "write"),
+    "create_stack_from_string": (_stack, "write"),
+    "update_stack": (None, "write"),
+    "delete_stack": (None, "destructive"),
+    "pull_image": (None, "write"),
+    "remove_image": (None, "destructive"),
+    "create_volume": (_volume, "write"),
+    "remove_volume": (None, "destructive"),
+    "create_network": (None, "write"),
+    "remove_network": (None, "destructive"),
+    "create_user": (_user, "write"),
+    "delete_user": (None, "destructive"),
+    "create_team": (_team, "write"),
+    "delete_team": (None, "destructive"),
+    "add_user_to_team": (_membership, "write"),
+    "remove_user_from_team": (None, "destructive"),
+    "create_kubernetes_application": (_stack, "write"),
+}
+
+
+def _annotation(param):
+    if param.name in _INT_PARAMS:
+        return int | None if param.default is None else int
+    if param.default is None:
+        return str | None
+    if param.default is not inspect.Parameter.empty:
+        return type(param.default)
+    return str
+
+
+def _tool_signature(method, summarized):
+    """The method's signature with types the MCP schema can use; ``**list_options`` becomes selectors."""
+    params = []
+    for param in inspect.signature(method).parameters.values():
+        if param.kind is inspect.Parameter.VAR_KEYWORD:
+            for name in ("label_selector", "field_selector"):
+                params.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=None, annotation=str | None))
+            continue
+        params.append(param.replace(annotation=_annotation(param)))
+    if summarized:
+        params.append(inspect.Parameter("detail", inspect.Parameter.KEYWORD_ONLY, default=False, annotation=bool))
+    return inspect.Signature(params, return_annotation=str)
+
+
+def _make_tool(method, summarize):
+    async def tool(*args, detail=False, **kwargs):
+        # Agent calls are interactive: they overtake fleet scans and background jobs
+        try:
+            with priority("interactive"):
+                result = await method(*args, **kwargs)
+        except Exception as e:
+            # Reported to the client as a tool error rather than a protocol failure
+            raise ToolError(str(e) or type(e).__name__) from e
+        if summarize is not None and not detail and result is not None:
+            result = summarize(result)
+        # One compact JSON text block instead of the SDK's indented, per-item rendering
+        return orjson.dumps(result, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    tool.__name__ = method.__name__
+    tool.__signature__ = _tool_signature(method, summarize is not None)
+    return tool
+
+
+def _description(method, summarize):
+    doc = inspect.getdoc(method)
+    description = doc.split("\n\n", 1)[0] if doc else method.__name__.replace("_", " ").capitalize() + "."
+    if summarize is not None:
+        description += " Returns a compact summary; pass detail=true for the full Portainer objects."
+    return description
+
+
+def build_server(service=portainer_service):
+    """Register every ``TOOLS`` entry once; the service's cache, limits and breakers apply to tool calls."""
+    if MCPServer is None:
+        raise RuntimeError("The MCP server needs the 'mcp' package (pip install 'mcp>=2')")
+
+    @asynccontextmanager
+    async def lifespan(server):
+        try:
+            yield {}
+        finally:
+            await service.aclose()
+
+    server = MCPServer(
+        "portainer",
+        instructions="Manage Portainer environments, stacks, containers, images, users and Kubernetes workloads.",
+        lifespan=lifespan,
+    )
+    for name, (summarize, kind) in TOOLS.items():
+        method = getattr(service, name)
+        server.add_tool(
+            _make_tool(method, summarize),
+            name=name,
+            description=_description(method, summarize),
+            annotations=ToolAnnotations(
+                read_only_hint=kind == "read",
+                destructive_hint=kind == "destructive",
+                open_world_hint=False,
+            ),
+            structured_output=False,
+        )
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", choices=["stdio", "sse", "streamable-http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--instance", choices=list(portainer_services), default=portainer_service.name)
+    args = parser.parse_args()
+
+    server = build_server(portainer_services[args.instance])
+    if args.transport == "stdio":
+        server.run("stdio")
+    else:
+        server.run(args.transport, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
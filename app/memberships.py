@@ -0,0 +1,67 @@
+import time
+
+from .fleet import gather_bounded
+
+
+def plan_membership_sync(current, desired, remove_missing=True):
+    """Diff a team's current memberships against ``desired`` (``{user_id: role}``).
+
+    ``current`` is ``{user_id: membership}``. Returns the operations needed
+    as ``(op, user_id, role, membership)`` tuples; members already in the
+    desired state produce nothing.
+    """
+    operations = []
+    for user_id, role in desired.items():
+        membership = current.get(user_id)
+        if membership is None:
+            operations.append(("add", user_id, role, None))
+        elif membership.get("Role") != role:
+            operations.append(("update", user_id, role, membership))
+    if remove_missing:
+        for user_id, membership in current.items():
+            if user_id not in desired:
+                operations.append(("remove", user_id, membership.get("Role"), membership))
+    return operations
+
+
+async def sync_team_members(service, team_id, desired, remove_missing=True, parallelism=10, dry_run=False):
+    """Make a team's members match ``desired``, applying only the difference in parallel."""
+    started = time.monotonic()
+    current = (await service.membership_index(team_id)).members(team_id)
+    operations = plan_membership_sync(current, desired, remove_missing)
+    unchanged = len(desired) - sum(1 for op, *_ in operations if op != "remove")
+
+    async def apply(operation):
+        op, user_id, role, membership = operation
+        if op == "add":
+            return await service.add_user_to_team(team_id, user_id, role)
+        if op == "update":
+            return await service.update_team_membership(membership["Id"], team_id, user_id, role)
+        return await service.delete_team_membership(team_id, membership["Id"])
+
+    results = []
+    if not dry_run:
+        outcomes = await gather_bounded(operations, apply, parallelism)
+    else:
+        outcomes = [(operation, None, None, 0.0) for operation in operations]
+    for (op, user_id, role, _), result, error, elapsed in outcomes:
+        item = {"op": op, "user_id": user_id, "role": role, "elapsed_ms": round(elapsed * 1000, 1)}
+        if dry_run:
+            item["status"] = "planned"
+        elif error is None:
+            item["status"] = "ok"
+        else:
+            item.update(status="error", error=error)
+        results.append(item)
+
+    return {
+        "team_id": team_id,
+        "dry_run": dry_run,
+        "added": sum(1 for r in results if r["op"] == "add"),
+        "updated": sum(1 for r in results if r["op"] == "update"),
+        "removed": sum(1 for r in results if r["op"] == "remove"),
+        "unchanged": unchanged,
+        "failed": sum(1 for r in results if r["status"] == "error"),
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "results": results,
+    }
@@ -0,0 +1,152 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+try:
+    from opentelemetry import trace
+except ImportError:  # tracing is optional; metrics are always collected
+    trace = None
+
+# Upstream path segments following these collections are IDs or names, not part of the route
+_ID_COLLECTIONS = {
+    "containers", "images", "volumes", "networks", "stacks", "users", "teams", "memberships", "team_memberships",
+    "endpoints", "namespaces",
+}
+_LITERAL_SEGMENTS = {"json", "create", "prune", "search", "load", "get", "file", "string", "standalone"}
+# Docker actions on one image; an image reference runs up to one of these (or to the end of the path)
+_IMAGE_ACTIONS = {"json", "history", "push", "tag", "get"}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "mcp_portainer_http_request_duration_seconds",
+    "Inbound request latency by route and response status.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "mcp_portainer_http_requests_in_flight",
+    "Inbound requests currently being served.",
+    ["method"],
+)
+HTTP_ERRORS = Counter(
+    "mcp_portainer_http_errors_total",
+    "Inbound requests answered with a 4xx/5xx status.",
+    ["method", "route", "status"],
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "mcp_portainer_upstream_request_duration_seconds",
+    "Portainer call latency per attempt; status is the Portainer status or the error type.",
+    ["portainer", "method", "route", "endpoint_id", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+ADMISSION_REJECTED = Counter(
+    "mcp_portainer_admission_rejected_total",
+    "Requests or Portainer calls shed with 429; limit is client, global or endpoint.",
+    ["limit", "priority"],
+)
+
+
+def upstream_route(path):
+    """Split a Portainer path into ``(route template, endpoint_id)`` with IDs replaced by ``{id}``."""
+    segments = path.split("?", 1)[0].strip("/").split("/")
+    endpoint_id = ""
+    route = []
+    i = 0
+    while i < len(segments):
+        segment = segments[i]
+        previous = segments[i - 1] if i else ""
+        if previous in _ID_COLLECTIONS and segment not in _LITERAL_SEGMENTS:
+            if previous == "endpoints" and i == 2:
+                endpoint_id = segment
+            if previous == "images":
+                # Image references contain slashes (ghcr.io/team/app:1.0), so they become one {id}
+                last = len(segments) - 1
+                i = last if last > i and segments[last] in _IMAGE_ACTIONS else last + 1
+                route.append("{id}")
+                continue
+            segment = "{id}"
+        route.append(segment)
+        i += 1
+    return "/" + "/".join(route), endpoint_id
+
+
+@contextmanager
+def span(name, kind=None, **attributes):
+    """OpenTelemetry span when ``opentelemetry`` is installed; a no-op otherwise."""
+    if trace is None:
+        yield None
+        return
+    kind = getattr(trace.SpanKind, kind.upper()) if kind else trace.SpanKind.INTERNAL
+    with trace.get_tracer(__name__).start_as_current_span(name, kind=kind, attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def observe_upstream(method, path, portainer=""):
+    """Time one Portainer call to instance ``portainer``; the caller sets ``outcome["status"]`` from the response."""
+    route, endpoint_id = upstream_route(path)
+    outcome = {"status": "error"}
+    start = time.perf_counter()
+    with span(f"{method} {route}", "client", **{"http.request.method": method, "url.path": path, "portainer.endpoint_id": endpoint_id, "portainer.instance": portainer}) as current:
+        try:
+            yield outcome
+        except BaseException as e:
+            outcome["status"] = type(e).__name__
+            raise
+        finally:
+            UPSTREAM_REQUEST_DURATION.labels(portainer, method, route, endpoint_id, str(outcome["status"])).observe(time.perf_counter() - start)
+            if current is not None:
+                current.set_attribute("http.response.status_code", str(outcome["status"]))
+
+
+def render():
+    """Current metrics in the Prometheus text exposition format: ``(body, content_type)``."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """Per-route latency histogram, in-flight gauge and error counter for every HTTP request.
+
+    Routes are labeled by their path template (``/api/v1/stacks/{stack_id}``)
+    so label cardinality stays bounded; unmatched paths share one label.
+    """
+
+    def __init__(self, app, excluded_paths=("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+        # The route is only known once the request has been routed, so in-flight is per method
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            with span(method, "server", **{"http.request.method": method, "url.path": scope["path"]}) as current:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    if current is not None:
+                        current.update_name(f"{method} {getattr(scope.get('route'), 'path', 'unmatched')}")
+                        current.set_attribute("http.response.status_code", status)
+        finally:
+            in_flight.dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_DURATION.labels(method, route, str(status)).observe(time.perf_counter() - start)
+            if status >= 400:
+                HTTP_ERRORS.labels(method, route, str(status)).inc()
@@ -1,56 +1,259 @@
-import requests
+import asyncio
+import json
+from contextlib import nullcontext
+from collections import namedtuple
+
+import httpx
+from .admission import UpstreamLimiter
+from .cache import TTLCache, cached, invalidates
 from .config import settings
+from .image_pull import PullProgress
+from .indexes import KUBERNETES_STACK, IndexCache, MembershipIndex, StackIndex
+from .metrics import observe_upstream
+from .resilience import RETRYABLE_STATUS, BreakerRegistry, backoff_delay, hedged
+from .singleflight import SingleFlight
+from .stack_files import diff_stack_files, stack_file_hash
+
+# Upstream body kept as bytes so it can be sent to the client without a decode/encode round-trip
+RawResponse = namedtuple("RawResponse", ["content", "media_type", "etag"], defaults=[None])
+
+# Kubernetes list resource -> (API group/version path, namespaced)
+KUBERNETES_LISTS = {
+    "nodes": ("api/v1", False),
+    "namespaces": ("api/v1", False),
+    "pods": ("api/v1", True),
+    "deployments": ("apis/apps/v1", True),
+    "services": ("api/v1", True),
+}
 
 class PortainerService:
-    def __init__(self):
-        self.portainer_url = settings.portainer_url
+    def __init__(self, url=None, api_key=None, name=None):
+        # One instance per Portainer server; each has its own connection pool, cache, breakers and limits
+        self.name = name or settings.portainer_instance
+        self.portainer_url = url or settings.portainer_url
         self.headers = {
-            "X-API-Key": settings.portainer_api_key,
+            "X-API-Key": api_key or settings.portainer_api_key,
             "Accept": "application/json",
             "Content-Type": "application/json",
         }
+        self._client = None
+        self.cache = None
+        if settings.cache_enabled:
+            self.cache = TTLCache(
+                max_entries=settings.cache_max_entries,
+                max_bytes=settings.cache_max_bytes,
+                stale_ttl=settings.cache_stale_ttl,
+            )
+        self.cache_ttls = settings.cache_ttls
+        self.inflight = SingleFlight() if settings.coalesce_requests else None
+        self.indexes = IndexCache()
+        self.breakers = BreakerRegistry(
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_timeout=settings.breaker_reset_timeout,
+        )
+        self.admission = None
+        if settings.admission_enabled:
+            self.admission = UpstreamLimiter(
+                max_concurrency=settings.upstream_max_concurrency,
+                endpoint_max_concurrency=settings.upstream_endpoint_max_concurrency,
+                bulk_share=settings.upstream_bulk_share,
+                max_waiting=settings.upstream_max_waiting,
+                timeout=settings.upstream_queue_timeout,
+            )
+        # Read timeout per operation class; connect timeout is shared
+        self.timeouts = {
+            operation: httpx.Timeout(read_timeout, connect=settings.portainer_connect_timeout)
+            for operation, read_timeout in (
+                ("read", settings.portainer_read_timeout),
+                ("write", settings.portainer_write_timeout),
+                ("deploy", settings.portainer_deploy_timeout),
+            )
+        }
 
-    def get_stacks(self, endpoint_id=1):
-        response = requests.get(f"{self.portainer_url}/api/stacks?endpointId={endpoint_id}", headers=self.headers)
-        response.raise_for_status()
+    @property
+    def client(self):
+        """Shared pooled client; connections are kept alive and reused across calls."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.portainer_url,
+                headers=self.headers,
+                http2=settings.portainer_http2,
+                limits=httpx.Limits(
+                    max_connections=settings.portainer_max_connections,
+                    max_keepalive_connections=settings.portainer_max_keepalive_connections,
+                    keepalive_expiry=settings.portainer_keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(settings.portainer_timeout, connect=settings.portainer_connect_timeout),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _request(self, method, path, **kwargs):
+        if self.inflight is None:
+            return await self._send(method, path, **kwargs)
+        if method == "GET":
+            params = kwargs.get("params") or {}
+            key = (path, tuple(sorted((str(k), str(v)) for k, v in params.items())))
+            return await self.inflight.do(key, lambda: self._send(method, path, **kwargs))
+        try:
+            return await self._send(method, path, **kwargs)
+        finally:
+            # GETs already in flight may have read the state from before this write
+            self.inflight.forget()
+
+    async def get_raw(self, path, resource=None, endpoint_id=None, params=None):
+        """GET ``path`` and return the body undecoded; cached under ``resource`` when it has a TTL."""
+        async def load():
+            response = await self._request("GET", path, params=params)
+            return RawResponse(
+                response.content,
+                response.headers.get("content-type", "application/json"),
+                response.headers.get("etag"),
+            )
+
+        ttl = self.cache_ttls.get(resource, 0) if self.cache is not None and resource else 0
+        if ttl <= 0 or params:
+            return await load()
+        return await self.cache.get_or_load((resource, endpoint_id, "raw"), ttl, load)
+
+    def _slot(self, path, params=None):
+        """Admission slot for one Portainer call; waits by priority class, raises ``AdmissionRejected``."""
+        return self.admission.slot(path, params) if self.admission is not None else nullcontext()
+
+    async def _send(self, method, path, operation=None, **kwargs):
+        """Send one logical request: per-class timeout, environment breaker, and retries for GETs.
+
+        Only transport errors and 502/503/504 count against the breaker and are
+        retried; 4xx answers are the caller's problem and are raised as-is.
+        """
+        kwargs.setdefault("timeout", self.timeouts[operation or ("read" if method == "GET" else "write")])
+        breaker = self.breakers.for_path(path, kwargs.get("params"))
+        attempts = 1 + settings.retry_attempts if method == "GET" else 1
+
+        async def call():
+            async with self._slot(path, kwargs.get("params")):
+                with observe_upstream(method, path, self.name) as outcome:
+                    response = await self.client.request(method, path, **kwargs)
+                    outcome["status"] = response.status_code
+                    return response
+
+        for attempt in range(attempts):
+            if breaker is not None:
+                breaker.before_call()
+            try:
+                if method == "GET" and settings.hedge_after > 0:
+                    response = await hedged(call, settings.hedge_after)
+                else:
+                    response = await call()
+            except httpx.TransportError:
+                if breaker is not None:
+                    breaker.record_failure()
+                if attempt + 1 == attempts:
+                    raise
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    if breaker is not None:
+                        breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                if breaker is not None:
+                    breaker.record_failure()
+                if attempt + 1 == attempts:
+                    response.raise_for_status()
+            await asyncio.sleep(backoff_delay(attempt, settings.retry_backoff_base, settings.retry_backoff_max))
+
+    @cached("stacks")
+    async def get_stacks(self, endpoint_id=1):
+        response = await self._request("GET", f"/api/stacks?endpointId={endpoint_id}")
         return response.json()
 
-    def get_endpoints(self):
-        response = requests.get(f"{self.portainer_url}/api/endpoints", headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+    async def stack_index(self, endpoint_id=1):
+        """Stacks of an environment by id, type and name; rebuilt only when the cached list changes."""
+        stacks = await self.get_stacks(endpoint_id)
+        return self.indexes.get(("stacks", endpoint_id), stacks, StackIndex)
 
-    def get_containers(self, endpoint_id=1):
-        response = requests.get(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/containers/json", headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+    async def get_stacks_raw(self, endpoint_id=1):
+        return await self.get_raw(f"/api/stacks?endpointId={endpoint_id}", "stacks", endpoint_id)
 
-    def start_container(self, container_id, endpoint_id=1):
-        response = requests.post(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/start", headers=self.headers)
-        response.raise_for_status()
+    @cached("endpoints")
+    async def get_endpoints(self):
+        response = await self._request("GET", "/api/endpoints")
         return response.json()
 
-    def stop_container(self, container_id, endpoint_id=1):
-        response = requests.post(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/stop", headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+    async def get_endpoints_raw(self):
+        return await self.get_raw("/api/endpoints", "endpoints")
 
-    def restart_container(self, container_id, endpoint_id=1):
-        response = requests.post(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/containers/{container_id}/restart", headers=self.headers)
-        response.raise_for_status()
+    @cached("containers")
+    async def get_containers(self, endpoint_id=1):
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/containers/json")
         return response.json()
 
-    def get_stack(self, stack_id):
-        response = requests.get(f"{self.portainer_url}/api/stacks/{stack_id}", headers=self.headers)
-        response.raise_for_status()
+    async def get_containers_raw(self, endpoint_id=1):
+        return await self.get_raw(f"/api/endpoints/{endpoint_id}/docker/containers/json", "containers", endpoint_id)
+
+    async def find_containers(self, endpoint_id, filters=None, all=True):
+        """List containers with Docker-side ``filters`` (e.g. ``{"label": ["app=web"]}``); not cached."""
+        params = {"all": int(all)}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/containers/json", params=params)
         return response.json()
 
-    def get_stack_file(self, stack_id):
-        response = requests.get(f"{self.portainer_url}/api/stacks/{stack_id}/file", headers=self.headers)
-        response.raise_for_status()
+    async def stream_docker_events(self, endpoint_id, since=None, filters=None):
+        """Yield Docker events for an environment as they happen; the stream stays open until cancelled."""
+        params = {}
+        if since is not None:
+            params["since"] = since
+        if filters:
+            params["filters"] = json.dumps(filters)
+        timeout = httpx.Timeout(settings.portainer_timeout, connect=settings.portainer_connect_timeout, read=None)
+        async with self.client.stream("GET", f"/api/endpoints/{endpoint_id}/docker/events", params=params, timeout=timeout) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    @invalidates("containers")
+    async def start_container(self, container_id, endpoint_id=1):
+        await self._request("POST", f"/api/endpoints/{endpoint_id}/docker/containers/{container_id}/start")
+        # Returns 204 (or 304 if already started), no json body
+        return {"status": "started"}
+
+    @invalidates("containers")
+    async def stop_container(self, container_id, endpoint_id=1):
+        await self._request("POST", f"/api/endpoints/{endpoint_id}/docker/containers/{container_id}/stop")
+        # Returns 204 (or 304 if already stopped), no json body
+        return {"status": "stopped"}
+
+    @invalidates("containers")
+    async def restart_container(self, container_id, endpoint_id=1):
+        await self._request("POST", f"/api/endpoints/{endpoint_id}/docker/containers/{container_id}/restart")
+        # Returns 204 (or 304 if already restarted), no json body
+        return {"status": "restarted"}
+
+    async def get_stack(self, stack_id):
+        response = await self._request("GET", f"/api/stacks/{stack_id}")
         return response.json()
 
-    def create_stack_from_string(self, name, stack_file_content, endpoint_id=1):
+    async def get_stack_file(self, stack_id):
+        async def load():
+            response = await self._request("GET", f"/api/stacks/{stack_id}/file")
+            return response.json()
+
+        # Keyed by stack rather than environment; stack writes drop every cached file
+        ttl = self.cache_ttls.get("stack_files", 0) if self.cache is not None else 0
+        if ttl <= 0:
+            return await load()
+        return await self.cache.get_or_load(("stack_files", None, stack_id), ttl, load)
+
+    @invalidates("stacks", "containers", "images", "volumes", "networks")
+    async def create_stack_from_string(self, name, stack_file_content, endpoint_id=1):
         params = {
             "endpointId": endpoint_id
         }
@@ -58,11 +261,11 @@ class PortainerService:
             "Name": name,
             "StackFileContent": stack_file_content,
         }
-        response = requests.post(f"{self.portainer_url}/api/stacks/create/standalone/string", headers=self.headers, params=params, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", "/api/stacks/create/standalone/string", params=params, json=data, operation="deploy")
         return response.json()
 
-    def create_stack_from_file(self, name, file_content, endpoint_id=1):
+    @invalidates("stacks", "containers", "images", "volumes", "networks")
+    async def create_stack_from_file(self, name, file_content, endpoint_id=1):
         params = {
             "endpointId": endpoint_id
         }
@@ -72,11 +275,11 @@ class PortainerService:
             "StackFileContent": stack_file_content,
         }
 
-        response = requests.post(f"{self.portainer_url}/api/stacks/create/standalone/string", headers=self.headers, params=params, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", "/api/stacks/create/standalone/string", params=params, json=data, operation="deploy")
         return response.json()
 
-    def create_stack_from_repository(self, name, repository_url, repository_reference_name, compose_file, endpoint_id=1, repository_authentication=False, repository_username=None, repository_password=None):
+    @invalidates("stacks", "containers", "images", "volumes", "networks")
+    async def create_stack_from_repository(self, name, repository_url, repository_reference_name, compose_file, endpoint_id=1, repository_authentication=False, repository_username=None, repository_password=None):
         params = {
             "type": 2,  # Standalone Docker Compose
             "method": "repository",
@@ -94,213 +297,375 @@ class PortainerService:
         # Remove null values from data
         data = {k: v for k, v in data.items() if v is not None}
 
-        response = requests.post(f"{self.portainer_url}/api/stacks", headers=self.headers, params=params, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", "/api/stacks", params=params, json=data, operation="deploy")
         return response.json()
 
-    def update_stack(self, stack_id, stack_file_content, endpoint_id=1):
+    async def update_stack(self, stack_id, stack_file_content, endpoint_id=1, force=False, dry_run=False):
+        """Redeploy a stack unless the submitted file matches the deployed one.
+
+        Files are compared by a formatting-insensitive hash against the cached
+        deployed file. ``force`` redeploys regardless; ``dry_run`` only reports
+        whether a redeploy would happen, with a diff.
+        """
+        submitted_hash = stack_file_hash(stack_file_content)
+        if dry_run:
+            deployed = (await self.get_stack_file(stack_id)).get("StackFileContent") or ""
+            deployed_hash = stack_file_hash(deployed)
+            return {
+                "status": "dry_run",
+                "stack_id": stack_id,
+                "changed": deployed_hash != submitted_hash,
+                "deployed_hash": deployed_hash,
+                "submitted_hash": submitted_hash,
+                "diff": diff_stack_files(deployed, stack_file_content),
+            }
+        if not force:
+            try:
+                deployed = (await self.get_stack_file(stack_id)).get("StackFileContent") or ""
+            except httpx.HTTPError:
+                deployed = None  # cannot tell, so deploy
+            if deployed is not None and stack_file_hash(deployed) == submitted_hash:
+                return {"status": "unchanged", "stack_id": stack_id, "hash": submitted_hash}
+        return await self._redeploy_stack(stack_id, stack_file_content, endpoint_id)
+
+    @invalidates("stacks", "containers", "images", "volumes", "networks")
+    async def _redeploy_stack(self, stack_id, stack_file_content, endpoint_id=1):
         params = {
             "endpointId": endpoint_id
         }
         data = {
             "stackFileContent": stack_file_content
         }
-        response = requests.put(f"{self.portainer_url}/api/stacks/{stack_id}", headers=self.headers, params=params, json=data)
-        response.raise_for_status()
+        try:
+            response = await self._request("PUT", f"/api/stacks/{stack_id}", params=params, json=data, operation="deploy")
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate("stack_files")
         return response.json()
 
-    def delete_stack(self, stack_id, endpoint_id=1):
+    @invalidates("stacks", "containers", "volumes", "networks")
+    async def delete_stack(self, stack_id, endpoint_id=1):
         params = {
             "endpointId": endpoint_id
         }
-        response = requests.delete(f"{self.portainer_url}/api/stacks/{stack_id}", headers=self.headers, params=params)
-        response.raise_for_status()
+        try:
+            response = await self._request("DELETE", f"/api/stacks/{stack_id}", params=params)
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate("stack_files")
         return response.json()
 
     # Images
-    def get_images(self, endpoint_id=1):
-        response = requests.get(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/images/json", headers=self.headers)
-        response.raise_for_status()
+    @cached("images")
+    async def get_images(self, endpoint_id=1):
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/images/json")
+        return response.json()
+
+    async def get_images_raw(self, endpoint_id=1):
+        return await self.get_raw(f"/api/endpoints/{endpoint_id}/docker/images/json", "images", endpoint_id)
+
+    async def find_images(self, endpoint_id, filters=None):
+        """List images with Docker-side ``filters`` (``label``, ``dangling``, ``reference``...); not cached."""
+        params = {"filters": json.dumps(filters)} if filters else None
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/images/json", params=params)
         return response.json()
 
-    def pull_image(self, from_image, tag, endpoint_id=1):
+    @invalidates("images")
+    async def pull_image(self, from_image, tag, endpoint_id=1):
+        # Drain the progress stream so we only answer once the image is present
+        progress = PullProgress(f"{from_image}:{tag}" if tag else from_image)
+        async for message in self.stream_pull_image(from_image, tag, endpoint_id):
+            progress.update(message)
+        if progress.error is not None:
+            raise Exception(progress.error)
+        return {"status": "pulled", "image": progress.image, "detail": progress.status, "digest": progress.digest}
+
+    async def stream_pull_image(self, from_image, tag, endpoint_id=1):
+        """Yield Docker's pull progress messages as they arrive, without buffering the body."""
         params = {
             "fromImage": from_image,
-            "tag": tag
         }
-        response = requests.post(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/images/create", headers=self.headers, params=params)
-        response.raise_for_status()
-        # This endpoint returns a stream, we'll just return the success status
-        return {"status": "pull request sent"}
-
-    def remove_image(self, image_id, endpoint_id=1):
-        response = requests.delete(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/images/{image_id}", headers=self.headers)
-        response.raise_for_status()
+        if tag:
+            params["tag"] = tag
+        path = f"/api/endpoints/{endpoint_id}/docker/images/create"
+        breaker = self.breakers.for_path(path)
+        try:
+            breaker.before_call()
+            request = self.client.build_request("POST", path, params=params, timeout=self.timeouts["deploy"])
+            # The pull holds its admission slot until the progress stream ends
+            async with self._slot(path):
+                try:
+                    with observe_upstream("POST", path, self.name) as outcome:
+                        response = await self.client.send(request, stream=True)
+                        outcome["status"] = response.status_code
+                except httpx.TransportError:
+                    breaker.record_failure()
+                    raise
+                try:
+                    if response.status_code in RETRYABLE_STATUS:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    if response.is_error:
+                        await response.aread()
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if line.strip():
+                            yield json.loads(line)
+                finally:
+                    await response.aclose()
+        finally:
+            if self.inflight is not None:
+                self.inflight.forget()
+            if self.cache is not None:
+                self.cache.invalidate("images", endpoint_id)
+
+    @invalidates("images")
+    async def remove_image(self, image_id, endpoint_id=1):
+        response = await self._request("DELETE", f"/api/endpoints/{endpoint_id}/docker/images/{image_id}")
         return response.json()
 
     # Volumes
-    def get_volumes(self, endpoint_id=1):
-        response = requests.get(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/volumes", headers=self.headers)
-        response.raise_for_status()
+    @cached("volumes")
+    async def get_volumes(self, endpoint_id=1):
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/volumes")
         return response.json().get("Volumes", [])
 
-    def create_volume(self, name, driver="local", endpoint_id=1):
+    async def find_volumes(self, endpoint_id, filters=None):
+        """List volumes with Docker-side ``filters`` (``label``, ``dangling``, ``name``, ``driver``); not cached."""
+        params = {"filters": json.dumps(filters)} if filters else None
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/volumes", params=params)
+        return response.json().get("Volumes") or []
+
+    @invalidates("volumes")
+    async def create_volume(self, name, driver="local", endpoint_id=1):
         data = {
             "Name": name,
             "Driver": driver
         }
-        response = requests.post(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/volumes/create", headers=self.headers, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", f"/api/endpoints/{endpoint_id}/docker/volumes/create", json=data)
         return response.json()
 
-    def remove_volume(self, volume_id, endpoint_id=1):
-        response = requests.delete(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/volumes/{volume_id}", headers=self.headers)
+    @invalidates("volumes")
+    async def remove_volume(self, volume_id, endpoint_id=1):
+        await self._request("DELETE", f"/api/endpoints/{endpoint_id}/docker/volumes/{volume_id}")
         # Returns 204 on success, no json body
-        response.raise_for_status()
         return {"status": "deleted"}
 
     # Networks
-    def get_networks(self, endpoint_id=1):
-        response = requests.get(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/networks", headers=self.headers)
-        response.raise_for_status()
+    @cached("networks")
+    async def get_networks(self, endpoint_id=1):
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/networks")
         return response.json()
 
-    def create_network(self, name, driver="bridge", endpoint_id=1):
+    async def get_networks_raw(self, endpoint_id=1):
+        return await self.get_raw(f"/api/endpoints/{endpoint_id}/docker/networks", "networks", endpoint_id)
+
+    async def find_networks(self, endpoint_id, filters=None):
+        """List networks with Docker-side ``filters`` (``label``, ``dangling``, ``name``, ``driver``); not cached."""
+        params = {"filters": json.dumps(filters)} if filters else None
+        response = await self._request("GET", f"/api/endpoints/{endpoint_id}/docker/networks", params=params)
+        return response.json()
+
+    @invalidates("networks")
+    async def create_network(self, name, driver="bridge", endpoint_id=1):
         data = {
             "Name": name,
             "Driver": driver
         }
-        response = requests.post(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/networks/create", headers=self.headers, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", f"/api/endpoints/{endpoint_id}/docker/networks/create", json=data)
         return response.json()
 
-    def remove_network(self, network_id, endpoint_id=1):
-        response = requests.delete(f"{self.portainer_url}/api/endpoints/{endpoint_id}/docker/networks/{network_id}", headers=self.headers)
+    @invalidates("networks")
+    async def remove_network(self, network_id, endpoint_id=1):
+        await self._request("DELETE", f"/api/endpoints/{endpoint_id}/docker/networks/{network_id}")
         # Returns 204 on success, no json body
-        response.raise_for_status()
         return {"status": "deleted"}
 
     # Users
-    def get_users(self):
-        response = requests.get(f"{self.portainer_url}/api/users", headers=self.headers)
-        response.raise_for_status()
+    @cached("users")
+    async def get_users(self):
+        response = await self._request("GET", "/api/users")
         return response.json()
 
-    def create_user(self, username, password, role=2):
+    @invalidates("users")
+    async def create_user(self, username, password, role=2):
         data = {
             "username": username,
             "password": password,
             "role": role
         }
-        response = requests.post(f"{self.portainer_url}/api/users", headers=self.headers, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", "/api/users", json=data)
         return response.json()
 
-    def delete_user(self, user_id):
-        response = requests.delete(f"{self.portainer_url}/api/users/{user_id}", headers=self.headers)
+    @invalidates("users", "teams", "memberships")
+    async def delete_user(self, user_id):
+        await self._request("DELETE", f"/api/users/{user_id}")
         # Returns 204 on success
-        response.raise_for_status()
         return {"status": "deleted"}
 
     # Teams
-    def get_teams(self):
-        response = requests.get(f"{self.portainer_url}/api/teams", headers=self.headers)
-        response.raise_for_status()
+    @cached("teams")
+    async def get_teams(self):
+        response = await self._request("GET", "/api/teams")
         return response.json()
 
-    def create_team(self, name):
+    @invalidates("teams")
+    async def create_team(self, name):
         data = {
             "name": name
         }
-        response = requests.post(f"{self.portainer_url}/api/teams", headers=self.headers, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", "/api/teams", json=data)
         return response.json()
 
-    def delete_team(self, team_id):
-        response = requests.delete(f"{self.portainer_url}/api/teams/{team_id}", headers=self.headers)
+    @invalidates("teams", "memberships")
+    async def delete_team(self, team_id):
+        await self._request("DELETE", f"/api/teams/{team_id}")
         # Returns 204 on success
-        response.raise_for_status()
         return {"status": "deleted"}
 
-    def get_team_memberships(self, team_id):
-        response = requests.get(f"{self.portainer_url}/api/teams/{team_id}/memberships", headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+    async def get_team_memberships(self, team_id):
+        async def load():
+            response = await self._request("GET", f"/api/teams/{team_id}/memberships")
+            return response.json()
 
-    def add_user_to_team(self, team_id, user_id, role=2):
+        ttl = self.cache_ttls.get("memberships", 0) if self.cache is not None else 0
+        if ttl <= 0:
+            return await load()
+        return await self.cache.get_or_load(("memberships", None, team_id), ttl, load)
+
+    async def membership_index(self, team_id):
+        """Memberships of a team by ``(team_id, user_id)``; rebuilt only when the cached list changes."""
+        memberships = await self.get_team_memberships(team_id)
+        return self.indexes.get(("memberships", team_id), memberships, MembershipIndex)
+
+    @invalidates("teams", "memberships")
+    async def add_user_to_team(self, team_id, user_id, role=2):
         data = {
             "userID": user_id,
             "role": role
         }
-        response = requests.post(f"{self.portainer_url}/api/teams/{team_id}/memberships", headers=self.headers, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", f"/api/teams/{team_id}/memberships", json=data)
         return response.json()
 
-    def remove_user_from_team(self, team_id, user_id):
-        # First, find the membership ID for the user in the team
-        memberships = self.get_team_memberships(team_id)
-        membership_id = None
-        for member in memberships:
-            if member["UserID"] == user_id:
-                membership_id = member["Id"]
-                break
-        
-        if not membership_id:
-            raise Exception("User is not a member of the team")
+    @invalidates("memberships")
+    async def update_team_membership(self, membership_id, team_id, user_id, role):
+        data = {
+            "UserID": user_id,
+            "TeamID": team_id,
+            "Role": role,
+        }
+        response = await self._request("PUT", f"/api/team_memberships/{membership_id}", json=data)
+        return response.json()
 
-        response = requests.delete(f"{self.portainer_url}/api/teams/{team_id}/memberships/{membership_id}", headers=self.headers)
+    @invalidates("teams", "memberships")
+    async def delete_team_membership(self, team_id, membership_id):
+        await self._request("DELETE", f"/api/teams/{team_id}/memberships/{membership_id}")
         # Returns 204 on success
-        response.raise_for_status()
         return {"status": "deleted"}
 
+    async def remove_user_from_team(self, team_id, user_id):
+        # Indexed lookup; a miss may just be a stale cache, so check upstream once more
+        membership = (await self.membership_index(team_id)).get(team_id, user_id)
+        if membership is None and self.cache is not None:
+            self.cache.invalidate("memberships")
+            membership = (await self.membership_index(team_id)).get(team_id, user_id)
+
+        if membership is None:
+            raise Exception("User is not a member of the team")
+
+        return await self.delete_team_membership(team_id, membership["Id"])
+
     # Kubernetes
-    def _get_k8s_resource(self, endpoint_id, resource_path):
-        """Helper function to query the Kubernetes API through Portainer."""
-        url = f"{self.portainer_url}/api/endpoints/{endpoint_id}/kubernetes/{resource_path}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
+    async def _get_k8s_resource(self, endpoint_id, resource_path, label_selector=None, field_selector=None, limit=None, continue_token=None, raw=False):
+        """Helper function to query the Kubernetes API through Portainer.
+
+        Selectors are evaluated by the API server and ``limit``/``continue_token``
+        map to Kubernetes list pagination. With ``raw`` the body is returned
+        undecoded as a ``RawResponse``.
+        """
+        path = f"/api/endpoints/{endpoint_id}/kubernetes/{resource_path}"
+        params = {
+            "labelSelector": label_selector,
+            "fieldSelector": field_selector,
+            "limit": limit,
+            "continue": continue_token,
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        if raw:
+            return await self.get_raw(path, params=params)
+        response = await self._request("GET", path, params=params)
         return response.json()
 
-    def get_kubernetes_nodes(self, endpoint_id):
-        return self._get_k8s_resource(endpoint_id, "api/v1/nodes")
-
-    def get_kubernetes_namespaces(self, endpoint_id):
-        return self._get_k8s_resource(endpoint_id, "api/v1/namespaces")
-
-    def get_kubernetes_pods(self, endpoint_id, namespace=None):
-        if namespace:
-            path = f"api/v1/namespaces/{namespace}/pods"
-        else:
-            path = "api/v1/pods"
-        return self._get_k8s_resource(endpoint_id, path)
-
-    def get_kubernetes_deployments(self, endpoint_id, namespace=None):
-        if namespace:
-            path = f"apis/apps/v1/namespaces/{namespace}/deployments"
-        else:
-            path = "apis/apps/v1/deployments"
-        return self._get_k8s_resource(endpoint_id, path)
-
-    def get_kubernetes_services(self, endpoint_id, namespace=None):
-        if namespace:
-            path = f"api/v1/namespaces/{namespace}/services"
-        else:
-            path = "api/v1/services"
-        return self._get_k8s_resource(endpoint_id, path)
-
-    def get_kubernetes_applications(self, endpoint_id):
-        all_stacks = self.get_stacks(endpoint_id)
-        kubernetes_apps = [stack for stack in all_stacks if stack.get("Type") == 2]
-        return kubernetes_apps
-
-    def create_kubernetes_application(self, name, manifest_content, endpoint_id):
+    async def iter_k8s_resource(self, endpoint_id, resource_path, label_selector=None, field_selector=None, page_size=500, first_page=None):
+        """Yield list items page by page, following ``metadata.continue`` until the list is exhausted."""
+        page = first_page
+        if page is None:
+            page = await self._get_k8s_resource(endpoint_id, resource_path, label_selector, field_selector, page_size)
+        while True:
+            for item in page.get("items") or []:
+                yield item
+            continue_token = (page.get("metadata") or {}).get("continue")
+            if not continue_token:
+                return
+            page = await self._get_k8s_resource(endpoint_id, resource_path, label_selector, field_selector, page_size, continue_token)
+
+    async def watch_k8s_resource(self, endpoint_id, resource_path, resource_version, timeout_seconds=300):
+        """Yield watch events (``ADDED``/``MODIFIED``/``DELETED``/``BOOKMARK``/``ERROR``) until the server ends the watch."""
+        path = f"/api/endpoints/{endpoint_id}/kubernetes/{resource_path}"
+        params = {
+            "watch": 1,
+            "resourceVersion": resource_version,
+            "allowWatchBookmarks": "true",
+            "timeoutSeconds": timeout_seconds,
+        }
+        timeout = httpx.Timeout(settings.portainer_timeout, connect=settings.portainer_connect_timeout, read=timeout_seconds + 30)
+        async with self.client.stream("GET", path, params=params, timeout=timeout) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    def kubernetes_list_path(self, resource, namespace=None):
+        api, namespaced = KUBERNETES_LISTS[resource]
+        if namespace and namespaced:
+            return f"{api}/namespaces/{namespace}/{resource}"
+        return f"{api}/{resource}"
+
+    async def get_kubernetes_nodes(self, endpoint_id, **list_options):
+        return await self._get_k8s_resource(endpoint_id, self.kubernetes_list_path("nodes"), **list_options)
+
+    async def get_kubernetes_namespaces(self, endpoint_id, **list_options):
+        return await self._get_k8s_resource(endpoint_id, self.kubernetes_list_path("namespaces"), **list_options)
+
+    async def get_kubernetes_pods(self, endpoint_id, namespace=None, **list_options):
+        return await self._get_k8s_resource(endpoint_id, self.kubernetes_list_path("pods", namespace), **list_options)
+
+    async def get_kubernetes_deployments(self, endpoint_id, namespace=None, **list_options):
+        return await self._get_k8s_resource(endpoint_id, self.kubernetes_list_path("deployments", namespace), **list_options)
+
+    async def get_kubernetes_services(self, endpoint_id, namespace=None, **list_options):
+        return await self._get_k8s_resource(endpoint_id, self.kubernetes_list_path("services", namespace), **list_options)
+
+    async def get_kubernetes_applications(self, endpoint_id):
+        return (await self.stack_index(endpoint_id)).of_type(KUBERNETES_STACK)
+
+    @invalidates("stacks")
+    async def create_kubernetes_application(self, name, manifest_content, endpoint_id):
         data = {
             "name": name,
             "stackFileContent": manifest_content,
         }
-        # type=2 for Kubernetes
-        response = requests.post(f"{self.portainer_url}/api/stacks?type=2&method=string&endpointId={endpoint_id}", headers=self.headers, json=data)
-        response.raise_for_status()
+        response = await self._request("POST", f"/api/stacks?type={KUBERNETES_STACK}&method=string&endpointId={endpoint_id}", json=data, operation="deploy")
         return response.json()
 
 portainer_service = PortainerService()
+
+# Every Portainer server this process serves, by instance name; portainer_service is the default one
+portainer_services = {portainer_service.name: portainer_service}
+for _name, _instance in settings.portainer_instances.items():
+    if _name in portainer_services:
+        raise ValueError(f"Portainer instance '{_name}' is already the default instance (PORTAINER_INSTANCE)")
+    portainer_services[_name] = PortainerService(_instance.url, _instance.api_key, _name)
@@ -0,0 +1,81 @@
+import base64
+import json
+
+from fastapi import HTTPException, Query
+
+
+def docker_filters(**filters):
+    """Build Docker's ``filters`` map, dropping unset values.
+
+    Lists are passed through, booleans become ``"true"``/``"false"`` and
+    scalars become one-element lists.
+    """
+    result = {}
+    for key, value in filters.items():
+        if value is None or value == []:
+            continue
+        if isinstance(value, bool):
+            value = ["true" if value else "false"]
+        elif not isinstance(value, list):
+            value = [str(value)]
+        result[key] = value
+    return result
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        key = None
+    if not isinstance(key, str):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def project(items, fields):
+    """Keep only the listed top-level keys of each item."""
+    if not fields:
+        return items
+    return [{k: item[k] for k in fields if k in item} for item in items]
+
+
+def paginate(items, sort_field, limit=None, after=None):
+    """Sort by ``sort_field`` and return ``(page, next_cursor)``.
+
+    The cursor encodes the last key returned, so pages stay stable when items
+    are added or removed between requests.
+    """
+    items = sorted(items, key=lambda item: str(item.get(sort_field) or ""))
+    if after is not None:
+        items = [item for item in items if str(item.get(sort_field) or "") > after]
+    if not limit or len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    return page, encode_cursor(str(page[-1].get(sort_field) or ""))
+
+
+def list_options(
+    fields: str = Query(None, description="Comma-separated keys to keep in each item, e.g. Id,Names,State"),
+    limit: int = Query(None, ge=1),
+    cursor: str = Query(None, description="Value of X-Next-Cursor from the previous page"),
+):
+    return {
+        "fields": [f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        "limit": limit,
+        # Decoded here so a bad cursor is a 400, not an upstream error
+        "cursor": decode_cursor(cursor) if cursor else None,
+    }
+
+
+def shape_list(items, sort_field, options):
+    """Apply pagination and projection; returns ``(items, headers)``."""
+    headers = {}
+    if options["limit"] or options["cursor"] is not None:
+        items, next_cursor = paginate(items, sort_field, options["limit"], options["cursor"])
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+    return project(items, options["fields"]), headers
@@ -0,0 +1,134 @@
+import asyncio
+import random
+import re
+import time
+from urllib.parse import parse_qs
+
+# Responses that mean "the environment behind Portainer is unhealthy", not "bad request"
+RETRYABLE_STATUS = {502, 503, 504}
+
+_ENDPOINT_PATH = re.compile(r"^/api/endpoints/(\d+)/")
+
+
+def endpoint_id_of(path, params=None):
+    """Environment a Portainer call addresses, from ``/api/endpoints/{id}/...`` or an ``endpointId`` parameter."""
+    match = _ENDPOINT_PATH.match(path)
+    if match is not None:
+        return int(match.group(1))
+    # Stack calls name the environment in the query string (/api/stacks?endpointId=N) or in params
+    query = path.partition("?")[2]
+    value = (params or {}).get("endpointId") if isinstance(params, dict) else None
+    if value is None:
+        value = parse_qs(query).get("endpointId", [None])[0]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an environment whose circuit breaker is open."""
+
+    def __init__(self, endpoint_id, retry_after):
+        self.endpoint_id = endpoint_id
+        self.retry_after = retry_after
+        super().__init__(f"Endpoint {endpoint_id} is unavailable (circuit open); retry in {retry_after:.0f}s")
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures; one probe after ``reset_timeout``."""
+
+    def __init__(self, endpoint_id, failure_threshold=5, reset_timeout=30.0):
+        self.endpoint_id = endpoint_id
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.total_failures = 0
+        self.rejected = 0
+
+    def before_call(self):
+        if self.state == "closed":
+            return
+        now = time.monotonic()
+        elapsed = now - self.opened_at
+        # A probe that never reported back (e.g. cancelled) does not block the next one
+        if elapsed >= self.reset_timeout:
+            self.state = "half_open"
+            self.opened_at = now
+            return
+        self.rejected += 1
+        raise CircuitOpenError(self.endpoint_id, max(self.reset_timeout - elapsed, 1.0))
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        self.total_failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self):
+        return {
+            "endpoint_id": self.endpoint_id,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "total_failures": self.total_failures,
+            "rejected": self.rejected,
+        }
+
+
+class BreakerRegistry:
+    """One circuit breaker per Portainer environment, created on first use."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers = {}
+
+    def for_path(self, path, params=None):
+        """Breaker for the environment addressed by ``path`` or its ``endpointId`` parameter, or None for Portainer-level calls."""
+        endpoint_id = endpoint_id_of(path, params)
+        if endpoint_id is None:
+            return None
+        breaker = self._breakers.get(endpoint_id)
+        if breaker is None:
+            breaker = CircuitBreaker(endpoint_id, self.failure_threshold, self.reset_timeout)
+            self._breakers[endpoint_id] = breaker
+        return breaker
+
+    def stats(self):
+        return [breaker.stats() for breaker in self._breakers.values()]
+
+
+async def hedged(call, hedge_after):
+    """Start ``call()``; if it has not finished after ``hedge_after`` seconds, race a second copy.
+
+    The first result wins and the other attempt is cancelled. Only for idempotent reads.
+    """
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_after)
+        if done:
+            return first.result()
+        pending.add(asyncio.ensure_future(call()))
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        # Both attempts failed: surface the original one's error
+        return first.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,17 @@
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson, for payloads we had to transform."""
+
+    def render(self, content):
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def passthrough(raw, headers=None):
+    """Send an upstream body as-is: no JSON decode, no re-encode. An upstream ETag is forwarded."""
+    headers = dict(headers or {})
+    if raw.etag:
+        headers.setdefault("ETag", raw.etag)
+    return Response(raw.content, media_type=raw.media_type, headers=headers)
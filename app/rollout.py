@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+from .fleet import gather_bounded
+
+# Label Docker puts on a stack's containers, by Portainer stack type (1 = Swarm, 2 = Compose)
+_PROJECT_LABELS = {1: "com.docker.stack.namespace", 2: "com.docker.compose.project"}
+
+
+def plan_waves(endpoint_ids, sizes):
+    """Split targets into waves of the given sizes; the last size repeats, e.g. ``[1, 5]`` = canary then fives."""
+    waves, offset, index = [], 0, 0
+    while offset < len(endpoint_ids):
+        size = max(1, sizes[min(index, len(sizes) - 1)])
+        waves.append(endpoint_ids[offset:offset + size])
+        offset += size
+        index += 1
+    return waves
+
+
+def stack_health(containers):
+    """``(healthy, summary)`` for a stack's containers.
+
+    Healthy means at least one container, every container running (or exited
+    with code 0, for one-shot services) and none whose healthcheck is failing
+    or still starting.
+    """
+    summary = []
+    healthy = bool(containers)
+    for container in containers:
+        names = container.get("Names") or []
+        state, status = container.get("State"), container.get("Status") or ""
+        ok = (state == "running" and "(unhealthy)" not in status and "(health: starting)" not in status) or (
+            state == "exited" and status.startswith("Exited (0)")
+        )
+        healthy = healthy and ok
+        summary.append({"name": names[0].lstrip("/") if names else container.get("Id"), "state": state, "status": status, "ok": ok})
+    return healthy, summary
+
+
+class RolloutFailed(Exception):
+    def __init__(self, message, health=None):
+        self.health = health
+        super().__init__(message)
+
+
+class StackRollout:
+    """Deploy one stack file to many environments in waves, gated on container health.
+
+    Each environment gets the stack created (if missing) or updated (no-op
+    when the file is unchanged), then is polled until the stack's containers
+    are healthy. A wave completes when all its environments have; once more
+    than ``max_failures`` environments failed the rollout stops and, with
+    ``on_failure="rollback"``, every environment touched so far is restored:
+    updated stacks get their previous file back, created stacks are removed.
+    Progress is reported through ``emit(event, **data)``.
+    """
+
+    def __init__(self, service, name, content, endpoint_ids, waves=(1, 5), parallelism=None, on_failure="rollback",
+                 max_failures=0, health_timeout=120.0, health_interval=3.0, force=False):
+        self.service = service
+        self.name = name
+        self.content = content
+        self.endpoint_ids = list(endpoint_ids)
+        self.waves = plan_waves(self.endpoint_ids, list(waves))
+        self.parallelism = parallelism
+        self.on_failure = on_failure
+        self.max_failures = max_failures
+        self.health_timeout = health_timeout
+        self.health_interval = health_interval
+        self.force = force
+        # endpoint_id -> what was done there and how to undo it
+        self.records = {}
+
+    async def _wait_healthy(self, endpoint_id, stack_type):
+        label = f"{_PROJECT_LABELS.get(stack_type, _PROJECT_LABELS[2])}={self.name.lower() if stack_type != 1 else self.name}"
+        deadline = time.monotonic() + self.health_timeout
+        while True:
+            healthy, summary = stack_health(await self.service.find_containers(endpoint_id, {"label": [label]}))
+            if healthy:
+                return summary
+            if time.monotonic() >= deadline:
+                raise RolloutFailed(f"Stack not healthy after {self.health_timeout:g}s", summary)
+            await asyncio.sleep(self.health_interval)
+
+    async def _deploy(self, endpoint_id, wave, emit):
+        record = self.records[endpoint_id] = {"endpoint_id": endpoint_id, "wave": wave, "status": "deploying"}
+        started = time.monotonic()
+        try:
+            stack = (await self.service.stack_index(endpoint_id)).named(self.name)
+            # Some Portainer versions ignore the endpointId filter; never touch another environment's stack
+            if stack is not None and stack.get("EndpointId", endpoint_id) != endpoint_id:
+                stack = None
+            if stack is None:
+                record["action"] = "created"
+                created = await self.service.create_stack_from_string(self.name, self.content, endpoint_id)
+                record.update(stack_id=created.get("Id"), stack_type=created.get("Type", 2))
+            else:
+                record.update(stack_id=stack["Id"], stack_type=stack.get("Type", 2))
+                record["previous"] = (await self.service.get_stack_file(stack["Id"])).get("StackFileContent")
+                record["action"] = "updating"
+                result = await self.service.update_stack(stack["Id"], self.content, endpoint_id, force=self.force)
+                record["action"] = "unchanged" if result.get("status") == "unchanged" else "updated"
+            await emit("deployed", endpoint_id=endpoint_id, wave=wave, action=record["action"],
+                       elapsed_ms=round((time.monotonic() - started) * 1000, 1))
+            record["health"] = await self._wait_healthy(endpoint_id, record["stack_type"])
+            record["status"] = "ok"
+            await emit("healthy", endpoint_id=endpoint_id, wave=wave, containers=record["health"])
+        except Exception as e:
+            record.update(status="failed", error=str(e) or type(e).__name__)
+            if isinstance(e, RolloutFailed):
+                record["health"] = e.health
+            await emit("endpoint_failed", endpoint_id=endpoint_id, wave=wave, error=record["error"], containers=record.get("health"))
+        record["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+
+    @staticmethod
+    def _changed(record):
+        if record.get("action") == "created":
+            return record.get("stack_id") is not None
+        return record.get("action") in ("updating", "updated") and record.get("previous") is not None
+
+    async def _rollback(self, record, emit):
+        endpoint_id = record["endpoint_id"]
+        try:
+            if record["action"] == "created":
+                await self.service.delete_stack(record["stack_id"], endpoint_id)
+            else:
+                await self.service.update_stack(record["stack_id"], record["previous"], endpoint_id, force=True)
+            record["status"] = "rolled_back"
+            await emit("rolled_back", endpoint_id=endpoint_id)
+        except Exception as e:
+            record.update(status="rollback_failed", rollback_error=str(e) or type(e).__name__)
+            await emit("rollback_failed", endpoint_id=endpoint_id, error=record["rollback_error"])
+
+    async def run(self, emit):
+        started = time.monotonic()
+        await emit("rollout_started", stack=self.name, waves=self.waves)
+        failures = 0
+        halted = False
+        waves = []
+        for number, endpoint_ids in enumerate(self.waves, start=1):
+            await emit("wave_started", wave=number, endpoint_ids=endpoint_ids)
+            await gather_bounded(
+                endpoint_ids, lambda endpoint_id: self._deploy(endpoint_id, number, emit), self.parallelism or len(endpoint_ids)
+            )
+            failed = [e for e in endpoint_ids if self.records[e]["status"] == "failed"]
+            failures += len(failed)
+            waves.append({"wave": number, "endpoint_ids": endpoint_ids, "failed": failed})
+            await emit("wave_finished", wave=number, succeeded=len(endpoint_ids) - len(failed), failed=failed)
+            if failures > self.max_failures and self.on_failure != "continue":
+                halted = True
+                break
+
+        status = "succeeded" if not failures else "completed_with_failures"
+        if halted:
+            status = "halted"
+            await emit("halted", failures=failures, on_failure=self.on_failure)
+            if self.on_failure == "rollback":
+                touched = [r for r in self.records.values() if self._changed(r)]
+                await gather_bounded(
+                    touched, lambda record: self._rollback(record, emit), self.parallelism or len(touched) or 1
+                )
+                status = "rolled_back" if all(r["status"] == "rolled_back" for r in touched) else "rollback_failed"
+
+        endpoints = [
+            {key: value for key, value in self.records.get(endpoint_id, {"endpoint_id": endpoint_id, "status": "not_started"}).items()
+             if key not in ("previous", "stack_type")}
+            for endpoint_id in self.endpoint_ids
+        ]
+        return {
+            "stack": self.name,
+            "status": status,
+            "failures": failures,
+            "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+            "waves": waves,
+            "endpoints": endpoints,
+        }
+
@@ -0,0 +1,46 @@
+import asyncio
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one in-flight upstream call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still running await the same task and receive its result (or exception).
+    After a write, ``forget()`` makes later callers start a fresh call instead
+    of joining one that may have read the state from before the write.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.collapsed += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        # Shield so one cancelled waiter does not cancel the call for the others.
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        # After forget() the key may already belong to a newer call
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every waiter went away
+
+    def forget(self):
+        """Detach every in-flight call: current waiters still get its result, new callers do not."""
+        self._calls.clear()
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            "upstream_calls": self.calls,
+            "collapsed": self.collapsed,
+        }
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from .fleet import DOCKER_ENDPOINT_TYPES, gather_bounded
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KINDS = ("containers", "images", "volumes", "networks", "stacks")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS endpoints (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    type INTEGER,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS resources (
+    endpoint_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    image TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (endpoint_id, kind, id)
+);
+-- image/name searches match substrings, which no B-tree index can serve
+DROP INDEX IF EXISTS resources_image;
+DROP INDEX IF EXISTS resources_name;
+CREATE TABLE IF NOT EXISTS labels (
+    endpoint_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS labels_key_value ON labels (key, value);
+CREATE INDEX IF NOT EXISTS labels_resource ON labels (endpoint_id, kind, id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    endpoint_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    refreshed_at REAL,
+    hash TEXT,
+    error TEXT,
+    PRIMARY KEY (endpoint_id, kind)
+);
+"""
+
+
+def _row(kind, item):
+    """``(id, name, image, labels)`` extracted from a Docker/Portainer list item."""
+    if kind == "containers":
+        names = item.get("Names") or []
+        return item.get("Id"), names[0].lstrip("/") if names else None, item.get("Image"), item.get("Labels")
+    if kind == "images":
+        tags = item.get("RepoTags") or []
+        return item.get("Id"), tags[0] if tags else None, ",".join(tags) or None, item.get("Labels")
+    if kind == "volumes":
+        return item.get("Name"), item.get("Name"), None, item.get("Labels")
+    if kind == "networks":
+        return item.get("Id"), item.get("Name"), None, item.get("Labels")
+    return str(item.get("Id")), item.get("Name"), None, None
+
+
+class SnapshotStore:
+    """Last known endpoints and Docker resources, persisted in a local SQLite file.
+
+    The file survives restarts, so searches are answered immediately at boot
+    and refreshed in the background. Each ``(endpoint, kind)`` list is only
+    rewritten when its content hash changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # Writes
+    def replace_endpoints(self, endpoints):
+        ids = [e["Id"] for e in endpoints]
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM endpoints")
+            self._db.executemany(
+                "INSERT INTO endpoints (id, name, type, data) VALUES (?, ?, ?, ?)",
+                [(e["Id"], e.get("Name"), e.get("Type"), json.dumps(e)) for e in endpoints],
+            )
+            # Environments removed from Portainer take their resources with them
+            for table in ("resources", "labels", "sync_state"):
+                if ids:
+                    self._db.execute(f"DELETE FROM {table} WHERE endpoint_id NOT IN ({','.join('?' * len(ids))})", ids)
+                else:
+                    self._db.execute(f"DELETE FROM {table}")
+
+    def replace_resources(self, endpoint_id, kind, items):
+        """Store one environment's list of ``kind``; returns False when it was unchanged."""
+        digest = hashlib.sha1(json.dumps(items, sort_keys=True).encode()).hexdigest()
+        now = time.time()
+        with self._lock, self._db:
+            previous = self._db.execute(
+                "SELECT hash FROM sync_state WHERE endpoint_id = ? AND kind = ?", (endpoint_id, kind)
+            ).fetchone()
+            if previous is not None and previous["hash"] == digest:
+                self._db.execute(
+                    "UPDATE sync_state SET refreshed_at = ?, error = NULL WHERE endpoint_id = ? AND kind = ?",
+                    (now, endpoint_id, kind),
+                )
+                return False
+            self._db.execute("DELETE FROM resources WHERE endpoint_id = ? AND kind = ?", (endpoint_id, kind))
+            self._db.execute("DELETE FROM labels WHERE endpoint_id = ? AND kind = ?", (endpoint_id, kind))
+            resources, labels = [], []
+            for item in items:
+                item_id, name, image, item_labels = _row(kind, item)
+                resources.append((endpoint_id, kind, item_id, name, image, json.dumps(item)))
+                labels.extend((endpoint_id, kind, item_id, k, v) for k, v in (item_labels or {}).items())
+            self._db.executemany(
+                "INSERT OR REPLACE INTO resources (endpoint_id, kind, id, name, image, data) VALUES (?, ?, ?, ?, ?, ?)",
+                resources,
+            )
+            self._db.executemany("INSERT INTO labels (endpoint_id, kind, id, key, value) VALUES (?, ?, ?, ?, ?)", labels)
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (endpoint_id, kind, refreshed_at, hash, error) VALUES (?, ?, ?, ?, NULL)",
+                (endpoint_id, kind, now, digest),
+            )
+            return True
+
+    def record_error(self, endpoint_id, kind, error):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sync_state (endpoint_id, kind, error) VALUES (?, ?, ?) "
+                "ON CONFLICT (endpoint_id, kind) DO UPDATE SET error = excluded.error",
+                (endpoint_id, kind, error),
+            )
+
+    # Reads
+    def search(self, kinds=None, endpoint_ids=None, image=None, label=None, name=None, limit=100, full=False):
+        """Match resources by image/name substring and ``key`` or ``key=value`` label.
+
+        Labels and environments are looked up through indexes; image and name
+        substrings are a scan of the (local, already filtered) resource rows.
+        """
+        where, params = [], []
+        if kinds:
+            where.append(f"r.kind IN ({','.join('?' * len(kinds))})")
+            params.extend(kinds)
+        if endpoint_ids:
+            where.append(f"r.endpoint_id IN ({','.join('?' * len(endpoint_ids))})")
+            params.extend(endpoint_ids)
+        if image:
+            where.append("r.image LIKE ?")
+            params.append(f"%{image}%")
+        if name:
+            where.append("r.name LIKE ?")
+            params.append(f"%{name}%")
+        if label:
+            key, sep, value = label.partition("=")
+            where.append(
+                "EXISTS (SELECT 1 FROM labels l WHERE l.endpoint_id = r.endpoint_id AND l.kind = r.kind AND l.id = r.id "
+                "AND l.key = ?" + (" AND l.value = ?)" if sep else ")")
+            )
+            params.extend([key, value] if sep else [key])
+        sql = (
+            "SELECT r.endpoint_id, e.name AS endpoint_name, r.kind, r.id, r.name, r.image"
+            + (", r.data" if full else "")
+            + " FROM resources r LEFT JOIN endpoints e ON e.id = r.endpoint_id"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY r.endpoint_id, r.kind, r.name LIMIT ?"
+        )
+        params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        items = []
+        for row in rows:
+            item = {key: row[key] for key in ("endpoint_id", "endpoint_name", "kind", "id", "name", "image")}
+            if full:
+                item["data"] = json.loads(row["data"])
+            items.append(item)
+        return items
+
+    def staleness(self, kinds=None, endpoint_ids=None):
+        """Age of the data a search would read: oldest and newest refresh plus per-environment errors."""
+        with self._lock:
+            rows = self._db.execute("SELECT endpoint_id, kind, refreshed_at, error FROM sync_state").fetchall()
+        rows = [
+            r for r in rows
+            if (not kinds or r["kind"] in kinds) and (not endpoint_ids or r["endpoint_id"] in endpoint_ids)
+        ]
+        refreshed = [r["refreshed_at"] for r in rows if r["refreshed_at"]]
+        now = time.time()
+        return {
+            "oldest_age_seconds": round(now - min(refreshed), 1) if refreshed else None,
+            "newest_age_seconds": round(now - max(refreshed), 1) if refreshed else None,
+            "errors": [
+                {"endpoint_id": r["endpoint_id"], "kind": r["kind"], "error": r["error"]} for r in rows if r["error"]
+            ],
+        }
+
+
+class SnapshotRefresher:
+    """Background task that keeps a ``SnapshotStore`` in step with Portainer."""
+
+    def __init__(self, service, store, interval=300.0, concurrency=16):
+        self.service = service
+        self.store = store
+        self.interval = interval
+        self.concurrency = concurrency
+        self.refreshes = 0
+        self.last_refresh_seconds = None
+        self.last_error = None
+        self._task = None
+
+    async def _refresh_endpoint(self, endpoint):
+        endpoint_id = endpoint["Id"]
+        loaders = {"stacks": lambda: self.service.get_stacks(endpoint_id)}
+        if endpoint.get("Type") in DOCKER_ENDPOINT_TYPES:
+            loaders.update({
+                "containers": lambda: self.service.find_containers(endpoint_id),
+                "images": lambda: self.service.get_images(endpoint_id),
+                "volumes": lambda: self.service.get_volumes(endpoint_id),
+                "networks": lambda: self.service.get_networks(endpoint_id),
+            })
+        for kind, load in loaders.items():
+            try:
+                items = await load()
+            except Exception as e:
+                await asyncio.to_thread(self.store.record_error, endpoint_id, kind, str(e) or type(e).__name__)
+                continue
+            await asyncio.to_thread(self.store.replace_resources, endpoint_id, kind, items)
+
+    async def refresh(self):
+        started = time.monotonic()
+        endpoints = await self.service.get_endpoints()
+        await asyncio.to_thread(self.store.replace_endpoints, endpoints)
+        await gather_bounded(endpoints, self._refresh_endpoint, self.concurrency)
+        self.refreshes += 1
+        self.last_refresh_seconds = round(time.monotonic() - started, 3)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+                self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e) or type(e).__name__
+                logger.warning("Snapshot refresh failed: %s", self.last_error)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self):
+        return {
+            "path": self.store.path,
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": self.last_refresh_seconds,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,83 @@
+import difflib
+import hashlib
+import json
+
+try:
+    import yaml
+except ImportError:  # listed in requirements.txt; without it files are compared as normalized text
+    yaml = None
+
+
+def _normalize_text(content):
+    lines = content.lstrip("\ufeff").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    lines = [line.rstrip() for line in lines]
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def _parse(content):
+    """All YAML documents in ``content``, or None if PyYAML is missing or the file does not parse.
+
+    Scalars are kept as the strings written in the file (``BaseLoader``):
+    YAML 1.1 typing would make ``1.10`` equal ``1.1`` and ``yes`` equal
+    ``true``, which Compose and Kubernetes treat as different values.
+    """
+    if yaml is None:
+        return None
+    try:
+        return [doc for doc in yaml.load_all(content, Loader=yaml.BaseLoader) if doc not in (None, "")]
+    except yaml.YAMLError:
+        return None
+
+
+def stack_file_hash(content):
+    """Hash that ignores formatting: key order, comments, quoting and whitespace, but not scalar spelling.
+
+    Falls back to hashing whitespace-normalized text when the file is not
+    parseable YAML.
+    """
+    docs = _parse(content)
+    if docs is not None:
+        canonical = json.dumps(docs, sort_keys=True, separators=(",", ":"), default=str)
+    else:
+        canonical = _normalize_text(content)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _flatten(value, path, out):
+    if isinstance(value, dict) and value:
+        for key, child in value.items():
+            _flatten(child, f"{path}.{key}" if path else str(key), out)
+    elif isinstance(value, list) and value:
+        for i, child in enumerate(value):
+            _flatten(child, f"{path}[{i}]", out)
+    else:
+        out[path] = value
+    return out
+
+
+def diff_stack_files(current, submitted):
+    """Structural diff (changed/added/removed paths) when both files parse, else a unified text diff."""
+    current_docs, submitted_docs = _parse(current), _parse(submitted)
+    if current_docs is not None and submitted_docs is not None:
+        # Multi-document manifests (Kubernetes) are addressed as [n].path
+        if len(current_docs) == 1 and len(submitted_docs) == 1:
+            before, after = _flatten(current_docs[0], "", {}), _flatten(submitted_docs[0], "", {})
+        else:
+            before, after = _flatten(current_docs, "", {}), _flatten(submitted_docs, "", {})
+        return {
+            "format": "structural",
+            "added": {path: after[path] for path in after if path not in before},
+            "removed": {path: before[path] for path in before if path not in after},
+            "changed": {
+                path: {"from": before[path], "to": after[path]}
+                for path in before if path in after and before[path] != after[path]
+            },
+        }
+    lines = difflib.unified_diff(
+        _normalize_text(current).splitlines(),
+        _normalize_text(submitted).splitlines(),
+        "deployed", "submitted", lineterm="",
+    )
+    return {"format": "unified", "diff": "\n".join(lines)}
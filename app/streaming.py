@@ -0,0 +1,13 @@
+import json
+
+
+async def encode_ndjson(events):
+    async for event in events:
+        yield json.dumps(event) + "\n"
+
+
+async def encode_sse(events):
+    async for event in events:
+        # Sequenced events get an id so EventSource can resume with Last-Event-ID
+        event_id = f"id: {event['seq']}\n" if "seq" in event else ""
+        yield f"{event_id}event: {event['event']}\ndata: {json.dumps(event)}\n\n"
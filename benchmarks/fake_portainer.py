@@ -0,0 +1,190 @@
+"""In-process stand-in for the Portainer API, for benchmarks.
+
+Serves synthetic but realistically shaped payloads at the paths
+``PortainerService`` calls, with configurable sizes, injected latency and
+injected upstream errors (``502``). Every environment serves both the Docker
+and the Kubernetes proxies.
+"""
+import asyncio
+import json
+import random
+
+from fastapi import FastAPI, Request, Response
+
+
+def container(endpoint_id, i):
+    state = "running" if i % 5 else "exited"
+    return {
+        "Id": f"{endpoint_id:04x}{i:060x}",
+        "Names": [f"/app-{i}"],
+        "Image": f"registry.example.com/team/app-{i % 100}:1.{i % 50}.0",
+        "ImageID": f"sha256:{i % 100:064x}",
+        "Command": "/entrypoint.sh serve",
+        "Created": 1700000000 + i,
+        "Ports": [{"IP": "0.0.0.0", "PrivatePort": 8080, "PublicPort": 20000 + i % 10000, "Type": "tcp"}],
+        "Labels": {
+            "com.docker.compose.project": f"stack-{i % 20}",
+            "com.docker.compose.service": f"app-{i}",
+            "app": f"app-{i % 100}",
+        },
+        "State": state,
+        "Status": "Up 3 hours" if state == "running" else "Exited (0) 2 hours ago",
+        "HostConfig": {"NetworkMode": "bridge"},
+        "NetworkSettings": {"Networks": {"bridge": {"IPAddress": f"172.17.{i % 250}.{i % 200}"}}},
+        "Mounts": [],
+    }
+
+
+def image(i):
+    return {
+        "Id": f"sha256:{i:064x}",
+        "ParentId": "",
+        "RepoTags": [f"registry.example.com/team/app-{i}:1.{i % 50}.0"],
+        "RepoDigests": [f"registry.example.com/team/app-{i}@sha256:{i * 7:064x}"],
+        "Created": 1700000000 + i,
+        "Size": 100_000_000 + i,
+        "SharedSize": -1,
+        "VirtualSize": 100_000_000 + i,
+        "Labels": {f"org.opencontainers.image.label{j}": f"value-{i}-{j}" for j in range(8)},
+        "Containers": -1,
+    }
+
+
+def pod(i):
+    return {
+        "metadata": {
+            "name": f"app-{i}-7d9f8b6c5d-abcde",
+            "namespace": f"team-{i % 20}",
+            "uid": f"{i:032x}",
+            "resourceVersion": str(100000 + i),
+            "labels": {"app": f"app-{i % 100}", "pod-template-hash": "7d9f8b6c5d", "tier": "backend"},
+            "ownerReferences": [{"apiVersion": "apps/v1", "kind": "ReplicaSet", "name": f"app-{i}-7d9f8b6c5d", "uid": f"{i:031x}f"}],
+        },
+        "spec": {
+            "containers": [{
+                "name": "app",
+                "image": f"registry.example.com/team/app-{i % 100}:1.0.0",
+                "ports": [{"containerPort": 8080, "protocol": "TCP"}],
+                "resources": {"limits": {"cpu": "500m", "memory": "512Mi"}, "requests": {"cpu": "100m", "memory": "128Mi"}},
+            }],
+            "nodeName": f"node-{i % 30}",
+        },
+        "status": {"phase": "Running", "podIP": f"10.0.{i % 250}.{i % 200}", "startTime": "2024-01-01T00:00:00Z"},
+    }
+
+
+def kubernetes_list(kind, items, limit=None, continue_token=None):
+    start = int(continue_token or 0)
+    end = start + limit if limit else len(items)
+    metadata = {"resourceVersion": "100000"}
+    if end < len(items):
+        metadata["continue"] = str(end)
+    return {"kind": kind, "apiVersion": "v1", "metadata": metadata, "items": items[start:end]}
+
+
+def create_fake_portainer(endpoints=3, containers=200, images=100, pods=500, volumes=50, networks=20, stacks=20,
+                          latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+    """Build the fake Portainer ASGI app. Latency and errors apply to every request."""
+    rng = random.Random(seed)
+    app = FastAPI()
+
+    # Bodies are rendered once; the fake should cost as little CPU as possible
+    def body(value):
+        return json.dumps(value).encode()
+
+    endpoint_list = body([{"Id": i, "Name": f"env-{i}", "Type": 1, "Status": 1, "URL": f"tcp://10.0.0.{i}:9001"} for i in range(1, endpoints + 1)])
+    container_lists = {i: [container(i, n) for n in range(containers)] for i in range(1, endpoints + 1)}
+    container_bodies = {i: body(items) for i, items in container_lists.items()}
+    image_body = body([image(n) for n in range(images)])
+    volume_body = body({"Volumes": [{"Name": f"vol-{n}", "Driver": "local", "Mountpoint": f"/var/lib/docker/volumes/vol-{n}/_data", "Labels": {}} for n in range(volumes)], "Warnings": []})
+    network_body = body([{"Id": f"{n:064x}", "Name": f"net-{n}", "Driver": "bridge", "Scope": "local", "Labels": {}} for n in range(networks)])
+    stack_list = [{"Id": n, "Name": f"stack-{n}", "Type": 2 if n % 4 == 0 else 1, "EndpointId": 1 + n % endpoints, "Status": 1} for n in range(1, stacks + 1)]
+    pod_items = [pod(n) for n in range(pods)]
+    node_items = [{"metadata": {"name": f"node-{n}", "labels": {"kubernetes.io/os": "linux"}}, "status": {"conditions": [{"type": "Ready", "status": "True"}]}} for n in range(30)]
+    namespace_items = [{"metadata": {"name": f"team-{n}"}, "status": {"phase": "Active"}} for n in range(20)]
+
+    def json_response(content, status_code=200):
+        return Response(content, status_code=status_code, media_type="application/json")
+
+    @app.get("/api/endpoints")
+    async def get_endpoints():
+        return json_response(endpoint_list)
+
+    @app.get("/api/stacks")
+    async def get_stacks(endpointId: int = None):
+        return json_response(body([s for s in stack_list if endpointId is None or s["EndpointId"] == endpointId]))
+
+    @app.get("/api/stacks/{stack_id}")
+    async def get_stack(stack_id: int):
+        return json_response(body(stack_list[(stack_id - 1) % len(stack_list)]))
+
+    @app.get("/api/stacks/{stack_id}/file")
+    async def get_stack_file(stack_id: int):
+        return json_response(body({"StackFileContent": f"services:\n  app:\n    image: nginx:1.{stack_id}\n"}))
+
+    @app.put("/api/stacks/{stack_id}")
+    async def update_stack(stack_id: int):
+        return json_response(body(stack_list[(stack_id - 1) % len(stack_list)]))
+
+    @app.get("/api/endpoints/{endpoint_id}/docker/containers/json")
+    async def get_containers(endpoint_id: int, all: int = 0, filters: str = None):
+        if not all and not filters:
+            return json_response(body([c for c in container_lists.get(endpoint_id, []) if c["State"] == "running"]))
+        return json_response(container_bodies.get(endpoint_id, b"[]"))
+
+    @app.post("/api/endpoints/{endpoint_id}/docker/containers/{container_id}/{action}")
+    async def container_action(endpoint_id: int, container_id: str, action: str):
+        # Actions change the container's state, so reads after a write can be checked
+        for c in container_lists.get(endpoint_id, []):
+            if c["Id"] == container_id:
+                c["State"] = "exited" if action == "stop" else "running"
+                c["Status"] = "Exited (0) 1 second ago" if action == "stop" else "Up 1 second"
+                container_bodies[endpoint_id] = body(container_lists[endpoint_id])
+                return Response(status_code=204)
+        return json_response(b'{"message":"No such container"}', 404)
+
+    @app.get("/api/endpoints/{endpoint_id}/docker/images/json")
+    async def get_images(endpoint_id: int):
+        return json_response(image_body)
+
+    @app.get("/api/endpoints/{endpoint_id}/docker/volumes")
+    async def get_volumes(endpoint_id: int):
+        return json_response(volume_body)
+
+    @app.get("/api/endpoints/{endpoint_id}/docker/networks")
+    async def get_networks(endpoint_id: int):
+        return json_response(network_body)
+
+    @app.get("/api/endpoints/{endpoint_id}/kubernetes/api/v1/pods")
+    @app.get("/api/endpoints/{endpoint_id}/kubernetes/api/v1/namespaces/{namespace}/pods")
+    async def get_pods(request: Request, endpoint_id: int, namespace: str = None, limit: int = None):
+        items = pod_items if namespace is None else [p for p in pod_items if p["metadata"]["namespace"] == namespace]
+        return json_response(body(kubernetes_list("PodList", items, limit, request.query_params.get("continue"))))
+
+    @app.get("/api/endpoints/{endpoint_id}/kubernetes/api/v1/nodes")
+    async def get_nodes(request: Request, endpoint_id: int, limit: int = None):
+        return json_response(body(kubernetes_list("NodeList", node_items, limit, request.query_params.get("continue"))))
+
+    @app.get("/api/endpoints/{endpoint_id}/kubernetes/api/v1/namespaces")
+    async def get_namespaces(request: Request, endpoint_id: int, limit: int = None):
+        return json_response(body(kubernetes_list("NamespaceList", namespace_items, limit, request.query_params.get("continue"))))
+
+    @app.get("/api/users")
+    async def get_users():
+        return json_response(body([{"Id": n, "Username": f"user-{n}", "Role": 2} for n in range(1, 51)]))
+
+    @app.get("/api/teams")
+    async def get_teams():
+        return json_response(body([{"Id": n, "Name": f"team-{n}"} for n in range(1, 11)]))
+
+    async def with_faults(scope, receive, send):
+        if scope["type"] == "http":
+            delay = latency_ms + (rng.uniform(0, jitter_ms) if jitter_ms else 0.0)
+            if delay:
+                await asyncio.sleep(delay / 1000)
+            if error_rate and rng.random() < error_rate:
+                await json_response(b'{"message":"injected upstream error"}', 502)(scope, receive, send)
+                return
+        await app(scope, receive, send)
+
+    return with_faults
@@ -0,0 +1,201 @@
+"""Load benchmark: drive ``app.main:app`` against an in-process fake Portainer.
+
+Both the API and the fake Portainer (``benchmarks/fake_portainer.py``) run in
+this process over ASGI transports, so results measure the API's own CPU and
+scheduling cost plus the injected upstream latency, without network noise.
+For every route and concurrency level it reports requests/sec, p50/p95/p99
+latency, errors and RSS, and writes everything as JSON for comparing commits.
+
+Usage:
+    python benchmarks/load_bench.py --concurrency 1,16,64 --requests 2000 \\
+        --containers 500 --latency-ms 5 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_ROUTES = [
+    "/api/v1/endpoints",
+    "/api/v1/stacks?endpoint_id=1",
+    "/api/v1/containers?endpoint_id=1",
+    "/api/v1/images?endpoint_id=1",
+    "/api/v1/kubernetes/1/pods",
+    "/api/v1/fleet/containers",
+]
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_mb():
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_level(client, route, concurrency, requests):
+    latencies = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(route)
+                await response.aread()
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "route": route,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "rss_mb": rss_mb(),
+    }
+
+
+async def run(args):
+    import httpx
+
+    from app.main import app
+    from app.portainer_service import portainer_service
+    from benchmarks.fake_portainer import create_fake_portainer
+
+    fake = create_fake_portainer(
+        endpoints=args.endpoints,
+        containers=args.containers,
+        images=args.images,
+        pods=args.pods,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    portainer_service._client = httpx.AsyncClient(
+        base_url=portainer_service.portainer_url,
+        headers=portainer_service.headers,
+        transport=httpx.ASGITransport(app=fake),
+    )
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for route in args.routes:
+            await run_level(client, route, 1, args.warmup)
+            for concurrency in args.concurrency:
+                result = await run_level(client, route, concurrency, args.requests)
+                results.append(result)
+                if not args.quiet:
+                    latency = result["latency_ms"]
+                    print(
+                        f"{route:<40} c={concurrency:<4} {result['rps']:>9.1f} req/s  "
+                        f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  p99 {latency['p99']:>8.2f} ms  "
+                        f"errors {result['errors']:<5} rss {result['rss_mb']} MB",
+                        file=sys.stderr,
+                    )
+    await portainer_service.aclose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--routes", default=",".join(DEFAULT_ROUTES), help="comma-separated API paths to GET")
+    parser.add_argument("--concurrency", default="1,16,64", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per route and concurrency level")
+    parser.add_argument("--warmup", type=int, default=50, help="sequential requests per route before measuring")
+    parser.add_argument("--endpoints", type=int, default=3)
+    parser.add_argument("--containers", type=int, default=200, help="containers per environment")
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--pods", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="injected upstream latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream requests answered with 502")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-cache", action="store_true", help="disable the read-through cache and coalescing")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--quiet", action="store_true", help="do not print progress to stderr")
+    args = parser.parse_args()
+    args.routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",")]
+
+    # Settings are read at import time, so configure the app before importing it
+    os.environ.setdefault("PORTAINER_URL", "http://fake-portainer")
+    os.environ.setdefault("PORTAINER_API_KEY", "benchmark")
+    # One benchmark client drives all the load; measure throughput, not the per-client rate limit
+    os.environ.setdefault("CLIENT_RATE_LIMIT", "0")
+    if args.no_cache:
+        os.environ["CACHE_ENABLED"] = "false"
+        os.environ["COALESCE_REQUESTS"] = "false"
+
+    results = asyncio.run(run(args))
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("requests", "warmup", "endpoints", "containers", "images", "pods",
+                        "latency_ms", "jitter_ms", "error_rate", "seed", "no_cache")
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Micro-benchmark: CPU cost per MB of serving Portainer list bodies.
+
+Compares, for a synthetic /api/v1/images and /api/v1/kubernetes/{id}/pods
+payload:
+
+* ``decode+jsonable_encoder+json``: the previous path (``response.json()``,
+  then FastAPI's ``jsonable_encoder`` and ``JSONResponse``);
+* ``decode+orjson``: a transformed payload rendered by ``FastJSONResponse``;
+* ``passthrough``: upstream bytes sent as-is.
+
+Usage: python benchmarks/passthrough_bench.py [--mb 4] [--repeat 5] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, Response  # noqa: E402
+
+from app.responses import FastJSONResponse  # noqa: E402
+
+
+def image(i):
+    return {
+        "Id": f"sha256:{i:064x}",
+        "ParentId": "",
+        "RepoTags": [f"registry.example.com/team/app-{i}:1.{i % 50}.0"],
+        "RepoDigests": [f"registry.example.com/team/app-{i}@sha256:{i * 7:064x}"],
+        "Created": 1700000000 + i,
+        "Size": 100_000_000 + i,
+        "SharedSize": -1,
+        "VirtualSize": 100_000_000 + i,
+        "Labels": {f"org.opencontainers.image.label{j}": f"value-{i}-{j}" for j in range(8)},
+        "Containers": -1,
+    }
+
+
+def pod(i):
+    return {
+        "metadata": {
+            "name": f"app-{i}-7d9f8b6c5d-abcde",
+            "namespace": f"team-{i % 20}",
+            "uid": f"{i:032x}",
+            "resourceVersion": str(100000 + i),
+            "labels": {"app": f"app-{i % 100}", "pod-template-hash": "7d9f8b6c5d", "tier": "backend"},
+            "ownerReferences": [{"apiVersion": "apps/v1", "kind": "ReplicaSet", "name": f"app-{i}-7d9f8b6c5d", "uid": f"{i:031x}f"}],
+        },
+        "spec": {
+            "containers": [{
+                "name": "app",
+                "image": f"registry.example.com/team/app-{i % 100}:1.0.0",
+                "ports": [{"containerPort": 8080, "protocol": "TCP"}],
+                "env": [{"name": f"VAR_{j}", "value": f"value-{j}"} for j in range(6)],
+                "resources": {"limits": {"cpu": "500m", "memory": "512Mi"}, "requests": {"cpu": "100m", "memory": "128Mi"}},
+            }],
+            "nodeName": f"node-{i % 30}",
+        },
+        "status": {"phase": "Running", "podIP": f"10.0.{i % 250}.{i % 200}", "startTime": "2024-01-01T00:00:00Z"},
+    }
+
+
+def build_payload(factory, target_mb, wrap=None):
+    items, size, i = [], 0, 0
+    while size < target_mb * 1024 * 1024:
+        item = factory(i)
+        items.append(item)
+        size += len(json.dumps(item))
+        i += 1
+    body = wrap(items) if wrap else items
+    return json.dumps(body).encode()
+
+
+def cpu_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        best = min(best, time.process_time() - started)
+    return best * 1000
+
+
+def run(raw, repeat):
+    mb = len(raw) / (1024 * 1024)
+    paths = {
+        "decode+jsonable_encoder+json": lambda: JSONResponse(jsonable_encoder(json.loads(raw))),
+        "decode+orjson": lambda: FastJSONResponse(json.loads(raw)),
+        "passthrough": lambda: Response(raw, media_type="application/json"),
+    }
+    return {
+        "mb": round(mb, 2),
+        "cpu_ms_per_mb": {name: round(cpu_ms(fn, repeat) / mb, 3) for name, fn in paths.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=float, default=4.0, help="approximate payload size per route")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    payloads = {
+        "/api/v1/images": build_payload(image, args.mb),
+        "/api/v1/kubernetes/{id}/pods": build_payload(
+            pod, args.mb, wrap=lambda items: {"kind": "PodList", "apiVersion": "v1", "metadata": {"resourceVersion": "1"}, "items": items}
+        ),
+    }
+    results = {route: run(raw, args.repeat) for route, raw in payloads.items()}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for route, result in results.items():
+        print(f"{route} ({result['mb']} MB)")
+        baseline = result["cpu_ms_per_mb"]["decode+jsonable_encoder+json"]
+        for name, value in result["cpu_ms_per_mb"].items():
+            saved = baseline - value
+            print(f"  {name:<30} {value:>9.3f} ms CPU/MB   saved {saved:>9.3f} ms/MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+
+# Settings are read when app.config is imported; the tests never reach a real Portainer
+os.environ.setdefault("PORTAINER_URL", "http://fake-portainer")
+os.environ.setdefault("PORTAINER_API_KEY", "test")
+os.environ.setdefault("CLIENT_RATE_LIMIT", "0")
+
+import httpx
+import pytest
+
+from benchmarks.fake_portainer import create_fake_portainer
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def connect(service, fake):
+    """Point ``service`` at an in-process fake Portainer (any ASGI app)."""
+    service._client = httpx.AsyncClient(
+        base_url=service.portainer_url,
+        headers=service.headers,
+        transport=httpx.ASGITransport(app=fake),
+    )
+    return service
+
+
+@pytest.fixture
+async def service():
+    from app.portainer_service import PortainerService
+
+    service = connect(PortainerService(), create_fake_portainer(endpoints=2, containers=10))
+    yield service
+    await service.aclose()
+
+
+@pytest.fixture
+async def api():
+    """Client for the REST app, with its default Portainer instance pointed at a fake Portainer."""
+    from app.main import app, portainer_service
+
+    connect(portainer_service, create_fake_portainer(endpoints=2, containers=10, pods=120))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await portainer_service.aclose()
+    if portainer_service.cache is not None:
+        portainer_service.cache.clear()
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionRejected, PriorityLimiter, TokenBucket, UpstreamLimiter, classify
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_waiters_are_served_by_priority_then_arrival():
+    limiter = PriorityLimiter("test", limit=1, max_waiting=10, timeout=5)
+    await limiter.acquire("interactive")
+    order = []
+
+    async def wait(name, label):
+        await limiter.acquire(name)
+        order.append(label)
+        limiter.release()
+
+    tasks = [
+        asyncio.create_task(wait("bulk", "bulk-1")),
+        asyncio.create_task(wait("interactive", "interactive-1")),
+        asyncio.create_task(wait("bulk", "bulk-2")),
+        asyncio.create_task(wait("critical", "critical")),
+    ]
+    await asyncio.sleep(0)
+    limiter.release()
+    await asyncio.gather(*tasks)
+    assert order == ["critical", "interactive-1", "bulk-1", "bulk-2"]
+    assert limiter.active == 0
+
+
+async def test_bulk_work_leaves_headroom_for_interactive_calls():
+    limiter = PriorityLimiter("test", limit=2, bulk_limit=1, timeout=0.05)
+    await limiter.acquire("bulk")
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire("bulk")
+    await limiter.acquire("interactive")
+    assert limiter.active == 2
+
+
+async def test_full_queue_and_timeout_shed_load():
+    limiter = PriorityLimiter("test", limit=1, max_waiting=1, timeout=0.05)
+    await limiter.acquire("interactive")
+    waiter = asyncio.create_task(limiter.acquire("interactive"))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected, match="queue full"):
+        await limiter.acquire("interactive")
+    with pytest.raises(AdmissionRejected, match="saturated"):
+        await waiter
+    assert limiter.rejected == 2
+    assert limiter.stats()["waiting"] == 0
+
+
+async def test_cancelled_waiter_gives_its_slot_back():
+    limiter = PriorityLimiter("test", limit=1, timeout=5)
+    await limiter.acquire("interactive")
+    waiter = asyncio.create_task(limiter.acquire("interactive"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert limiter.stats()["waiting"] == 0
+    limiter.release()
+    assert limiter.active == 0
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert 0 < bucket.take() <= 0.1
+
+
+def test_classify():
+    assert classify("GET", "/api/v1/health", {}) == "critical"
+    assert classify("GET", "/api/v1/jobs/abc", {}) == "critical"
+    assert classify("GET", "/api/v1/fleet/containers", {}) == "bulk"
+    assert classify("GET", "/api/v1/containers", {}) == "interactive"
+    assert classify("PUT", "/api/v1/teams/3/members", {}) == "bulk"
+    assert classify("POST", "/api/v1/teams/3/members", {}) == "interactive"
+    assert classify("GET", "/api/v1/containers", {"x-priority": "bulk"}) == "bulk"
+    # Callers may lower their class but never raise it
+    assert classify("GET", "/api/v1/fleet/containers", {"x-priority": "critical"}) == "bulk"
+
+
+def test_upstream_limiter_keys_stack_calls_by_endpoint_id():
+    limiter = UpstreamLimiter(endpoint_max_concurrency=2)
+    per_endpoint = limiter.for_path("/api/endpoints/4/docker/containers/json")
+    assert limiter.for_path("/api/stacks?endpointId=4") is per_endpoint
+    assert limiter.for_path("/api/stacks/9", {"endpointId": 4}) is per_endpoint
+    assert limiter.for_path("/api/stacks/9") is None
@@ -0,0 +1,66 @@
+import pytest
+
+from app.batch import InvalidBatch, UnresolvedReference, allowed_path, plan_batch, resolve
+
+
+def op(path, **extra):
+    return {"method": "GET", "path": path, **extra}
+
+
+def test_plan_assigns_ids_and_dependencies():
+    planned = plan_batch([
+        op("/api/v1/endpoints", id="envs"),
+        op("/api/v1/containers?endpoint_id=${envs[0].Id}"),
+        op("/api/v1/users", depends_on=["envs"]),
+    ], 10)
+    assert [p["id"] for p in planned] == ["envs", "1", "2"]
+    assert [p["depends_on"] for p in planned] == [set(), {"envs"}, {"envs"}]
+
+
+@pytest.mark.parametrize("operations, message", [
+    ([op("/api/v1/users", id="a"), op("/api/v1/teams", id="a")], "Duplicate"),
+    ([op("/api/v1/containers?endpoint_id=${later.Id}"), op("/api/v1/endpoints", id="later")], "not earlier"),
+    ([op("/api/v1/batch")], "batch endpoint"),
+    ([op("/api/v2/other")], "batch endpoint"),
+    ([op("/api/v1/users")] * 3, "At most 2"),
+])
+def test_plan_rejects_malformed_batches(operations, message):
+    with pytest.raises(InvalidBatch, match=message):
+        plan_batch(operations, 2)
+
+
+def test_resolve_keeps_types_for_whole_references_and_interpolates_the_rest():
+    bodies = {"envs": [{"Id": 7, "Name": "prod"}], "stack": {"Id": 3}}
+    assert resolve("${envs[0].Id}", bodies) == 7
+    assert resolve("/api/v1/stacks/${stack.Id}/file?name=${envs[0].Name}", bodies) == "/api/v1/stacks/3/file?name=prod"
+    assert resolve({"ids": ["${stack.Id}", 1]}, bodies) == {"ids": [3, 1]}
+    assert resolve("${envs.0.Id}", bodies) == 7
+
+
+def test_resolve_reports_missing_values():
+    with pytest.raises(UnresolvedReference):
+        resolve("${envs[3].Id}", {"envs": []})
+
+
+def test_allowed_path():
+    assert allowed_path("/api/v1/containers?endpoint_id=1")
+    assert not allowed_path("/api/v1/batch/")
+    assert not allowed_path("/api/v1/%62atch")
+    assert not allowed_path("/api/v1/%62%61tch?x=1")
+    assert not allowed_path("/api/v1/users/../batch")
+    assert not allowed_path("/api/v1/../../metrics")
+    assert not allowed_path("/metrics")
+
+
+@pytest.mark.anyio
+async def test_batch_route_refuses_operations_sent_from_a_batch():
+    import httpx
+
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/api/v1/batch", json={"operations": [{"path": "/api/v1/%62atch"}]})
+        assert response.status_code == 400
+        response = await client.post("/api/v1/batch", json={"operations": []}, headers={"X-Batch-Operation": "1"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Batches cannot be nested"
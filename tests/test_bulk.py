@@ -0,0 +1,28 @@
+import pytest
+
+from app.bulk import run_container_action
+
+pytestmark = pytest.mark.anyio
+
+
+def container_id(endpoint_id, i):
+    return f"{endpoint_id:04x}{i:060x}"
+
+
+async def test_bulk_action_reports_each_target_and_survives_failures(service):
+    targets = [
+        (1, container_id(1, 1), "app-1"),
+        (2, container_id(2, 2), "app-2"),
+        (2, "missing", None),
+    ]
+    result = await run_container_action(service, "stop", targets, parallelism=4, batch_size=2)
+
+    assert (result["total"], result["succeeded"], result["failed"]) == (3, 2, 1)
+    by_id = {r["container_id"]: r for r in result["results"]}
+    assert by_id[container_id(1, 1)]["status"] == "ok"
+    assert by_id[container_id(1, 1)]["wave"] == 1
+    assert by_id["missing"]["status"] == "error"
+    assert by_id["missing"]["wave"] == 2
+    assert "404" in by_id["missing"]["error"]
+    stopped = {c["Id"] for c in await service.find_containers(2) if c["State"] == "exited"}
+    assert container_id(2, 2) in stopped
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from app.cache import TTLCache
+
+pytestmark = pytest.mark.anyio
+
+
+def loader(value, calls):
+    async def load():
+        calls.append(value)
+        return value
+    return load
+
+
+async def test_hit_until_ttl_expires():
+    cache = TTLCache(stale_ttl=0)
+    calls = []
+    assert await cache.get_or_load(("containers", 1), 60, loader("a", calls)) == "a"
+    assert await cache.get_or_load(("containers", 1), 60, loader("b", calls)) == "a"
+    assert calls == ["a"]
+    assert cache.stats()["hits"] == 1
+
+
+async def test_invalidate_drops_only_the_resource_and_endpoint():
+    cache = TTLCache()
+    await cache.get_or_load(("containers", 1), 60, loader("c1", []))
+    await cache.get_or_load(("containers", 2), 60, loader("c2", []))
+    await cache.get_or_load(("images", 1), 60, loader("i1", []))
+    cache.invalidate("containers", 1)
+    assert await cache.get_or_load(("containers", 1), 60, loader("new", [])) == "new"
+    assert await cache.get_or_load(("containers", 2), 60, loader("new", [])) == "c2"
+    assert await cache.get_or_load(("images", 1), 60, loader("new", [])) == "i1"
+
+
+async def test_load_racing_an_invalidation_is_not_stored():
+    cache = TTLCache()
+    release = asyncio.Event()
+
+    async def slow():
+        await release.wait()
+        return "before write"
+
+    load = asyncio.create_task(cache.get_or_load(("containers", 1), 60, slow))
+    await asyncio.sleep(0)
+    cache.invalidate("containers", 1)
+    release.set()
+    assert await load == "before write"
+    # The generation guard kept the pre-write value out of the cache
+    assert await cache.get_or_load(("containers", 1), 60, loader("after write", [])) == "after write"
+
+
+async def test_stale_entry_is_served_while_one_refresh_runs():
+    cache = TTLCache(stale_ttl=60)
+    calls = []
+    await cache.get_or_load(("stacks", 1), 0.01, loader("old", calls))
+    await asyncio.sleep(0.02)
+    assert await cache.get_or_load(("stacks", 1), 0.01, loader("new", calls)) == "old"
+    assert await cache.get_or_load(("stacks", 1), 0.01, loader("newer", calls)) == "old"
+    await asyncio.sleep(0)
+    assert calls == ["old", "new"]
+    assert await cache.get_or_load(("stacks", 1), 60, loader("unused", calls)) == "new"
+
+
+async def test_lru_eviction_respects_entry_and_byte_budgets():
+    cache = TTLCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        await cache.get_or_load((key, None), 60, loader(key, []))
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+    cache = TTLCache(max_bytes=10)
+    await cache.get_or_load(("big", None), 60, loader("x" * 100, []))
+    assert cache.stats()["entries"] == 0
+
+
+async def test_service_reads_see_their_own_writes(service):
+    running = await service.get_containers(1)
+    target = running[0]["Id"]
+    assert await service.get_containers(1) is running  # served from the cache
+
+    await service.stop_container(target, 1)
+    assert target not in {c["Id"] for c in await service.get_containers(1)}
+    await service.start_container(target, 1)
+    assert target in {c["Id"] for c in await service.get_containers(1)}
+
+
+def hold_container_lists(fake, release):
+    """Let container list responses be computed at once but delivered only after ``release`` is set."""
+    async def app(scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/containers/json") and not release.is_set():
+            messages = []
+
+            async def buffer(message):
+                messages.append(message)
+
+            await fake(scope, receive, buffer)
+            await release.wait()
+            for message in messages:
+                await send(message)
+            return
+        await fake(scope, receive, send)
+    return app
+
+
+async def test_read_after_write_does_not_join_a_get_started_before_it():
+    from app.portainer_service import PortainerService
+    from benchmarks.fake_portainer import create_fake_portainer
+    from tests.conftest import connect
+
+    release = asyncio.Event()
+    service = connect(PortainerService(), hold_container_lists(create_fake_portainer(endpoints=1, containers=10), release))
+    target = "0001" + f"{1:060x}"
+    try:
+        before_write = asyncio.create_task(service.get_containers(1))
+        await asyncio.sleep(0.05)
+        await service.stop_container(target, 1)
+        after_write = asyncio.create_task(service.get_containers(1))
+        await asyncio.sleep(0.05)
+        release.set()
+        assert target in {c["Id"] for c in await before_write}
+        assert target not in {c["Id"] for c in await after_write}
+    finally:
+        await service.aclose()
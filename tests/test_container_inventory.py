@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from app.container_inventory import ContainerInventory
+
+
+def container(container_id, state="running"):
+    return {"Id": container_id, "State": state}
+
+
+def inventory(changelog_size=10000):
+    return ContainerInventory(service=None, endpoint_id=1, changelog_size=changelog_size)
+
+
+def test_delta_returns_changes_and_removals_after_a_revision():
+    inv = inventory()
+    inv._put(container("a"))
+    inv._put(container("b"))
+    since = inv.revision
+    inv._put(container("a", "exited"))
+    inv._put(container("b"))  # unchanged, no new revision
+    inv._remove("b")
+    delta = inv.delta(since)
+    assert delta == {"revision": since + 2, "full": False, "containers": [container("a", "exited")], "removed": ["b"]}
+    assert inv.delta(inv.revision)["containers"] == []
+
+
+def test_delta_falls_back_to_a_full_snapshot():
+    inv = inventory(changelog_size=2)
+    for name in "abcd":
+        inv._put(container(name))
+    for name in "abc":
+        inv._remove(name)
+    # Removals before the retained log cannot be reported as a delta
+    assert inv.delta(1)["full"] is True
+    assert inv.delta(inv.revision + 5)["full"] is True
+    assert inv.delta(inv.revision - 1) == {"revision": inv.revision, "full": False, "containers": [], "removed": ["c"]}
+
+
+def test_list_hides_stopped_containers_by_default():
+    inv = inventory()
+    inv._put(container("a"))
+    inv._put(container("b", "exited"))
+    inv._put(container("c", "paused"))
+    inv._put(container("d", "restarting"))
+    inv._put(container("e", "created"))
+    assert [c["Id"] for c in inv.list()] == ["a", "c", "d"]
+    assert [c["Id"] for c in inv.list(all=True)] == ["a", "b", "c", "d", "e"]
+
+
+@pytest.mark.anyio
+async def test_since_cannot_be_combined_with_filters():
+    import httpx
+
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/v1/containers", params={"since": 3, "status": "exited"})
+        assert response.status_code == 400
+
+
+class SlowListService:
+    """Full lists see the containers of the moment they are requested but answer only on ``release``."""
+
+    def __init__(self, containers):
+        self.live = {c["Id"]: c for c in containers}
+        self.release = asyncio.Event()
+
+    async def find_containers(self, endpoint_id, filters=None, all=True):
+        if filters is None:
+            containers = list(self.live.values())
+            await self.release.wait()
+            return containers
+        return [c for cid, c in self.live.items() if cid in filters["id"]]
+
+
+@pytest.mark.anyio
+async def test_reconcile_does_not_undo_changes_refreshed_while_its_list_was_in_flight():
+    service = SlowListService([container("a"), container("b")])
+    inv = ContainerInventory(service, endpoint_id=1, batch_delay=0)
+    inv._put(container("a"))
+    inv._put(container("b"))
+    reconcile = asyncio.create_task(inv.reconcile())
+    refresh = asyncio.create_task(inv._refresh_dirty())
+    await asyncio.sleep(0)  # the reconcile's list is now a snapshot of a and b
+
+    service.live["c"] = container("c")
+    inv._handle({"Action": "create", "Actor": {"ID": "c"}})
+    del service.live["a"]
+    inv._handle({"Action": "destroy", "Actor": {"ID": "a"}})
+    service.live["b"] = container("b", "exited")
+    inv._handle({"Action": "die", "Actor": {"ID": "b"}})
+    while "c" not in inv.containers or inv.containers["b"]["State"] != "exited":
+        await asyncio.sleep(0.001)
+
+    service.release.set()
+    await reconcile
+    refresh.cancel()
+    await asyncio.gather(refresh, return_exceptions=True)
+    assert inv.containers == {"b": container("b", "exited"), "c": container("c")}
@@ -0,0 +1,49 @@
+import pytest
+from starlette.responses import JSONResponse
+
+from app.fleet import federated_query
+from app.portainer_service import PortainerService
+from benchmarks.fake_portainer import create_fake_portainer
+from tests.conftest import connect
+
+pytestmark = pytest.mark.anyio
+
+
+async def unreachable(scope, receive, send):
+    await JSONResponse({"message": "down"}, status_code=500)(scope, receive, send)
+
+
+@pytest.fixture
+async def services():
+    services = {
+        "eu": connect(PortainerService(name="eu"), create_fake_portainer(endpoints=2, containers=5)),
+        "us": connect(PortainerService(name="us"), create_fake_portainer(endpoints=3, containers=5)),
+        "ap": connect(PortainerService(name="ap"), unreachable),
+    }
+    yield services
+    for service in services.values():
+        await service.aclose()
+
+
+async def test_federated_query_tags_items_by_instance_and_isolates_failures(services):
+    result = await federated_query(services, "containers", concurrency=4, timeout=5)
+    assert {(s["instance"], s["count"]) for s in result["instances"]} == {("eu", 8), ("us", 12)}
+    assert [e["instance"] for e in result["errors"]] == ["ap"]
+    assert {(item["instance"], item["endpoint_id"]) for item in result["items"]} == {
+        ("eu", 1), ("eu", 2), ("us", 1), ("us", 2), ("us", 3),
+    }
+
+
+async def test_federated_endpoints(services):
+    result = await federated_query({"eu": services["eu"], "us": services["us"]}, "endpoints", concurrency=4, timeout=5)
+    assert sorted((item["instance"], item["Id"]) for item in result["items"]) == [
+        ("eu", 1), ("eu", 2), ("us", 1), ("us", 2), ("us", 3),
+    ]
+    assert services["eu"].client is not services["us"].client
+
+
+async def test_unknown_instance_is_a_404(api):
+    response = await api.get("/api/v1/containers", params={"instance": "nowhere"})
+    assert response.status_code == 404
+    response = await api.get("/api/v1/federation/containers", params={"instances": "nowhere"})
+    assert response.status_code == 404
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from starlette.responses import JSONResponse
+
+from app.fleet import fleet_query, gather_bounded
+from app.portainer_service import PortainerService
+from benchmarks.fake_portainer import create_fake_portainer
+from tests.conftest import connect
+
+pytestmark = pytest.mark.anyio
+
+
+def with_broken_endpoints(fake, failing=(), slow=()):
+    """Answer 500 for the ``failing`` environments and stall the ``slow`` ones."""
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            if any(scope["path"].startswith(f"/api/endpoints/{e}/") for e in failing):
+                await JSONResponse({"message": "boom"}, status_code=500)(scope, receive, send)
+                return
+            if any(scope["path"].startswith(f"/api/endpoints/{e}/") for e in slow):
+                await asyncio.sleep(5)
+        await fake(scope, receive, send)
+
+    return app
+
+
+async def test_gather_bounded_caps_concurrency_and_keeps_input_order():
+    active = peak = 0
+
+    async def work(n):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        if n == 3:
+            raise ValueError("three")
+        return n * 10
+
+    results = await gather_bounded(range(6), work, concurrency=2)
+    assert peak == 2
+    assert [(item, result, error) for item, result, error, _ in results] == [
+        (0, 0, None), (1, 10, None), (2, 20, None), (3, None, "three"), (4, 40, None), (5, 50, None),
+    ]
+
+
+async def test_fleet_query_merges_environments_and_reports_failures():
+    fake = with_broken_endpoints(create_fake_portainer(endpoints=4, containers=5), failing=[2], slow=[3])
+    service = connect(PortainerService(), fake)
+    try:
+        result = await fleet_query(service, "containers", concurrency=4, timeout=0.5)
+    finally:
+        await service.aclose()
+    assert [(e["endpoint_id"], e["count"]) for e in result["endpoints"]] == [(1, 4), (4, 4)]
+    errors = {e["endpoint_id"]: e["error"] for e in result["errors"]}
+    assert set(errors) == {2, 3}
+    assert errors[3] == "timed out after 0.5s"
+    assert {item["endpoint_id"] for item in result["items"]} == {1, 4}
+    assert all(item["endpoint_name"] == f"env-{item['endpoint_id']}" for item in result["items"])
@@ -0,0 +1,34 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.http_cache import ConditionalResponseMiddleware
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"items": [' + b",".join(b'{"id": %d}' % n for n in range(20000)) + b"]}"
+
+
+def client(offload_size):
+    app = Starlette(routes=[Route("/items", lambda request: Response(BODY, media_type="application/json"))])
+    app = ConditionalResponseMiddleware(app, offload_size=offload_size)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+@pytest.mark.parametrize("offload_size", [0, len(BODY) + 1])
+async def test_offloaded_and_inline_bodies_get_the_same_etag_and_encoding(offload_size):
+    async with client(offload_size) as http:
+        response = await http.get("/items", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == BODY
+        etag = response.headers["ETag"]
+        assert etag.endswith('-gzip"')
+
+        response = await http.get("/items", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+        assert response.status_code == 304
+
+    async with client(len(BODY) + 1 - offload_size) as http:
+        response = await http.get("/items", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["ETag"] == etag
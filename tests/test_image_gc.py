@@ -0,0 +1,39 @@
+from app.image_gc import classify_images
+
+
+def image(image_id, tags, created):
+    return {"Id": image_id, "RepoTags": tags, "Created": created}
+
+
+def test_classify_images():
+    images = [
+        image("sha256:dangling", ["<none>:<none>"], 1),
+        image("sha256:app1", ["app:1"], 1),
+        image("sha256:app2", ["app:2"], 2),
+        image("sha256:app3", ["app:3"], 3),
+        image("sha256:tool", ["tool:latest"], 1),
+        image("sha256:used", ["db:15"], 1),
+        image("sha256:used-by-tag", ["cache:7"], 1),
+    ]
+    containers = [{"ImageID": "sha256:used", "Image": "db:15"}, {"ImageID": "sha256:other", "Image": "cache:7"}]
+    assert classify_images(images, containers, keep_latest=1) == {
+        "sha256:dangling": "dangling",
+        "sha256:app1": "superseded",
+        "sha256:app2": "superseded",
+        "sha256:app3": "unreferenced",
+        "sha256:tool": "unreferenced",
+    }
+    assert classify_images(images, containers, keep_latest=2)["sha256:app2"] == "unreferenced"
+
+
+def test_image_in_use_by_a_newer_tag_is_never_a_candidate():
+    images = [image("sha256:old", ["app:1"], 1), image("sha256:new", ["app:2"], 2)]
+    assert classify_images(images, [{"ImageID": "sha256:old", "Image": "app:1"}]) == {"sha256:new": "unreferenced"}
+
+
+def test_multi_tagged_image_takes_one_keep_latest_slot():
+    images = [
+        image("sha256:app1", ["app:1.1"], 1),
+        image("sha256:app2", ["app:1.2", "app:latest"], 2),
+    ]
+    assert classify_images(images, [], keep_latest=2) == {"sha256:app1": "unreferenced", "sha256:app2": "unreferenced"}
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from app.image_pull import multiplex_pulls, pull_progress_events
+
+pytestmark = pytest.mark.anyio
+
+
+class EndlessPulls:
+    async def stream_pull_image(self, from_image, tag, endpoint_id):
+        n = 0
+        while True:
+            n += 1
+            yield {"id": f"layer{n}", "status": "Downloading", "progressDetail": {"current": 1, "total": 2}}
+            await asyncio.sleep(0)
+
+
+async def test_disconnected_client_does_not_leave_pumps_blocked_on_a_full_queue():
+    before = asyncio.all_tasks()
+    events = multiplex_pulls(EndlessPulls(), ["nginx", "redis", "alpine"], None, 1, interval=0, queue_size=1)
+    assert (await anext(events))["event"] == "progress"
+    await asyncio.sleep(0.01)  # let the pumps fill the queue
+    await events.aclose()
+
+    pumps = asyncio.all_tasks() - before - {asyncio.current_task()}
+    await asyncio.wait_for(asyncio.gather(*pumps, return_exceptions=True), 1)
+
+
+async def test_failed_pull_releases_the_upstream_stream_right_away():
+    closed = asyncio.Event()
+
+    class FailingPull:
+        async def stream_pull_image(self, from_image, tag, endpoint_id):
+            try:
+                yield {"error": "manifest unknown", "errorDetail": {"message": "manifest unknown"}}
+                yield {"status": "never read"}
+            finally:
+                closed.set()
+
+    events = [event async for event in pull_progress_events(FailingPull(), "nginx:nope", None, 1, interval=0)]
+    assert events == [{"event": "error", "image": "nginx:nope", "error": "manifest unknown"}]
+    assert closed.is_set()
@@ -0,0 +1,35 @@
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.indexes import COMPOSE_STACK, KUBERNETES_STACK, SWARM_STACK, StackIndex
+from tests.conftest import connect
+
+STACKS = [
+    {"Id": 1, "Name": "web", "Type": SWARM_STACK},
+    {"Id": 2, "Name": "db", "Type": COMPOSE_STACK},
+    {"Id": 3, "Name": "shop", "Type": KUBERNETES_STACK},
+    {"Id": 4, "Name": "cache", "Type": COMPOSE_STACK},
+]
+
+
+def test_stack_index_lookups():
+    index = StackIndex(STACKS)
+    assert [s["Id"] for s in index.of_type(COMPOSE_STACK)] == [2, 4]
+    assert [s["Id"] for s in index.of_type(KUBERNETES_STACK)] == [3]
+    assert index.of_type(99) == []
+    assert index.named("cache")["Id"] == 4
+    assert index.named("missing") is None
+
+
+@pytest.mark.anyio
+async def test_kubernetes_applications_are_the_kubernetes_stacks():
+    from app.portainer_service import PortainerService
+
+    fake = Starlette(routes=[Route("/api/stacks", lambda request: JSONResponse(STACKS))])
+    service = connect(PortainerService(), fake)
+    try:
+        assert [s["Name"] for s in await service.get_kubernetes_applications(1)] == ["shop"]
+    finally:
+        await service.aclose()
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.informer import KubernetesInformer
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeKubernetes:
+    """A pod list and a watch that replays ``watches`` in turn, then closes immediately with nothing."""
+
+    def __init__(self, pods, watches=()):
+        self.pods = pods
+        self.watches = list(watches)
+        self.watch_calls = 0
+
+    def kubernetes_list_path(self, resource, namespace=None):
+        return f"api/v1/{resource}"
+
+    async def _get_k8s_resource(self, endpoint_id, path, limit=None, continue_token=None, **options):
+        return {"metadata": {"resourceVersion": "10"}, "items": self.pods}
+
+    async def watch_k8s_resource(self, endpoint_id, path, resource_version, timeout_seconds=300):
+        self.watch_calls += 1
+        await asyncio.sleep(0)
+        for event in self.watches.pop(0) if self.watches else []:
+            yield event
+
+
+def pod(name, namespace="default", version="11", **labels):
+    return {"metadata": {"name": name, "namespace": namespace, "resourceVersion": version, "labels": labels}}
+
+
+async def test_watch_events_update_the_store_and_indexes():
+    service = FakeKubernetes([pod("a", app="web")], watches=[[
+        {"type": "ADDED", "object": pod("b", "shop", "12", app="web")},
+        {"type": "DELETED", "object": pod("a", version="13")},
+    ]])
+    informer = KubernetesInformer(service, 1, "pods")
+    informer.start()
+    try:
+        while informer.resource_version != "13":
+            await asyncio.sleep(0.001)
+    finally:
+        await informer.stop()
+    assert set(informer.objects) == {("shop", "b")}
+    assert informer.by_label[("app", "web")] == {("shop", "b")}
+
+
+async def test_watch_that_ends_without_events_is_retried_with_backoff():
+    service = FakeKubernetes([pod("a")])
+    informer = KubernetesInformer(service, 1, "pods")
+    informer.start()
+    await asyncio.sleep(0.2)
+    await informer.stop()
+    assert informer.synced
+    assert service.watch_calls <= 2
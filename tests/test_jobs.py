@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from app.jobs import IdempotencyConflict, JobQueue, JobQueueFull
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def queue():
+    queue = JobQueue(workers=1, max_queued=2)
+    yield queue
+    await queue.aclose()
+
+
+async def test_reused_idempotency_key_returns_the_original_job(queue):
+    runs = 0
+
+    async def deploy(job):
+        nonlocal runs
+        runs += 1
+        await job.publish("progress", step=1)
+        return {"stack": "web"}
+
+    job, created = queue.submit("stack_update", deploy, {"stack_id": 1}, idempotency_key="k1")
+    replay, replayed_created = queue.submit("stack_update", deploy, {"stack_id": 1}, idempotency_key="k1")
+    assert created and not replayed_created
+    assert replay is job
+    await job.wait(1)
+    assert (job.status, job.result, runs) == ("succeeded", {"stack": "web"}, 1)
+    assert queue.submit("stack_update", deploy, {"stack_id": 1}, idempotency_key="k1") == (job, False)
+    with pytest.raises(IdempotencyConflict):
+        queue.submit("stack_update", deploy, {"stack_id": 2}, idempotency_key="k1")
+
+
+async def test_follow_replays_events_and_reports_failures(queue):
+    async def broken(job):
+        await job.publish("progress", step=1)
+        raise RuntimeError("upstream said no")
+
+    job, _ = queue.submit("image_pull", broken)
+    events = [event async for event in job.follow()]
+    assert [event["event"] for event in events] == ["queued", "started", "progress", "failed"]
+    assert [event["seq"] for event in events] == [1, 2, 3, 4]
+    assert events[-1]["error"] == "upstream said no"
+    # Resuming after a sequence number only yields what came later
+    assert [event["event"] async for event in job.follow(after=3)] == ["failed"]
+
+
+async def test_full_queue_rejects_new_jobs(queue):
+    release = asyncio.Event()
+
+    async def blocked(job):
+        await release.wait()
+
+    queue.submit("a", blocked)
+    await asyncio.sleep(0)  # the only worker picks the first job up
+    queue.submit("b", blocked)
+    queue.submit("c", blocked)
+    with pytest.raises(JobQueueFull):
+        queue.submit("d", blocked)
+    release.set()
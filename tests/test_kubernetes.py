@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_pods_page_through_continue_tokens(api):
+    names, token, pages = [], None, 0
+    while True:
+        params = {"limit": 50, **({"continue": token} if token else {})}
+        page = (await api.get("/api/v1/kubernetes/1/pods", params=params)).json()
+        names += [pod["metadata"]["name"] for pod in page["items"]]
+        pages += 1
+        token = page["metadata"].get("continue")
+        if not token:
+            break
+    assert pages == 3
+    assert len(names) == len(set(names)) == 120
+
+
+async def test_streamed_pods_arrive_as_ndjson_across_pages(api):
+    response = await api.get("/api/v1/kubernetes/1/pods", params={"stream": "true", "limit": 25})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    pods = [json.loads(line) for line in response.text.splitlines()]
+    assert len(pods) == 120
+
+
+async def test_namespace_is_pushed_down_to_the_api_server(api):
+    page = (await api.get("/api/v1/kubernetes/1/pods", params={"namespace": "team-3"})).json()
+    assert page["items"]
+    assert {pod["metadata"]["namespace"] for pod in page["items"]} == {"team-3"}
@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+pytest.importorskip("mcp")
+
+from mcp.client import Client
+
+from app.mcp_server import build_server
+from app.portainer_service import PortainerService
+from benchmarks.fake_portainer import create_fake_portainer
+from tests.conftest import connect
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def server():
+    return build_server(connect(PortainerService(), create_fake_portainer(endpoints=2, containers=3)))
+
+
+async def test_tools_are_dispatched_to_the_service_and_summarized(server):
+    async with Client(server) as client:
+        tools = {tool.name: tool for tool in (await client.list_tools()).tools}
+        assert tools["get_containers"].annotations.read_only_hint
+        assert not tools["stop_container"].annotations.read_only_hint
+
+        result = await client.call_tool("get_containers", {"endpoint_id": 1})
+        assert not result.is_error
+        containers = json.loads(result.content[0].text)
+        assert [c["name"] for c in containers] == ["app-1", "app-2"]
+        assert set(containers[0]) == {"id", "name", "image", "state", "status"}
+
+        result = await client.call_tool("get_containers", {"endpoint_id": 1, "detail": True})
+        assert "Labels" in json.loads(result.content[0].text)[0]
+
+
+async def test_upstream_errors_become_tool_errors(server):
+    async with Client(server) as client:
+        result = await client.call_tool("stop_container", {"container_id": "missing", "endpoint_id": 1})
+        assert result.is_error
+        assert "404" in result.content[0].text
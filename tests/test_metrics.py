@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from app.metrics import observe_upstream, upstream_route
+
+
+@pytest.mark.parametrize("path, route, endpoint_id", [
+    ("/api/endpoints/3/docker/containers/json", "/api/endpoints/{id}/docker/containers/json", "3"),
+    ("/api/endpoints/3/docker/containers/abc123/restart", "/api/endpoints/{id}/docker/containers/{id}/restart", "3"),
+    ("/api/endpoints/1/docker/images/create", "/api/endpoints/{id}/docker/images/create", "1"),
+    ("/api/endpoints/1/docker/images/team/app-1:1.1.0", "/api/endpoints/{id}/docker/images/{id}", "1"),
+    ("/api/endpoints/1/docker/images/ghcr.io/team/app:2/json", "/api/endpoints/{id}/docker/images/{id}/json", "1"),
+    ("/api/endpoints/2/kubernetes/api/v1/namespaces/team-3/pods", "/api/endpoints/{id}/kubernetes/api/v1/namespaces/{id}/pods", "2"),
+    ("/api/endpoints/2/kubernetes/api/v1/namespaces", "/api/endpoints/{id}/kubernetes/api/v1/namespaces", "2"),
+    ("/api/stacks?endpointId=4", "/api/stacks", ""),
+    ("/api/stacks/create/standalone/string", "/api/stacks/create/standalone/string", ""),
+    ("/api/team_memberships/17", "/api/team_memberships/{id}", ""),
+])
+def test_upstream_route(path, route, endpoint_id):
+    assert upstream_route(path) == (route, endpoint_id)
+
+
+def upstream_count(**labels):
+    return REGISTRY.get_sample_value("mcp_portainer_upstream_request_duration_seconds_count", labels) or 0
+
+
+def test_observe_upstream_labels_by_route_and_outcome():
+    labels = {"portainer": "test", "method": "GET", "route": "/api/endpoints/{id}/docker/images/{id}/json", "endpoint_id": "5"}
+    before_ok, before_error = upstream_count(**labels, status="200"), upstream_count(**labels, status="ConnectError")
+    for image in ("team/a:1", "team/b:2"):
+        with observe_upstream("GET", f"/api/endpoints/5/docker/images/{image}/json", "test") as outcome:
+            outcome["status"] = 200
+    with pytest.raises(httpx.ConnectError):
+        with observe_upstream("GET", "/api/endpoints/5/docker/images/team/c:3/json", "test"):
+            raise httpx.ConnectError("refused")
+    assert upstream_count(**labels, status="200") == before_ok + 2
+    assert upstream_count(**labels, status="ConnectError") == before_error + 1
+
+
+@pytest.mark.anyio
+async def test_inbound_requests_are_labeled_by_route_template():
+    from app.main import app
+
+    labels = {"method": "GET", "route": "/api/v1/jobs/{job_id}", "status": "404"}
+    before = REGISTRY.get_sample_value("mcp_portainer_http_errors_total", labels) or 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        for job_id in ("a", "b"):
+            assert (await client.get(f"/api/v1/jobs/{job_id}")).status_code == 404
+    assert REGISTRY.get_sample_value("mcp_portainer_http_errors_total", labels) == before + 2
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+import pytest
+
+from app.portainer_service import PortainerService
+from benchmarks.fake_portainer import create_fake_portainer
+from tests.conftest import connect
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_calls_share_one_pooled_client_until_closed():
+    service = PortainerService()
+    try:
+        client = service.client
+        assert service.client is client
+        await service.aclose()
+        assert service.client is not client
+        assert not service.client.is_closed
+    finally:
+        await service.aclose()
+
+
+async def test_slow_upstream_calls_overlap_instead_of_queueing():
+    service = connect(PortainerService(), create_fake_portainer(endpoints=8, containers=5, latency_ms=100))
+    try:
+        started = time.monotonic()
+        lists = await asyncio.gather(*(service.get_containers(endpoint_id) for endpoint_id in range(1, 9)))
+        elapsed = time.monotonic() - started
+    finally:
+        await service.aclose()
+    assert [len(containers) for containers in lists] == [4] * 8
+    assert elapsed < 0.5  # eight sequential calls would take at least 0.8s
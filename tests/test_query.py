@@ -0,0 +1,42 @@
+import pytest
+
+from app.query import decode_cursor, docker_filters, paginate
+
+pytestmark = pytest.mark.anyio
+
+
+def test_docker_filters_drops_unset_values_and_normalizes_the_rest():
+    assert docker_filters(status=None, label=[], dangling=True, name="web", ancestor=["nginx", "redis"]) == {
+        "dangling": ["true"], "name": ["web"], "ancestor": ["nginx", "redis"],
+    }
+
+
+def test_pages_stay_stable_when_items_change_between_requests():
+    items = [{"Id": c} for c in "dbeac"]
+    page, cursor = paginate(items, "Id", limit=2)
+    assert [i["Id"] for i in page] == ["a", "b"]
+    # "a" goes away and "bb" appears before the cursor; the next page starts after "b" regardless
+    items = [{"Id": c} for c in ["bb", "b", "c", "d", "e"]]
+    page, cursor = paginate(items, "Id", limit=2, after=decode_cursor(cursor))
+    assert [i["Id"] for i in page] == ["bb", "c"]
+
+
+async def test_container_pages_round_trip_the_cursor_with_projection(api):
+    ids, cursor = [], None
+    while True:
+        params = {"all": "true", "limit": 3, "fields": "Id,State", **({"cursor": cursor} if cursor else {})}
+        response = await api.get("/api/v1/containers", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(item) == {"Id", "State"} for item in page)
+        ids += [item["Id"] for item in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert len(ids) == 10
+    assert ids == sorted(ids)
+
+
+async def test_bad_cursor_is_a_400(api):
+    response = await api.get("/api/v1/containers", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
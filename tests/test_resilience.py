@@ -0,0 +1,56 @@
+import pytest
+
+from app.resilience import BreakerRegistry, CircuitBreaker, CircuitOpenError
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(1, failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.record_success()  # a success resets the count
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_call()
+    assert error.value.retry_after > 0
+    assert breaker.rejected == 1
+
+
+def test_half_open_probe_closes_or_reopens(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("app.resilience.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker(1, failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 10
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_registry_has_one_breaker_per_environment():
+    registry = BreakerRegistry()
+    assert registry.for_path("/api/endpoints/3/docker/containers/json") is registry.for_path("/api/endpoints/3/docker/images/json")
+    assert registry.for_path("/api/endpoints/4/docker/containers/json").endpoint_id == 4
+    assert registry.for_path("/api/users") is None
+
+
+def test_breaker_registry_keys_stack_calls_by_endpoint_id():
+    registry = BreakerRegistry(failure_threshold=3, reset_timeout=30)
+    breaker = registry.for_path("/api/endpoints/2/docker/containers/json")
+    assert registry.for_path("/api/stacks?type=2&method=string&endpointId=2") is breaker
+    assert registry.for_path("/api/stacks/7", {"endpointId": 2}) is breaker
+    assert registry.for_path("/api/stacks/7", {"endpointId": 3}) is not breaker
+    assert registry.for_path("/api/stacks/7") is None
+    assert registry.for_path("/api/endpoints") is None
@@ -0,0 +1,27 @@
+import pytest
+
+from app.portainer_service import RawResponse
+from app.responses import FastJSONResponse, passthrough
+
+pytestmark = pytest.mark.anyio
+
+
+def test_passthrough_sends_the_upstream_body_and_etag_untouched():
+    raw = RawResponse(b'[{"Id": "a"}]', "application/json", '"v1"')
+    response = passthrough(raw, {"X-Cache": "hit"})
+    assert response.body == b'[{"Id": "a"}]'
+    assert response.headers["etag"] == '"v1"'
+    assert response.headers["x-cache"] == "hit"
+
+
+def test_fast_json_response_accepts_non_string_keys():
+    assert FastJSONResponse({1: "a"}).body == b'{"1":"a"}'
+
+
+async def test_list_routes_answer_with_the_upstream_bytes(api):
+    from app.main import portainer_service
+
+    upstream = await portainer_service.client.get("/api/endpoints/1/docker/images/json")
+    response = await api.get("/api/v1/images", params={"endpoint_id": 1})
+    assert response.status_code == 200
+    assert response.content == upstream.content
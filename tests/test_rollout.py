@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.rollout import plan_waves, stack_health
+
+
+def test_plan_waves_repeats_the_last_size():
+    assert plan_waves([1, 2, 3, 4, 5, 6, 7], [1, 2]) == [[1], [2, 3], [4, 5], [6, 7]]
+    assert plan_waves([1, 2, 3], [1, 5]) == [[1], [2, 3]]
+    assert plan_waves([1, 2], [0]) == [[1], [2]]
+    assert plan_waves([], [1]) == []
+
+
+def test_stack_health():
+    running = {"Names": ["/web"], "State": "running", "Status": "Up 1 minute (healthy)"}
+    one_shot = {"Names": ["/migrate"], "State": "exited", "Status": "Exited (0) 1 minute ago"}
+    assert stack_health([running, one_shot])[0]
+    assert not stack_health([])[0]
+    assert not stack_health([{**running, "Status": "Up 5 seconds (health: starting)"}])[0]
+    assert not stack_health([running, {**one_shot, "Status": "Exited (1) 1 minute ago"}])[0]
+
+
+@pytest.mark.anyio
+async def test_streamed_rollout_keeps_running_after_the_client_disconnects(monkeypatch):
+    from app import main
+
+    release = asyncio.Event()
+
+    async def run(self, emit):
+        await emit("wave_started", wave=1)
+        await release.wait()
+        return {"stack": self.name, "status": "succeeded"}
+
+    monkeypatch.setattr(main.StackRollout, "run", run)
+    request = main.StackRolloutCreate(name="web", stack_file_content="services: {}", endpoint_ids=[1])
+    response = await main.rollout_stack(request, stream="ndjson", idempotency_key=None, service=main.portainer_service)
+    job = main.jobs.get(response.headers["Location"].rsplit("/", 1)[1])
+    try:
+        events = response.body_iterator
+        while "wave_started" not in await anext(events):
+            pass
+        await events.aclose()
+
+        release.set()
+        assert [event async for event in job.follow()][-1]["result"] == {"stack": "web", "status": "succeeded"}
+        assert job.status == "succeeded"
+    finally:
+        await main.jobs.aclose()
+
+
+@pytest.mark.anyio
+async def test_rollout_job_reports_started_once(service):
+    from app.jobs import JobQueue
+    from app.rollout import StackRollout
+
+    queue = JobQueue(workers=1)
+    rollout = StackRollout(service, "stack-2", "services:\n  app:\n    image: nginx:2\n", [1], health_interval=0.01)
+    job, _ = queue.submit("stack_rollout", lambda job: rollout.run(job.publish), {}, {})
+    try:
+        names = [event["event"] async for event in job.follow()]
+    finally:
+        await queue.aclose()
+    assert names == ["queued", "started", "rollout_started", "wave_started", "deployed", "healthy", "wave_finished", "succeeded"]
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_calls_share_one_upstream_call():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+    assert results == [1] * 5
+    assert flight.stats() == {"in_flight": 0, "upstream_calls": 1, "collapsed": 4}
+    # Once finished, the next call goes upstream again
+    assert await flight.do("k", fetch) == 2
+
+
+async def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+
+
+async def test_cancelled_waiter_does_not_cancel_the_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "ok"
+
+    first = asyncio.create_task(flight.do("k", fetch))
+    second = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+    assert await second == "ok"
+
+
+async def test_forget_makes_later_callers_start_a_new_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        number = calls
+        await release.wait()
+        return number
+
+    before = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    flight.forget()
+    after = asyncio.create_task(flight.do("k", fetch))
+    await asyncio.sleep(0)
+    release.set()
+    assert (await before, await after) == (1, 2)
+    assert flight.stats()["in_flight"] == 0
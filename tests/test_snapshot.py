@@ -0,0 +1,28 @@
+from app.snapshot import SnapshotStore
+
+
+def store_with_containers():
+    store = SnapshotStore(":memory:")
+    store.replace_endpoints([{"Id": 1, "Name": "eu", "Type": 1}, {"Id": 2, "Name": "us", "Type": 1}])
+    for endpoint_id in (1, 2):
+        store.replace_resources(endpoint_id, "containers", [
+            {"Id": f"web{endpoint_id}", "Names": ["/web"], "Image": "ghcr.io/acme/web:1.2", "Labels": {"app": "web"}},
+            {"Id": f"db{endpoint_id}", "Names": ["/db"], "Image": "postgres:16", "Labels": {"app": "db"}},
+        ])
+    return store
+
+
+def test_search_matches_image_and_name_substrings_and_labels():
+    store = store_with_containers()
+    assert [r["id"] for r in store.search(image="acme/web")] == ["web1", "web2"]
+    assert [r["id"] for r in store.search(name="d", endpoint_ids=[2])] == ["db2"]
+    assert [r["id"] for r in store.search(label="app=db")] == ["db1", "db2"]
+
+
+def test_replace_endpoints_drops_resources_of_removed_environments():
+    store = store_with_containers()
+    store.replace_endpoints([{"Id": 2, "Name": "us", "Type": 1}])
+    assert [r["id"] for r in store.search()] == ["db2", "web2"]
+    store.replace_endpoints([])
+    assert store.search() == []
+    assert store.search(label="app") == []
@@ -0,0 +1,49 @@
+import pytest
+
+from app.stack_files import diff_stack_files, stack_file_hash
+
+COMPOSE = """services:
+  web:
+    image: nginx:1.25
+    ports: ["80:80"]
+"""
+
+
+def test_hash_ignores_formatting():
+    reformatted = "# deployed by CI\r\nservices:\r\n  web:\r\n    ports:\r\n      - '80:80'\r\n    image: \"nginx:1.25\"\r\n\r\n"
+    assert stack_file_hash(COMPOSE) == stack_file_hash(reformatted)
+
+
+def test_hash_changes_with_content():
+    assert stack_file_hash(COMPOSE) != stack_file_hash(COMPOSE.replace("1.25", "1.26"))
+
+
+@pytest.mark.parametrize("before, after", [
+    ("V: 1.10", "V: 1.1"),
+    ("FOO: yes", "FOO: true"),
+    ("mode: 0755", "mode: 493"),
+    ("port: 8080", "port: 8080.0"),
+    ("value: null", "value: ~"),
+])
+def test_hash_keeps_values_yaml_1_1_would_coerce(before, after):
+    # Compose reads these as different strings; a shared hash would skip a real redeploy
+    assert stack_file_hash(f"environment:\n  {before}\n") != stack_file_hash(f"environment:\n  {after}\n")
+
+
+def test_unparseable_files_fall_back_to_normalized_text():
+    broken = "services: [unclosed\n"
+    assert stack_file_hash(broken) == stack_file_hash(broken + "\n\n")
+    assert diff_stack_files(broken, COMPOSE)["format"] == "unified"
+
+
+def test_structural_diff():
+    diff = diff_stack_files(COMPOSE, COMPOSE.replace("1.25", "1.26") + "  cache:\n    image: redis\n")
+    assert diff["format"] == "structural"
+    assert diff["changed"] == {"services.web.image": {"from": "nginx:1.25", "to": "nginx:1.26"}}
+    assert diff["added"] == {"services.cache.image": "redis"}
+    assert diff["removed"] == {}
+
+
+def test_structural_diff_reports_scalars_as_written():
+    diff = diff_stack_files("x:\n  V: 1.10\n", "x:\n  V: 1.1\n")
+    assert diff["changed"] == {"x.V": {"from": "1.10", "to": "1.1"}}